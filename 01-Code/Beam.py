@@ -15,6 +15,9 @@ Class Beam:
   -----------------
     instances : List of instances of Particle class
   __Debug     : Debug flag
+ ParameterDtype : numpy dtype of beam parameters at one location:
+                  sigmaxy[2], emittance[5], Twiss[2, 3]; laid out as
+                  the _sigmaxy, _emittance and _Twiss lists
 
       
   Instance attributes:
@@ -23,6 +26,9 @@ Class Beam:
 
    Input arguments:
   _InputDataFile  : Path to BeamIO data file containing events to be read.
+                    May be None if the beam line already exists or
+                    _beamlineSpecificationCSVfile is given; then no
+                    particles are read (see extrapolateBeam).
  _BeamLineInstance: Instance of BeamLine class to which the this instance of
                     the Beam class refers.
   _nEvtMax        : Maximum number of events to read, if not set, read 'em all
@@ -35,7 +41,9 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
 
    _Location[] :   str : Name of location where parameters are recorded
    _s[]        : float : s coordinate at which parameters are recorded
-   _nParticles :  list : Number of particles arriving at location
+   _Moments    : MomentSums : Number of particles arriving at, mean
+                         and centred second-moment sums of trace space
+                         at, each location
    _CovMtrx    :  list : Covariance matrix by location
    _sigmaxy    :  list : RMS x and y by location.  [0] sigmax, [1] sigmay
    _emittance  :  list : emittance by location; calculated from CovMtrx
@@ -43,6 +51,12 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
    _Twiss      :  list : Twiss parameters by location
                          [0][0] alpha_x, [0][1] beta_x, [0][2] gamma_x
                          [1][0] alpha_y, [1][1] beta_y, [1][2] gamma_y
+   _BmPrmtrs   : ndarray of ParameterDtype : beam parameters at every
+                         location of _CovMtrx, evaluated together
+   _LocIndex   :  dict : iLoc of each beam-line element, by name
+   _Kept       : ndarray : True for each iLoc at which records are
+                         summed; False at locations that are not
+                         observation points of the beam line
 
 
   Note on indexing:
@@ -57,6 +71,12 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
                    Prtcl.Partiicle.getTraceSpace()
     iAddr       -- Address in list of CovMtrx etc.
 
+  Records are filed under the location whose name they carry, so
+  files written only at observation points (BeamLine.setObserve) are
+  evaluated correctly.  If the beam line has observation points, the
+  loss-point records at other locations are not summed; locations
+  with no records have NaN covariance matrices.
+
     
   Methods:
   --------
@@ -91,6 +111,13 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
       getnEvtMax, getCovSums, getnParticles, getCovarianceMatrix,
       getsigmaxy, getemittance, getTwiss
           -- thought to be self documenting!
+   getMoments: Returns MomentSums accumulator; may be merged with that
+               of a Beam evaluated on another shard before
+               calcCovarianceMatrix.
+ getBeamParameters: Returns ndarray of ParameterDtype, one entry per
+               covariance matrix; evaluated (stacked) on first call.
+ getnWellFilled: Number of leading locations reached by >= 10
+               particles; emittance and Twiss are kept for these.
 
   Processing methods:
     cleanBeams : Deletes all Beam instances and resets list of
@@ -102,6 +129,17 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
      incrementSums: increment sums used to calculate covariance matrix
          Input: Instance of particle class
 
+incrementSumsBlock: increment sums with a batch of records
+         Input: TrcSpc[nRow, 6], iLoc[nRow] : location of each record
+
+ RecordLocations: iLoc of each record from its location name; a
+                  source record (number 0) whose name is not an
+                  element (user source) is at the Source
+         Input: Location : name, or list of names, iRcrd[nRow] : record
+                number in event
+        Return: iLoc[nRow]; raises badBeam if a name is not in the
+                beam line
+
 printProgression : prints evolution of beam parameters by location.
 
     createReport : creates csv file with evolutio of beam paramters by
@@ -113,9 +151,19 @@ printProgression : prints evolution of beam parameters by location.
                 input : iPrtcl : instance of particle class by which sums are
                                  to be updated
 
- calcCovarianceMatrix : Calculate covariance matrix given sums
+ calcCovarianceMatrix : Calculate covariance matrix (about the mean)
+                        given sums
+
+  BeamParameters : Static; RMS x and y, emittances (from stacked
+                   determinants) and Twiss parameters at all locations.
+        Input : CovMtrx[nLoc, 6, 6] (or list of 6x6 matrices)
+       Return : ndarray [nLoc] of ParameterDtype; Twiss NaN where the
+                emittance is zero
 
-   evaluateBeam : Read data file and increment sums.  Then, calculate
+   evaluateBeam : Read data file and increment sums (for columnar,
+                  version >= 9, files directly from memory-mapped
+                  blocks, without creating particles; if re-tracking,
+                  blocks are decoded ahead in a thread).  Then, calculate
                   covariance matrix, RMS x and y, emittance, and Twiss
                   paramters
         Input : TrackBeam (Bool) : If reading particles from file,
@@ -147,7 +195,6 @@ Created on Mon 28Feb24: Version history:
 from matplotlib.backends.backend_pdf import PdfPages
 import matplotlib.ticker as ticker
 import matplotlib.pyplot as plt
-from   copy   import deepcopy
 import math   as     mth
 import numpy  as     np
 import os
@@ -164,6 +211,10 @@ class Beam:
     instances  = []
     __Debug    = False
 
+    ParameterDtype = np.dtype([("sigmaxy", "<f8", (2,)), \
+                               ("emittance", "<f8", (5,)), \
+                               ("Twiss", "<f8", (2, 3))])
+
 
 #--------  "Built-in methods":
     def __init__(self, _InputDataFile=None, _nEvtMax=None, \
@@ -181,11 +232,8 @@ class Beam:
 #--------  Check and initialise all inputs:  --------  --------  --------
 
         #.. Load parameter file
-        #.. Check and open input data file
-        if _InputDataFile == None:
-            raise Exception( \
-                        " Beam.__init__: no input data file given.")
-
+        #.. Input data file may be omitted if the beam line is known; then
+        #   no particles are read:
         if _nEvtMax == None:
             pass
         elif isinstance(_nEvtMax, int):
@@ -213,16 +261,19 @@ class Beam:
 
 #--------  Open input data file, read first record, initialise sums:  -----
 
-        if isinstance(_InputDataFile, bmIO.BeamIO):
-            _ibmIOr = _InputDataFile
+        if _InputDataFile == None:
+            pass
+        elif isinstance(_InputDataFile, bmIO.BeamIO):
+            self.setBeamIOread(_InputDataFile)
         else:
-            _ibmIOr = bmIO.BeamIO(None, _InputDataFile)
-        self.setBeamIOread(_ibmIOr)
-        ParticleFILE = self.getBeamIOread().getdataFILE()
-        self.setInputDataFile(ParticleFILE)
+            self.setBeamIOread(bmIO.BeamIO(None, _InputDataFile))
+        if self.getBeamIOread() != None:
+            ParticleFILE = self.getBeamIOread().getdataFILE()
+            self.setInputDataFile(ParticleFILE)
 
         EndOfFile = False
-        if BL.BeamLine.getinstances() == None:
+        if BL.BeamLine.getinstances() == None and \
+           self.getBeamIOread() != None:
             EndOfFile = self.getBeamIOread().readBeamDataRecord()
 
         iBm = BL.BeamLine.getinstances()
@@ -337,9 +388,11 @@ class Beam:
         self._BeamLineInstance                 = None
 
         self._Location   = []
-        self._CovSums    = []
-        self._nParticles = []
+        self._Moments    = None
         self._CovMtrx    = []
+        self._BmPrmtrs   = None
+        self._LocIndex   = None
+        self._Kept       = None
         self._sigmaxy    = []
         self._emittance  = []
         self._Twiss      = []
@@ -390,164 +443,75 @@ class Beam:
         if self.getDebug():
             print(" Beam.setsigmaxy: start")
 
-        for iAddr in range(len(self.getCovarianceMatrix())):
-            if self.getDebug():
-                print("     ----> sx2, sy2:", \
-                      self.getCovarianceMatrix()[iAddr][0,0], \
-                      self.getCovarianceMatrix()[iAddr][2,2])
-            sx1  = mth.sqrt(self.getCovarianceMatrix()[iAddr][0,0])
-            sy1  = mth.sqrt(self.getCovarianceMatrix()[iAddr][2,2])
-                
-            if self.getDebug():
-                print("     <---- iAddr, sx1, sy1:", \
-                      iAddr, sx1, sy1)
-                
-            self._sigmaxy.append([sx1, sy1])
+        self._sigmaxy += self.getBeamParameters()["sigmaxy"].tolist()
 
         if len(self._sigmaxy) >= len(BLE.BeamLineElement.getinstances()):
             print(len(self._sigmaxy), len(BLE.BeamLineElement.getinstances()))
             raise BadCovMtrx(" too many sigmaxy!")
         if self.getDebug():
-            print(" <---- Beam.setsigmaxy: done.")
+            print(" <---- Beam.setsigmaxy: sigmaxy: \n", \
+                  self.getBeamParameters()["sigmaxy"])
 
     def setEmittance(self):
         if self.getDebug():
             print(" Beam.setEmittance: start")
 
-        CovX = None
-        CovY = None
-        CovL = None
-        Cov4 = None
-        
-        if len(self.getnParticles()) < 1 or \
-           self.getnParticles()[0] < 10:
-            return
-        else:
-            nPrtcls = self.getnParticles()[0] 
-            
-        for iAddr in range(len(self.getCovarianceMatrix())):
-            if iAddr < len(self.getnParticles()):
-                nPrtcls = self.getnParticles()[iAddr]
-                
-            if nPrtcls < 10: break
-            
-            if self.getDebug():
-                print("     ----> iAddr:", iAddr)
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("         CovMtrx: \n", \
-                          self.getCovarianceMatrix()[iAddr]) 
-
-            CovX = self.getCovarianceMatrix()[iAddr][0:2,0:2]
-            CovY = self.getCovarianceMatrix()[iAddr][2:4,2:4]
-            CovL = self.getCovarianceMatrix()[iAddr][4:6,4:6]
-            Cov4 = self.getCovarianceMatrix()[iAddr][0:4,0:4]
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("                CovMtrx_X: \n", CovX)
-                    print("                CovMtrx_Y: \n", CovY)
-                    print("                CovMtrx_L: \n", CovL)
-                    print("                CovMtrx_4: \n", Cov4)
-
-            e2X  = np.linalg.det(CovX)
-            e2Y  = np.linalg.det(CovY)
-            e2L  = np.linalg.det(CovL)
-            e24  = np.linalg.det(Cov4)
-            e26  = np.linalg.det(self.getCovarianceMatrix()[iAddr])
-            if self.getDebug():
-                print("                e2X:", e2X)
-                print("                e2Y:", e2Y)
-                print("                e2L:", e2L)
-                print("                e24:", e24)
-                print("                e24:", e26)
-
-            if e2X < 0.: e2X = 0.
-            if e2Y < 0.: e2Y = 0.
-            if e2L < 0.: e2L = 0.
-            if e24 < 0.: e24 = 0.
-            if e26 < 0.: e26 = 0.
-            self._emittance.append([                \
-                                     mth.sqrt(e2X), \
-                                     mth.sqrt(e2Y), \
-                                     mth.sqrt(e2L), \
-                                     mth.pow(e24, 0.25), \
-                                     mth.pow(e26, 1./6.)])
+        Prmtrs = self.getBeamParameters()[:self.getnWellFilled()]
+        self._emittance += Prmtrs["emittance"].tolist()
             
-            if self.getDebug():
-                print(" Beam.getEmittance:")
-                print("     ----> CovX: \n", CovX)
-                print("     ----> CovY: \n", CovY)
-                print("     ----> CovL: \n", CovL)
-                print("     ----> Cov4: \n", Cov4)
-                print("     <---- eX:", self.getemittance()[iAddr][0])
-                print("     <---- eY:", self.getemittance()[iAddr][1])
-                print("     <---- eL:", self.getemittance()[iAddr][2])
-                print("     <---- e4:", self.getemittance()[iAddr][3])
-                print("     <---- e6:", self.getemittance()[iAddr][4])
-
         if self.getDebug():
-            print(" <---- Beam.setEmittance: done.")
+            with np.printoptions(linewidth=500,precision=10,\
+                                 suppress=True):
+                print(" <---- Beam.setEmittance: eX, eY, eL, e4, e6: \n", \
+                      Prmtrs["emittance"])
 
     def setTwiss(self):
         if self.getDebug():
             print(" Beam.setTwiss: start")
- 
-        if len(self.getnParticles()) < 1 or \
-           self.getnParticles()[0] < 10:
-            return
-        else:
-            nPrtcls = self.getnParticles()[0] 
-            
-        for iAddr in range(len(self.getCovarianceMatrix())):
-            if iAddr < len(self.getnParticles()):
-                nPrtcls = self.getnParticles()[iAddr]
-                
-            if nPrtcls < 10: break
-            
-            if self.getDebug():
-                print("     ----> iAddr:", iAddr)
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("         CovMtrx: \n", \
-                          self.getCovarianceMatrix()[iAddr])
-                print("     ----> ex, ey:", self.getemittance()[iAddr][0], \
-                                            self.getemittance()[iAddr][1])
-            emX = None
-            emY = None
-            if self.getemittance()[iAddr][0] > 0.:
-                emX = self.getCovarianceMatrix()[iAddr][0:2,0:2] / \
-                                       self.getemittance()[iAddr][0]
-            if self.getemittance()[iAddr][1] > 0.:
-                emY = self.getCovarianceMatrix()[iAddr][2:4,2:4] / \
-                                       self.getemittance()[iAddr][1]
-
-            if self.getemittance()[iAddr][0] > 0.:
-                ax = -emX[0,1]
-                bx =  emX[0,0]
-                gx =  emX[1,1]
-            else:
-                ax = None
-                bx = None
-                gx = None
-
-            if self.getemittance()[iAddr][1] > 0.:
-                ay = -emY[0,1]
-                by =  emY[0,0]
-                gy =  emY[1,1]
-            else:
-                ay = None
-                by = None
-                gy = None
-
-            self._Twiss.append([[ax, bx, gx], [ay, by, gy]])
 
-            if self.getDebug():
-                print("         ----> Twiss paramters, x, y:", \
-                      self._Twiss[iAddr])
+        Prmtrs = self.getBeamParameters()[:self.getnWellFilled()]
+        for iAddr in range(len(Prmtrs)):
+            Twiss = Prmtrs["Twiss"][iAddr].tolist()
+            for iPln in range(2):
+                if not Prmtrs["emittance"][iAddr][iPln] > 0.:
+                    Twiss[iPln] = [None, None, None]
+            self._Twiss.append(Twiss)
 
         if self.getDebug():
-            print(" <---- Beam.setTwiss: done.")
+            print(" <---- Beam.setTwiss: Twiss paramters, x, y: \n", \
+                  Prmtrs["Twiss"])
+
+    @staticmethod
+    def BeamParameters(CovMtrx):
+        #.. Evaluated for all locations at once from stacked covariance
+        #   matrices; determinants of the stacked sub-matrices are taken
+        #   together.  Negative determinants (rounding) give zero
+        #   emittance; Twiss parameters are NaN where emittance is zero.
+        Cov    = np.asarray(CovMtrx, dtype=float).reshape(-1, 6, 6)
+        Prmtrs = np.zeros(len(Cov), dtype=Beam.ParameterDtype)
+
+        Prmtrs["sigmaxy"] = np.sqrt(Cov[:, [0, 2], [0, 2]])
+
+        #.. NaN covariance matrices (no records) give NaN parameters:
+        with np.errstate(invalid="ignore"):
+            e2 = np.stack([np.linalg.det(Cov[:, 0:2, 0:2]), \
+                           np.linalg.det(Cov[:, 2:4, 2:4]), \
+                           np.linalg.det(Cov[:, 4:6, 4:6]), \
+                           np.linalg.det(Cov[:, 0:4, 0:4]), \
+                           np.linalg.det(Cov)], axis=1)
+        Prmtrs["emittance"] = np.maximum(e2, 0.) ** \
+                              np.array([0.5, 0.5, 0.5, 0.25, 1./6.])
+
+        for iPln in range(2):
+            e   = Prmtrs["emittance"][:, iPln]
+            Blk = Cov[:, 2*iPln:2*iPln+2, 2*iPln:2*iPln+2]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                Twiss = np.stack([-Blk[:, 0, 1], Blk[:, 0, 0], \
+                                  Blk[:, 1, 1]], axis=1) / e[:, None]
+            Prmtrs["Twiss"][:, iPln] = np.where((e > 0.)[:, None], \
+                                                Twiss, np.nan)
+
+        return Prmtrs
 
                       
 #--------  "Get methods" only; version, reference, and constants
@@ -589,18 +553,44 @@ class Beam:
             startlocation = self._startlocation
         return startlocation
 
+    def getMoments(self):
+        return self._Moments
+
     def getCovSums(self):
-        return self._CovSums
+        if self._Moments == None:
+            return []
+        return self._Moments.getM2()
     
     def getCovMtrx(self):
         return self._CovMtrx
     
     def getnParticles(self):
-        return self._nParticles
+        if self._Moments == None:
+            return []
+        return self._Moments.getn()
     
     def getCovarianceMatrix(self):
         return self._CovMtrx
 
+    def getBeamParameters(self):
+        if self._BmPrmtrs is None or \
+           len(self._BmPrmtrs) != len(self.getCovarianceMatrix()):
+            self._BmPrmtrs = self.BeamParameters(self.getCovarianceMatrix())
+        return self._BmPrmtrs
+
+    def getnWellFilled(self):
+        #.. Number of leading locations reached by >= 10 particles;
+        #   emittance and Twiss parameters are evaluated for these.
+        #   Locations with no records (not observed) are passed over.
+        nPrtcls = np.asarray(self.getnParticles())[ \
+                                     :len(self.getCovarianceMatrix())]
+        nPrtcls = np.append(nPrtcls, \
+                            np.full(len(self.getCovarianceMatrix()) - \
+                                    len(nPrtcls), nPrtcls[-1] \
+                                    if len(nPrtcls) > 0 else 0.))
+        Few     = np.nonzero((nPrtcls < 10) & (nPrtcls > 0))[0]
+        return Few[0] if len(Few) > 0 else len(nPrtcls)
+
     def getsigmaxy(self):
         return self._sigmaxy
 
@@ -616,11 +606,6 @@ class Beam:
         if self.getDebug():
             print(" Beam.intialiseSums start:")
             
-        CovSums = np.zeros((6,6))
-
-        self._CovSums    = []
-        self._nParticles = []
-
         iLocMin = self.getstartlocation()
             
         for iLoc in range(iLocMin, \
@@ -631,15 +616,15 @@ class Beam:
                 print("     ----> iLoc, BLE name, type:", \
                       iLoc, iBLE.getName(), type(iBLE))
 
-            self._CovSums.append(deepcopy(CovSums))
-            self._nParticles.append(0.)
+        self._Moments = MomentSums( \
+                max(0, len(BLE.BeamLineElement.getinstances()) - iLocMin))
                 
         if self.getDebug():
             print(" Beam.initialiseSums: n, CovSums:")
             for i in range(len(self.getnParticles())):
                 with np.printoptions(linewidth=500,precision=7,
                                      suppress=True):
-                    print("     ----> ", i, "\n", self._CovSums[i])
+                    print("     ----> ", i, "\n", self.getCovSums()[i])
             
     def incrementSums(self, iPrtcl):
         startlocation = self.getstartlocation()
@@ -657,52 +642,71 @@ class Beam:
                           iAddr, \
                           iPrtcl.getTraceSpace()[iAddr])
             
-        for iPhsSpcRcrd in range(startlocation-1, \
-                                 len(iPrtcl.getTraceSpace())):
-            iLoc  = iPhsSpcRcrd + 1
-            iAddr = iLoc - startlocation
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("         ----> Phs, iLoc, iAddr:", \
-                      iPhsSpcRcrd, iLoc, iAddr, \
-                      iPrtcl.getTraceSpace()[iPhsSpcRcrd])
-                    print("         ----> Location:", iLoc)
-                    print("                CovSums_(i): \n", \
-                          self.getCovSums()[iAddr])
-                    print("         ----> iAddr, startlocation, ", \
-                          "len(getnPartcles):", iAddr, startlocation, \
-                          len(self.getnParticles()))
-                    
-            self._nParticles[iAddr] += 1
-
-            for i in range(6):
-                for j in range(i,6):
-                    self._CovSums[iAddr][i,j]     = \
-                        self._CovSums[iAddr][i,j] + \
-                        iPrtcl.getTraceSpace()[iPhsSpcRcrd][i] * \
-                        iPrtcl.getTraceSpace()[iPhsSpcRcrd][j]
-                    if i != j:
-                        self._CovSums[iAddr][j,i] = \
-                            deepcopy(self._CovSums[iAddr][i,j])
+        #.. All records of the particle as one batch, each filed under
+        #   the location it was recorded at:
+        TrcSpc = iPrtcl.getTraceSpace()
+        if len(TrcSpc) > 0:
+            self.incrementSumsBlock(np.array(TrcSpc), \
+                    self.RecordLocations(iPrtcl.getLocation(), \
+                                         np.arange(len(TrcSpc))))
 
-            if self.getDebug():
-                print("         ----> Location:", iLoc)
-                with np.printoptions(linewidth=500,precision=7,\
-                                     suppress=True):
-                    print("                CovSums_(i+1): \n", \
-                          self.getCovSums()[iAddr]) 
-                                
         if self.getDebug():
+            with np.printoptions(linewidth=500,precision=7,\
+                                 suppress=True):
+                for iAddr in range(len(self.getCovSums())):
+                    print("         ----> iAddr, CovSums: \n", iAddr, \
+                          self.getCovSums()[iAddr])
             print(" <---- Beam.incrementSums: Done")
 
+    def incrementSumsBlock(self, TrcSpc, iLoc):
+        #.. TrcSpc[nRow, 6], iLoc[nRow]: location of each row (see
+        #   RecordLocations).
+        iAddr = iLoc - self.getstartlocation()
+        Keep  = (iAddr >= 0) & (iAddr < len(self.getnParticles())) & \
+                self._Kept[iLoc]
+
+        self._Moments.addBatch(TrcSpc[Keep], iAddr[Keep])
+
+        if self.getDebug():
+            print(" Beam.incrementSumsBlock:", len(TrcSpc), "records.")
+
+    def RecordLocations(self, Location, iRcrd):
+        if self._LocIndex == None:
+            self._LocIndex = {}
+            for iLoc, iBLE in enumerate(BLE.BeamLineElement.getinstances()):
+                self._LocIndex[iBLE.getName()] = iLoc
+            self._Kept = np.ones(len(self._LocIndex), dtype=bool)
+            if BL.BeamLine.getObserve() != None:
+                Observed = BL.BeamLine.ObservationPoints( \
+                                             BL.BeamLine.getObserve())
+                for Name, iLoc in self._LocIndex.items():
+                    self._Kept[iLoc] = iLoc <= 1 or Name in Observed
+
+        iRcrd = np.asarray(iRcrd)
+        if isinstance(Location, str):
+            iLoc = np.full(len(iRcrd), self._LocIndex.get(Location, -1))
+        else:
+            iLoc = np.array([self._LocIndex.get(Name, -1) \
+                             for Name in Location], dtype=int)
+
+        #.. User source is recorded as "<facility>:Source:User":
+        iLoc[(iLoc < 0) & (iRcrd == 0)] = 1
+        if np.any(iLoc < 0):
+            raise badBeam(" Beam.RecordLocations: location not in beam", \
+                          "line:", Location)
+
+        return iLoc
+
     def calcCovarianceMatrix(self):
         if self.getDebug():
             print(" Beam.calcCovarianceMatrix start:")
             print("     ----> Number of locations:", \
                   len(self.getCovSums()))
 
-        for iAddr in range(len(self.getCovSums())):
+        #.. Up to the last location reached; NaN where no records:
+        Rchd = np.nonzero(np.asarray(self.getnParticles()) >= 1)[0]
+        nAddr = Rchd[-1]+1 if len(Rchd) > 0 else 0
+        for iAddr in range(nAddr):
             if self.getDebug():
                 print("         ----> Location:", iAddr)
                 print("               Number of particles:", \
@@ -713,12 +717,10 @@ class Beam:
                           self.getCovSums()[iAddr])
                     
             if self.getnParticles()[iAddr] < 1:
-                break
+                self._CovMtrx.append(np.full((6, 6), np.nan))
+                continue
             
-            self._CovMtrx.append(                             \
-                                self.getCovSums()[iAddr] /         \
-                                float(self.getnParticles()[iAddr]) \
-                                 )
+            self._CovMtrx.append(self._Moments.getCovariance()[iAddr])
             
             if self.getDebug():
                 print("     <---- Covariance matrix:")
@@ -740,6 +742,8 @@ class Beam:
         Scl  = 1
 
         ParticleFILE = self.getInputDataFile()
+        if ParticleFILE == None:
+            raise badBeam(" Beam.evaluateBeam: no input data file.")
         if self.getDebug():
             print("     ----: event loop")
 
@@ -747,6 +751,34 @@ class Beam:
         if nEvtMax == None:
             nEvtMax = 1000
         iEvtStopClean = max(0, nEvtMax-1000000)
+
+        #.. Columnar file: sum over memory-mapped blocks, no Particle
+        #   instances created:
+        ibmIOr = self.getBeamIOread()
+        if not TrackBeam and not ibmIOr.getBDSIMfile() and \
+           ibmIOr.getdataFILEversion() != None and \
+           ibmIOr.getdataFILEversion() >= 9:
+            for Blk in ibmIOr.iterBlockViews():
+                nEvt = len(Blk["nLoc"])
+                if self.getnEvtMax() != None:
+                    nEvt = min(nEvt, self.getnEvtMax() - iEvt)
+                for iLoc, Evt, iRcrd, Rows in Blk["Groups"]:
+                    Sel = Evt < nEvt
+                    self.incrementSumsBlock(Rows["TrcSpc"][Sel], \
+                            self.RecordLocations(Blk["Locs"][iLoc], \
+                                                 iRcrd[Sel]))
+                iEvt += nEvt
+                if self.getnEvtMax() != None and iEvt >= self.getnEvtMax():
+                    break
+            EndOfFile = True
+
+        #.. Columnar file re-tracked: decode blocks ahead in a thread:
+        Prefetch = not EndOfFile and not ibmIOr.getBDSIMfile() and \
+                   ibmIOr.getdataFILEversion() != None and \
+                   ibmIOr.getdataFILEversion() >= 9
+        if Prefetch:
+            ibmIOr.setPrefetch(2)
+
         while not EndOfFile:
             EndOfFile = self.getBeamIOread().readBeamDataRecord()
             if not EndOfFile:
@@ -775,6 +807,9 @@ class Beam:
 
             if self.getnEvtMax() != None and iEvt >= self.getnEvtMax():
                 break
+
+        if Prefetch:
+            ibmIOr.setPrefetch(0)
             
         if self.getDebug():
             print("     <----", iEvt, "events read")
@@ -1154,6 +1189,11 @@ Derived class extrapolateBeam(Beam):
 
    Input arguments:
   _InputDataFile  : Path to BeamIO data file containing events to be read.
+                    If None, envelope mode: the initial covariance matrix
+                    is taken from the analytic (or, for Mode 0,
+                    integrated) trace-space moments of the Source and no
+                    particles are generated or read.  The beam line must
+                    exist or _beamlineSpecificationCSVfile be given.
   _nEvtMax        : Maximum number of events to read, if not set, read 'em all
    _outputCSVfile : Path to csv file in which summary of beam processing will
                     be written
@@ -1183,11 +1223,18 @@ Derived class extrapolateBeam(Beam):
       getoutputCSVfile, getextrapolateBeamInstances
           -- thought to be self documenting!
 
+    getnWellFilled : In envelope mode all locations are evaluated.
+
   Processing methods:
     cleanextrapolateBeams : Deletes all extrapolateBeam instances
                              and resets list of extrapolateBeam.
          No input; Returns bool flag, True means all good.
 
+    sourceCovarianceMatrix : Envelope mode; set the covariance matrix at
+                             the start location (the source) from
+                             Source.getTraceSpaceMoments.
+         No input or return.
+
 
   I/o methods:
     CSV file written out using Report module.
@@ -1273,13 +1320,17 @@ class extrapolateBeam(Beam):
     def getextrapolateBeamInstances(cls):
         return cls.instances
 
+    def getnWellFilled(self):
+        #.. Moments from source parameters are exact:
+        if self.getInputDataFile() == None:
+            return len(self.getCovarianceMatrix())
+        return Beam.getnWellFilled(self)
+
 #--------  Processing methods:    
     def initialiseSums(self):
         if self.getDebug():
             print(" extrapolateBeam.intialiseSums start:")
             
-        CovSums = np.zeros((6,6))
-
         iLoc = self.getstartlocation()
             
         iBLE = BLE.BeamLineElement.getinstances()[iLoc]
@@ -1287,15 +1338,15 @@ class extrapolateBeam(Beam):
             print("     ----> iLoc, BLE name, type:", \
                   iLoc, iBLE.getName(), type(iBLE))
 
-        self._CovSums.append(deepcopy(CovSums))
-        self._nParticles.append(0.)
+        self._Moments = MomentSums(1)
                 
         if self.getDebug():
             print("     ----> n, CovSums:")
             for i in range(len(self.getnParticles())):
                 with np.printoptions(linewidth=500,precision=7,
                                      suppress=True):
-                    print("         ----> n =", i, "\n", self._CovSums[i])
+                    print("         ----> n =", i, "\n", \
+                          self.getCovSums()[i])
 
     def incrementSums(self, iPrtcl):
         startlocation = self.getstartlocation()
@@ -1316,31 +1367,18 @@ class extrapolateBeam(Beam):
                           startlocation, \
                           iPrtcl.getTraceSpace()[startlocation-1])
 
-        if len(iPrtcl.getTraceSpace()) >= startlocation:
+        iRcrd = np.nonzero(self.RecordLocations(iPrtcl.getLocation(), \
+                np.arange(len(iPrtcl.getTraceSpace()))) == startlocation)[0]
+        if len(iRcrd) > 0:
             
             iAddr = 0
             if self.getDebug():
                 print("     ----> Start location:", startlocation, \
                 BLE.BeamLineElement.getinstances()[startlocation].getName())
             
-            self._nParticles[iAddr] += 1
+            self._Moments.addBatch( \
+                          iPrtcl.getTraceSpace()[iRcrd[0]], [iAddr])
 
-            if self.getDebug():
-                print("         ----> Location:", startlocation)
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("                CovSums_(i): \n", \
-                          self.getCovSums()[iAddr])
-
-            for i in range(6):
-                for j in range(i,6):
-                    self._CovSums[iAddr][i,j]     = \
-                        self._CovSums[iAddr][i,j] + \
-                        iPrtcl.getTraceSpace()[startlocation-1][i] * \
-                        iPrtcl.getTraceSpace()[startlocation-1][j]
-                    if i != j:
-                        self._CovSums[iAddr][j,i] = \
-                            deepcopy(self._CovSums[iAddr][i,j])
             if self.getDebug():
                 print("         ----> Location:", startlocation)
                 with np.printoptions(linewidth=500,precision=7,\
@@ -1351,6 +1389,33 @@ class extrapolateBeam(Beam):
         if self.getDebug():
             print(" <---- extrapolateBeam.incrementSums: Done")
 
+    def incrementSumsBlock(self, TrcSpc, iLoc):
+        #.. Only the record at the start location contributes:
+        X = TrcSpc[iLoc == self.getstartlocation()]
+        self._Moments.addBatch(X, np.zeros(len(X), dtype=int))
+
+        if self.getDebug():
+            print(" extrapolateBeam.incrementSumsBlock:", len(X), \
+                  "records at start location.")
+
+    def sourceCovarianceMatrix(self):
+        if self.getDebug():
+            print(" extrapolateBeam.sourceCovarianceMatrix start:")
+
+        iSrc = BLE.BeamLineElement.getinstances()[self.getstartlocation()]
+        if not isinstance(iSrc, BLE.Source):
+            raise badParameter( \
+                " extrapolateBeam.sourceCovarianceMatrix: start location", \
+                self.getstartlocation(), "is not the source.")
+
+        Mean, Cov = iSrc.getTraceSpaceMoments()
+        self._CovMtrx.append(Cov)
+
+        if self.getDebug():
+            with np.printoptions(linewidth=500,precision=10, \
+                                 suppress=True):
+                print("     <---- Source covariance matrix: \n", Cov)
+
     def extrapolateCovarianceMatrix(self):
         if self.getDebug():
             print(" extrapolateBeam.extrapolateCovarianceMatrix start:")
@@ -1435,9 +1500,15 @@ class extrapolateBeam(Beam):
 
         ParticleFILE = self.getInputDataFile()
 
-        #.. if ParticleFILE is closed, assume dont need to make initial
-        #   covariance matrix
-        if ParticleFILE.closed:
+        #.. No ParticleFILE: envelope mode, initial covariance matrix
+        #   from the source parameters.  If ParticleFILE is closed, assume
+        #   dont need to make initial covariance matrix
+        if ParticleFILE == None:
+            if self.getDebug():
+                print("     ----> No particle file, initial covariance", \
+                      " matrix from source parameters.")
+            self.sourceCovarianceMatrix()
+        elif ParticleFILE.closed:
             if self.getDebug():
                 print("     ----> Particle file closed, so continue from", \
                       " stored source covariance matrix.")
@@ -1522,6 +1593,101 @@ class extrapolateBeam(Beam):
         return DoneOK
 
     
+"""
+Class MomentSums:
+=================
+
+  Mergeable accumulator of the number of entries, mean and centred
+  second-moment sums, stacked over locations.  Batches are reduced
+  about their own mean and combined with the running sums by the
+  pairwise (Chan et al.) update, so covariances do not suffer the
+  cancellation of sum(x x^T)/n - mean mean^T.  Sums from separate
+  shards or processes are combined exactly with merge.
+
+
+  Instance attributes:
+  --------------------
+      _n    : ndarray [nLoc]          : number of entries
+      _Mean : ndarray [nLoc, nDim]    : mean
+      _M2   : ndarray [nLoc, nDim, nDim] : sum of (x - mean)(x - mean)^T
+
+    
+  Methods:
+  --------
+      __init__ : Input: nLoc, nDim (default 6)
+
+      addBatch : Add rows X[nRow, nDim] (or one row) at addresses
+                 iAddr[nRow]
+       combine : Combine sums nB, MeanB, M2B of a batch at addresses Addr
+         merge : Add sums of another MomentSums of the same shape
+
+  getn, getMean, getM2 : Get methods
+ getCovariance : Returns M2 / n [nLoc, nDim, nDim]; zero where no
+                 entries
+
+"""
+
+class MomentSums:
+
+    def __init__(self, nLoc, nDim=6):
+        self._n    = np.zeros(nLoc)
+        self._Mean = np.zeros((nLoc, nDim))
+        self._M2   = np.zeros((nLoc, nDim, nDim))
+
+    def __repr__(self):
+        return "MomentSums(nLoc, nDim=6)"
+
+    def __str__(self):
+        print(" MomentSums: locations, entries:", len(self._n), \
+              self._n.sum())
+        return " <---- MomentSums __str__ done."
+
+    def getn(self):
+        return self._n
+
+    def getMean(self):
+        return self._Mean
+
+    def getM2(self):
+        return self._M2
+
+    def getCovariance(self):
+        n = np.where(self._n > 0, self._n, 1.)
+        return self._M2 / n[:, None, None]
+
+    def addBatch(self, X, iAddr):
+        X     = np.asarray(X, dtype=float).reshape(-1, self._Mean.shape[1])
+        iAddr = np.asarray(iAddr, dtype=int)
+        if len(X) == 0:
+            return
+
+        Order = np.argsort(iAddr, kind="stable")
+        X     = X[Order]
+        Addr, Strt, nB = np.unique(iAddr[Order], return_index=True, \
+                                   return_counts=True)
+        MeanB = np.add.reduceat(X, Strt, axis=0) / nB[:, None]
+        D     = X - np.repeat(MeanB, nB, axis=0)
+        M2B   = np.add.reduceat(np.einsum("ni,nj->nij", D, D), Strt, axis=0)
+
+        self.combine(Addr, nB, MeanB, M2B)
+
+    def combine(self, Addr, nB, MeanB, M2B):
+        nA    = self._n[Addr]
+        n     = nA + nB
+        Delta = MeanB - self._Mean[Addr]
+        self._Mean[Addr] += Delta * (nB / n)[:, None]
+        self._M2[Addr]   += M2B + np.einsum("li,lj->lij", Delta, Delta) * \
+                            (nA * nB / n)[:, None, None]
+        self._n[Addr]     = n
+
+    def merge(self, Other):
+        if self._M2.shape != Other.getM2().shape:
+            raise badParameter(" MomentSums.merge: shapes differ.")
+        Addr = np.nonzero(Other.getn() > 0)[0]
+        self.combine(Addr, Other.getn()[Addr], Other.getMean()[Addr], \
+                     Other.getM2()[Addr])
+
+
 #--------  Exceptions:
 class noReferenceBeam(Exception):
     pass
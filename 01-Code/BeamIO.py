@@ -11,6 +11,20 @@ Class BeamIO:
   -----------------
     instances : List of instances of Particle class
   __Debug     : Debug flag
+  __dataFILEversion : Version of data file written (default 9)
+  __BlockSize : Number of events per columnar block (version >= 9)
+  RecordDtype : numpy dtype of one location record (version >= 9):
+                z, s, TrcSpc[6]
+  TrcSpcDtype : numpy dtype of location record with z and s omitted
+                (version >= 9): TrcSpc[6]
+       Codecs : Block compression codecs (version >= 9): "none",
+                "zlib", "lzma"; stored as index in list
+   IndexDtype : numpy dtype of event index record:
+                Offset : byte offset of event record (versions < 9) or
+                         of block containing event (version >= 9)
+                iInBlk : position of event in block (0 for versions < 9)
+               Species : index in PhysicalConstants species list
+                  nLoc : number of locations recorded for event
 
       
       Input arguments:
@@ -21,6 +35,15 @@ Class BeamIO:
                         directory defined by _datafilePATH
               _create : If True, file to be created.
            _BDSIMfile : If True, read file in BDSIM format.
+     _dataFILEversion : Version of file to write; None, use class default.
+                        Versions 8 (record by record) and 9 (columnar)
+                        may be written.
+
+  Methods defined at Module level:
+  --------------------------------
+  convertWorker : Runs in a forked worker; removes inherited beam line,
+                  particles and BeamIO instances, then convertFile.
+           Input : InPATH, OutPATH, dataFILEversion, Storage, beamlineCSV
 
 
   Instance attributes:
@@ -39,10 +62,88 @@ Class BeamIO:
                  >= 5 : Convert dvStrt to Euler angles
                  >= 6 : Revised source parameter format
                  >= 7 : Write/read particle species
+                 >= 9 : Columnar blocks; location and species dictionary,
+                        with z and s of each location, written once after
+                        the beam line, then blocks of events as
+                        little-endian arrays.  Rows in each block grouped
+                        by location, so that locations not wanted can be
+                        skipped; z and s omitted from rows that match the
+                        dictionary; group data optionally stored as
+                        float32 and/or compressed (zlib or lzma).
          _repoVERSION : [ [tagNAME, tagDATETIME],
                           [commitSTRING, commitDATETIME] ]
               _create : Boolean; if true create file.
            _BDSIMfile : If True, read file in BDSIM format.
+           _LocDict   : [Location names], header dictionary (version >= 9)
+           _SpcDict   : [Species names], header dictionary (version >= 9)
+           _LocZs     : ndarray [nLoc, 2], z and s of each location in
+                        dictionary (version >= 9)
+           _DictWrttn : Boolean, True once dictionary written.
+           _Blk       : Events buffered for next block (write), or decoded
+                        block and next event (read), version >= 9.
+           _DataStrt  : Byte offset of first event record/block (read).
+           _IdxBlks   : [Index records] of blocks written (write).
+           _Index     : Event index, ndarray of IndexDtype (read).
+           _BlkTbl    : Table of blocks (read, version >= 9).
+           _Memmap    : numpy.memmap of data file (read, version >= 9).
+           _Prjctn    : {Location names} to read; None, all (read).
+           _Storage   : [Codec, nByte, Level]: compression codec (index in
+                        Codecs), bytes per value (8 or 4) and compression
+                        level (None, codec default) of blocks written
+                        (version >= 9).
+           _Stats     : Encode/decode statistics; dict of RawBytes,
+                        StoredBytes, EncodeTime, DecodeTime, nEncoded and
+                        nDecoded (bytes of group data) (version >= 9),
+                        QueueWait, time spent waiting for space in
+                        the writer queue, and, on read (version >= 9),
+                        IOWait, time the reader waited for the next
+                        block, ComputeTime, time spent between blocks by
+                        the caller, PrefetchTime, time spent reading and
+                        decoding in the read-ahead thread, and nBlocks,
+                        number of blocks delivered.
+           _StatsLock : threading.Lock guarding _Stats; the writer and
+                        read-ahead threads update it as well as the
+                        caller.
+           _Wrtr      : Writer thread (asynchronous write, version >= 9);
+                        dict of Queue, Thread, Pid, QueueSize and Error;
+                        None if blocks are written synchronously.
+           _Pftch     : Read-ahead thread (prefetch, version >= 9); dict
+                        of Slots (ring of preallocated row buffers),
+                        Free and Ready queues, Stop event, Thread, File
+                        (own handle on data file), Held (slot in use by
+                        the reader), Pos (file offset after the block in
+                        use) and nBlocks; None if blocks are decoded
+                        on demand.
+           _tBlk      : Time (perf_counter) last block delivered to the
+                        reader; None before first and after last.
+
+  Event index sidecar file (<data file>.idx):
+  --------------------------------------------
+    <2q data-file size, number of events; then IndexDtype records.  Written
+    on close by the version >= 9 writer, otherwise built (and, where
+    possible, saved) on demand by getIndex.  Rebuilt if the data file size
+    does not match.
+
+  Data file version 9 layout (after beam line):
+  ---------------------------------------------
+    Dictionary : <2i nLoc, nSpc; then nLoc + nSpc names (<i length, utf-8);
+                 then <f8 [nLoc, 2] z, s of each location.
+    Block      : <5i nEvt, nRow, nXtrLoc, nXtrSpc, nGrp;
+                 nXtrLoc + nXtrSpc block-local names (<i length, utf-8),
+                 indexed from the end of the header dictionary;
+                 <i2 [nEvt] species index, <i4 [nEvt] number of locations,
+                 <i4 [nGrp, 3] location index, number of rows and number
+                 of columns, nCol, of each group;
+                 <2i codec, nByte; <2q nRaw, nStored; then nStored bytes
+                 holding, compressed with the codec, the nRaw bytes of
+                 group data: per group <i4 [n] event in block, <i4 [n]
+                 record number in event, <f4 or <f8 (nByte) [n, nCol]
+                 rows.  nCol = 6 (trace space only) when z and s of
+                 every row are those of the location in the dictionary,
+                 otherwise nCol = 8 (z, s, trace space).  Block headers
+                 are not compressed, so the index and block table are
+                 built without decompression.
+    Blocks are self contained, so shards may be concatenated.
 
   Methods:
   --------
@@ -64,6 +165,13 @@ Class BeamIO:
      setpathFILE, setdataFILE, setReadFirstRecord, setdataFILEversion,
      setcreate, setBDSIMfile
 
+ setBlockSize: set class number of events per block (version >= 9)
+
+   setStorage: set storage of blocks written (version >= 9)
+           Input: Precision   : "float64" (default) or "float32"
+                  Compression : None, "zlib" or "lzma"
+                  Level       : compression level; None, codec default
+
   Get methods:
      getDebug: returns class debug flag
           Return: Boolean
@@ -71,7 +179,21 @@ Class BeamIO:
  getinstances: return list of instances of BeamIO class.
 
      getpathFILE, getdataFILE, getReadFirstRecord, getdataFILEversion,
-     getcreate, getBDSIMfile
+     getcreate, getBDSIMfile, getBlockSize, getStorage
+
+getStatistics: Returns dict of encode/decode statistics: bytes of
+               group data before (RawBytes) and after (StoredBytes)
+               compression, Ratio (RawBytes/StoredBytes), times (s),
+               and EncodeMBps/DecodeMBps throughput (MB of raw group
+               data per second); on read, IOWait, ComputeTime and
+               PrefetchTime (s), nBlocks and IOWaitFraction
+               (IOWait/(IOWait+ComputeTime)).
+
+addStatistics: Add increments to the statistics under _StatsLock
+          Input: keyword arguments, name of statistic = increment
+
+getBeamIO4FILE: Class method, returns instance of BeamIO that owns file
+          Input: dataFILE; returns BeamIO instance or None
 
   Processing methods:
     readBeamDataRecord: Read a record from the file.
@@ -79,8 +201,142 @@ Class BeamIO:
 
          readVersion: Read version from file, returns version (string)
 
-   flushNclosedataFile: Flush data in buffer not yet written and close
-                        data file.
+  writeDictionary, readDictionary: Write/read location and species
+                        dictionary (version >= 9); write only once.
+
+       bufferParticle: Add particle to block being written, block written
+                       when BlockSize events buffered.
+          Input: iPrtcl : Particle instance
+
+          writeBlock: Write buffered events as one block; queued for
+                      the writer thread if asynchronous write is set.
+         encodeBlock: Encode and write one block.
+           Input: dict of block-buffer lists
+
+       setAsyncWrite: Start (Async True) or stop writer thread; blocks
+                      are then encoded, compressed and written in the
+                      thread while tracking continues.  The queue holds
+                      at most QueueSize blocks; a full queue blocks the
+                      caller.  Version >= 9 only.
+           Input: Async : bool; QueueSize : int (default 2)
+       getAsyncWrite: Returns True if writer thread is running.
+           runWriter: Writer thread loop.
+          queueBlock: Put block on writer queue; restarts the thread in
+                      a forked process.
+         drainWriter: Barrier; wait for all queued blocks to be written
+                      and, if Stop, stop the thread.  Errors raised in
+                      the thread are raised here.
+
+         setPrefetch: Start (nBlocks > 0) or stop (0) read-ahead thread;
+                      the next nBlocks blocks are read and decoded in the
+                      thread into a ring of preallocated row buffers
+                      while the caller works on the current block.  On
+                      stop the reader is left after the block in use.
+                      Version >= 9 read only.
+           Input: nBlocks : int (default 2)
+         getPrefetch: Returns number of blocks read ahead (0 if off).
+         runPrefetch: Read-ahead thread loop.
+           nextBlock: Make next decoded block current, from the
+                      read-ahead ring or by readBlock; times I/O wait
+                      and caller compute.  Returns Boolean "end of file"
+           readBlock: Read and decode next block from data file.
+                      Returns Boolean "end of file"
+         decodeBlock: Read and decode next block from given file; rows
+                      written to ring slot buffer if slot given.
+           Input: dataFILE, Slot (dict with "Rows" buffer, or None)
+          Return: dict of block, None at end of file
+            SlotRows: Static; returns n-row view of slot buffer,
+                      enlarging it if needed.
+
+     readBlockParticle: Create next particle from block, reading next
+                        block as needed.  Returns Boolean "end of file"
+
+            getIndex: Returns event index (ndarray of IndexDtype); read
+                      from sidecar, or built by scanning file and saved.
+          buildIndex: Scan data file, return event index.
+          writeIndex: Write event index sidecar.
+                seek: Position reader so next readBeamDataRecord reads
+                      event iEvt (counting from 0).
+           Input: iEvt : int
+           getmemmap: Returns numpy.memmap (uint8, read only) of file.
+       getBlockTable: Returns table of blocks, from block headers.
+      iterBlockViews: Generator; for each block yields dict of zero-copy
+                      views: Spc, nLoc (arrays), Groups ([iLoc, Evt,
+                      iRcrd, Rows (RecordDtype, TrcSpcDtype where z
+                      and s are omitted, or their float32 equivalents;
+                      see RowDtype)] per location), plus Locs,
+                      Spcs (names) and Offset.  Version >= 9 only.
+            RowDtype: Static; returns numpy dtype of row with nCol (6 or
+                      8) columns of nByte (4 or 8) byte floats.
+         GroupArrays: Static; returns Evt, iRcrd, Rows (RowDtype) views
+                      of group of n rows at offset in buffer.
+         readPayload: Returns (decompressed) group data of block;
+                      from file, or from memory map.
+          LocationZs: Static; returns ndarray [nLoc, 2], z and s
+                      recorded by the trackers at each beam-line
+                      element.  Written in the dictionary (version
+                      >= 9).
+       setLocZs, getLocZs: Set/get z, s of dictionary locations.
+           Input: locations : [names or indices] of groups to map;
+                              None, projection (or all)
+       setProjection: Restrict reads to listed locations (names or
+                      BeamLineElement indices); None, read all.  Version
+                      >= 9 blocks skip the bytes of other locations.
+       getProjection: Returns {names} or None.
+      ProjectionMask: Returns Boolean per location name, True if read.
+         iterBatches: Generator; yields, batchSize events at a time,
+                      (TrcSpc[batch, nLoc, 6], Mask[batch, nLoc],
+                       Species[batch]).  Mask True where the location
+                      was recorded (TrcSpc zero otherwise); Species is
+                      index in PhysicalConstants species list.  Version
+                      >= 9 via memory map, earlier versions record by
+                      record; no Particle instances are kept.
+           Input: batchSize : int
+                  locations : [names or BeamLineElement indices]; None,
+                              all beam-line elements
+                    species : name or [names]; None, all species
+       LocationNames: Returns [names] of locations (names or indices).
+           readRange: Read events start to stop-1.
+           Input: start, stop : int
+          Return: [Particle instances read]
+         appendShard: Append shard written by a worker (and its index) to
+                      file being written; shard files removed.
+           Input: ShardPATH : path to shard
+          mergeFiles: Class method; merge complete data files (each
+                      with its own header) into one.  Headers must be
+                      identical (same lattice, version and code; checked
+                      by sha256), else badShard is raised.  Event
+                      sections are block copied, not decoded; index of
+                      merged file rebuilt and saved.  Beam line is read
+                      from the first shard.
+           Input: MergedPATH : path of merged file
+                  ShardPATHs : [paths of shards], in order
+          Return: BeamIO instance reading merged file, positioned at
+                  first event
+
+         convertFile: Class method; convert data file of any version
+                      readable by readBeamDataRecord to a new file,
+                      event by event with bounded memory (blocks encoded
+                      in writer thread for version >= 9).  Needs clean
+                      process (no beam line yet instantiated).
+           Input: InPATH, OutPATH : paths
+                  dataFILEversion : version written; None, latest
+                  Storage         : None or (Precision, Compression[,
+                                    Level]) passed to setStorage
+                  beamlineCSV     : beam-line specification, used if
+                                    input file holds no beam line (v1)
+          Return: dict of Input, Output, InVersion, OutVersion, nEvt,
+                  Time (s), EvtPerSec, InBytes, OutBytes
+        convertFiles: Class method; convert many files, each in its own
+                      forked process, nWorkers at a time.
+           Input: Jobs : [(InPATH, OutPATH)]; nWorkers : int; other
+                  arguments as convertFile
+          Return: [convertFile dicts], dict of nFiles, nEvt, Time (s)
+                  and EvtPerSec over all files
+
+   flushNclosedataFile: Flush data in buffer not yet written (including,
+                        for version >= 9, the last block, waiting for the
+                        writer thread to finish) and close data file.
           Input: dataFILE : io.BufferedWriter : file being written
 
   Utilities:
@@ -95,11 +351,20 @@ Class BeamIO:
 
 import io
 import os
+import lzma
+import hashlib
+import time
+import multiprocessing as mp
+import zlib
+import queue
+import shutil
+import threading
 import struct as strct
 import numpy  as np
 import math   as mth
 
 import BeamLine as BL
+import BeamLineElement as BLE
 import Particle as Prtcl
 import PhysicalConstants as PhysCnst
 import LhARALinearOptics as LLO
@@ -111,13 +376,36 @@ protonMASS         = constants_instance.mp()
 pionMASS           = constants_instance.mPion()
 speedOFlight       = constants_instance.SoL()
 
+def convertWorker(_InPATH, _OutPATH, _dataFILEversion, _Storage, \
+                  _beamlineCSV):
+    #.. Runs in a forked worker, one file per process: beam line,
+    #   particles and BeamIO instances inherited from the parent are
+    #   removed so the input file header can be read.
+    Prtcl.Particle.cleanParticles()
+    Prtcl.ReferenceParticle.cleaninstances()
+    BL.BeamLine.cleaninstance()
+    BLE.BeamLineElement.cleaninstances()
+    BeamIO.cleanBeamIOfiles()
+
+    return BeamIO.convertFile(_InPATH, _OutPATH, _dataFILEversion, \
+                              _Storage, _beamlineCSV)
+
 class BeamIO:
-    instances = []
-    __Debug   = False
+    instances         = []
+    __Debug           = False
+    __dataFILEversion = 9
+    __BlockSize       = 1000
+
+    RecordDtype = np.dtype([("z", "<f8"), ("s", "<f8"), \
+                            ("TrcSpc", "<f8", (6,))])
+    TrcSpcDtype = np.dtype([("TrcSpc", "<f8", (6,))])
+    Codecs      = ["none", "zlib", "lzma"]
+    IndexDtype = np.dtype([("Offset", "<i8"), ("iInBlk", "<i4"), \
+                           ("Species", "<i2"), ("nLoc", "<i4")])
 
 #--------  "Built-in methods":
     def __init__(self, _datafilePATH=None, _datafileNAME=None, \
-                 _create=False, _BDSIMfile=False):
+                 _create=False, _BDSIMfile=False, _dataFILEversion=None):
         if self.getDebug():
             print(' BeamIO.__init__: ', \
                   'creating BeamIO object')
@@ -166,8 +454,16 @@ class BeamIO:
                 if self.getDebug():
                     print("         ----> File opened for write.")
                 
+                if _dataFILEversion == None:
+                    _dataFILEversion = BeamIO.__dataFILEversion
+                if _dataFILEversion not in (8, 9):
+                    raise badArgument( \
+                         " BeamIO.__init__: can not write version " + \
+                                       str(_dataFILEversion))
+                self.setdataFILEversion(_dataFILEversion)
+
                 self.writeFIRSTword()
-                self.writeVersion("BeamIO v8")
+                self.writeVersion("BeamIO v" + str(_dataFILEversion))
                 self.writeREPOversion()
                 
             else:
@@ -212,6 +508,13 @@ class BeamIO:
         print("     ---->      Repo version:", self.getrepoVERSION())
         print("     ---->            Create:", self.getcreate())
         print("     ---->         BDSIMfile:", self.getBDSIMfile())
+        if self.getLocDict() != None:
+            print("     ---->   Location dict.:", len(self.getLocDict()), \
+                  "entries")
+        if self.getdataFILEversion() != None and \
+           self.getdataFILEversion() >= 9:
+            print("     ---->           Storage:", self.getStorage())
+            print("     ---->        Statistics:", self.getStatistics())
 
         
 #--------  "Set method" only Debug
@@ -231,6 +534,28 @@ class BeamIO:
         self._repoVERSION     = None
         self._create          = None
         self._BDSIMfile       = None
+        self._LocDict         = None
+        self._SpcDict         = None
+        self._LocZs           = None
+        self._DictWrttn       = False
+        self._Blk             = None
+        self._DataStrt        = None
+        self._IdxBlks         = []
+        self._Index           = None
+        self._BlkTbl          = None
+        self._Memmap          = None
+        self._Prjctn          = None
+        self._Storage         = [0, 8, None]
+        self._Stats           = {"RawBytes": 0, "StoredBytes": 0, \
+                                 "EncodeTime": 0., "DecodeTime": 0., \
+                                 "nEncoded": 0, "nDecoded": 0, \
+                                 "QueueWait": 0., "IOWait": 0., \
+                                 "ComputeTime": 0., "PrefetchTime": 0., \
+                                 "nBlocks": 0}
+        self._StatsLock       = threading.Lock()
+        self._Wrtr            = None
+        self._Pftch           = None
+        self._tBlk            = None
 
     def setpathFILE(self, _pathFILE):
         self._pathFILE = _pathFILE
@@ -261,6 +586,42 @@ class BeamIO:
             raise badArgument()
         self._BDSIMfile = _BDSIMfile
 
+    @classmethod
+    def setBlockSize(cls, BlockSize):
+        if not isinstance(BlockSize, int) or BlockSize < 1:
+            raise badArgument()
+        cls.__BlockSize = BlockSize
+
+    def setLocDict(self, _LocDict):
+        self._LocDict = _LocDict
+
+    def setSpcDict(self, _SpcDict):
+        self._SpcDict = _SpcDict
+
+    def setLocZs(self, _LocZs):
+        self._LocZs = _LocZs
+
+    def setStorage(self, Precision="float64", Compression=None, \
+                   Level=None):
+        if Precision not in ("float64", "float32"):
+            raise badArgument(" BeamIO.setStorage: bad precision " + \
+                              str(Precision))
+        if Compression == None:
+            Compression = "none"
+        if Compression not in BeamIO.Codecs:
+            raise badArgument(" BeamIO.setStorage: bad compression " + \
+                              str(Compression))
+        if self.getdataFILEversion() == None or \
+           self.getdataFILEversion() < 9:
+            if Precision != "float64" or Compression != "none":
+                raise badArgument( \
+                    " BeamIO.setStorage: needs data file version >= 9.")
+        nByte = 4 if Precision == "float32" else 8
+        self._Storage = [BeamIO.Codecs.index(Compression), nByte, Level]
+
+        if self.getDebug():
+            print(" BeamIO.setStorage:", Precision, Compression, Level)
+
         
 #--------  "Get methods" only; version, reference, and constants
 #.. Methods believed to be self documenting(!)
@@ -296,6 +657,49 @@ class BeamIO:
     def getBDSIMfile(self):
         return self._BDSIMfile
 
+    @classmethod
+    def getBlockSize(cls):
+        return cls.__BlockSize
+
+    def getLocDict(self):
+        return self._LocDict
+
+    def getSpcDict(self):
+        return self._SpcDict
+
+    def getLocZs(self):
+        return self._LocZs
+
+    def getStorage(self):
+        return self._Storage
+
+    def getStatistics(self):
+        with self._StatsLock:
+            Stats = dict(self._Stats)
+        Stats["Ratio"] = Stats["RawBytes"] / Stats["StoredBytes"] \
+            if Stats["StoredBytes"] > 0 else None
+        Stats["EncodeMBps"] = Stats["nEncoded"] / 1.E6 / \
+            Stats["EncodeTime"] if Stats["EncodeTime"] > 0. else None
+        Stats["DecodeMBps"] = Stats["nDecoded"] / 1.E6 / \
+            Stats["DecodeTime"] if Stats["DecodeTime"] > 0. else None
+        tRead = Stats["IOWait"] + Stats["ComputeTime"]
+        Stats["IOWaitFraction"] = Stats["IOWait"] / tRead \
+            if tRead > 0. else None
+        return Stats
+
+    def addStatistics(self, **Incr):
+        #.. Read-modify-write, so serialised with the other threads:
+        with self._StatsLock:
+            for Key, Value in Incr.items():
+                self._Stats[Key] += Value
+
+    @classmethod
+    def getBeamIO4FILE(cls, dataFILE):
+        for iBmIO in cls.getinstances():
+            if iBmIO.getdataFILE() is dataFILE:
+                return iBmIO
+        return None
+
     
 #--------  Processing methods:
 
@@ -334,7 +738,7 @@ class BeamIO:
                 print("     ----> BDSIM file: number of fields:", len(TrcSpc))
 
             iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
-            E0        = iRefPrtcl.getPrOut()[0][3]
+            E0        = iRefPrtcl.getKinematics()["E0"][0]
             p0        = mth.sqrt(E0**2 - protonMASS**2)
             
             TrcSpc1 = np.zeros(6)
@@ -407,7 +811,7 @@ class BeamIO:
                 if self.getDebug():
                     print("           Not version 1!")
                 Version  = self.readVersion()
-                nVersion = int(Version[-1])
+                nVersion = int(Version.split("v")[-1])
                 self.setdataFILEversion(nVersion)
                 if self.getDebug():
                     print("           Version:", \
@@ -422,15 +826,25 @@ class BeamIO:
                     
                 BL.BeamLine.readBeamLine(self, self.getdataFILEversion())
 
+                if nVersion >= 9:
+                    self.readDictionary()
+
+                self._DataStrt = self.getdataFILE().tell()
+
             else:
                 if self.getDebug():
                     print("           Handle version 1!")
                 self.getdataFILE().seek(0)
+                self._DataStrt = 0
                 #EoF = Prtcl.Particle.readParticle(self.getdataFILE())
                 
             if self.getDebug():
                 print("     <---- Data file format version:", \
                       self.getdataFILEversion())
+        elif self.getdataFILEversion() >= 9:
+            EoF = self.readBlockParticle()
+            if self.getDebug():
+                print("     <---- BeamIO.readBeamDataRecord particle read.")
         else:
             EoF = Prtcl.Particle.readParticle(self.getdataFILE(), \
                                               self.getdataFILEversion())
@@ -613,6 +1027,1034 @@ class BeamIO:
 
         return repoVERSION
 
+#.. Columnar (version >= 9) dictionary and blocks:
+    @staticmethod
+    def writeNames(dataFILE, Names):
+        for Name in Names:
+            bName = bytes(Name, 'utf-8')
+            dataFILE.write(strct.pack("<i", len(bName)))
+            dataFILE.write(bName)
+
+    @staticmethod
+    def readNames(dataFILE, nNames):
+        Names = []
+        for iName in range(nNames):
+            nChr = strct.unpack("<i", dataFILE.read(4))[0]
+            Names.append(dataFILE.read(nChr).decode('utf-8'))
+        return Names
+
+    def writeDictionary(self):
+        if self.getDebug():
+            print(" BeamIO.writeDictionary start; written:", \
+                  self._DictWrttn)
+
+        if self._DictWrttn:
+            return
+
+        LocDict = [iBLE.getName() for iBLE in \
+                   BLE.BeamLineElement.getinstances()]
+        SpcDict = list(constants_instance.getSpecies())
+        self.setLocDict(LocDict)
+        self.setSpcDict(SpcDict)
+
+        dataFILE = self.getdataFILE()
+        dataFILE.write(strct.pack("<2i", len(LocDict), len(SpcDict)))
+        self.writeNames(dataFILE, LocDict)
+        self.writeNames(dataFILE, SpcDict)
+        self.setLocZs(self.LocationZs())
+        dataFILE.write(self.getLocZs().astype("<f8").tobytes())
+        self._DictWrttn = True
+
+        if self.getDebug():
+            print(" <---- Locations:", LocDict)
+            print("        Species:", SpcDict)
+
+    def readDictionary(self):
+        dataFILE = self.getdataFILE()
+        nLoc, nSpc = strct.unpack("<2i", dataFILE.read(8))
+        self.setLocDict(self.readNames(dataFILE, nLoc))
+        self.setSpcDict(self.readNames(dataFILE, nSpc))
+        self.setLocZs(np.frombuffer(dataFILE.read(8*2*nLoc), \
+                                    dtype="<f8").reshape(nLoc, 2))
+
+        if self.getDebug():
+            print(" BeamIO.readDictionary: locations:", self.getLocDict())
+            print("     <---- species:", self.getSpcDict())
+
+    @staticmethod
+    def LocationZs():
+        #.. z and s recorded by the trackers at each beam-line element:
+        #   z = 0 at the facility and source, otherwise the sentinel
+        #   -999999.; s the sum of element lengths from the source.
+        LocZs = np.zeros((len(BLE.BeamLineElement.getinstances()), 2))
+        sEnd  = 0.
+        for iLoc, iBLE in enumerate(BLE.BeamLineElement.getinstances()):
+            if isinstance(iBLE, BLE.Source) or \
+               isinstance(iBLE, BLE.Facility):
+                continue
+            sEnd = sEnd + iBLE.getLength()
+            LocZs[iLoc] = [-999999., sEnd]
+        return LocZs
+
+    def bufferParticle(self, iPrtcl):
+        #.. Buffer: species index, number of locations, location index
+        #   per location and [nLoc, 8] array of z, s, trace space per
+        #   event, plus block-local names not in the header dictionary.
+        if self._Blk == None:
+            self.writeDictionary()
+            self._Blk = {"LocIdx": {Loc: iLoc for iLoc, Loc in \
+                                    enumerate(self.getLocDict())}, \
+                         "SpcIdx": {Spc: iSpc for iSpc, Spc in \
+                                    enumerate(self.getSpcDict())}}
+            self.resetBlock()
+        Blk = self._Blk
+
+        iSpc = Blk["SpcIdx"].get(iPrtcl.getSpecies())
+        if iSpc == None:
+            iSpc = len(self.getSpcDict()) + len(Blk["XtrSpc"])
+            Blk["XtrSpc"].append(iPrtcl.getSpecies())
+            Blk["SpcIdx"][iPrtcl.getSpecies()] = iSpc
+
+        LocIdx = Blk["LocIdx"]
+        for Loc in iPrtcl.getLocation():
+            iLoc = LocIdx.get(Loc)
+            if iLoc == None:
+                iLoc = len(self.getLocDict()) + len(Blk["XtrLoc"])
+                Blk["XtrLoc"].append(Loc)
+                LocIdx[Loc] = iLoc
+            Blk["Loc"].append(iLoc)
+
+        #.. Particle records are already rows of z, s, trace space:
+        Rows = iPrtcl.getRecords().copy()
+        nLoc = len(Rows)
+
+        Blk["Spc"].append(iSpc)
+        Blk["nLoc"].append(nLoc)
+        Blk["Rows"].append(Rows)
+
+        if len(Blk["nLoc"]) >= self.getBlockSize():
+            self.writeBlock()
+
+    def resetBlock(self):
+        #.. Block-local names are dropped from the index dictionaries:
+        Blk = self._Blk
+        for Loc in Blk.get("XtrLoc", []):
+            del Blk["LocIdx"][Loc]
+        for Spc in Blk.get("XtrSpc", []):
+            del Blk["SpcIdx"][Spc]
+        Blk["XtrLoc"] = []
+        Blk["XtrSpc"] = []
+        Blk["Spc"]    = []
+        Blk["nLoc"]   = []
+        Blk["Loc"]    = []
+        Blk["Rows"]   = []
+
+    def writeBlock(self):
+        #.. Buffered events are handed to the writer thread, if running,
+        #   otherwise encoded and written now:
+        Blk = self._Blk
+        if Blk == None or len(Blk["nLoc"]) == 0:
+            return
+
+        Data = {Key: Blk[Key] for Key in \
+                ("XtrLoc", "XtrSpc", "Spc", "nLoc", "Loc", "Rows")}
+        self.resetBlock()
+        if self._Wrtr != None:
+            self.queueBlock(Data)
+        else:
+            self.encodeBlock(Data)
+
+    def encodeBlock(self, Blk):
+        nEvt = len(Blk["nLoc"])
+        nRow = len(Blk["Loc"])
+        if self.getDebug():
+            print(" BeamIO.encodeBlock: events, rows:", nEvt, nRow)
+
+        dataFILE = self.getdataFILE()
+
+        Idx = np.zeros(nEvt, dtype=BeamIO.IndexDtype)
+        Idx["Offset"]  = dataFILE.tell()
+        Idx["iInBlk"]  = np.arange(nEvt)
+        SpcNames       = self.getSpcDict() + Blk["XtrSpc"]
+        Idx["Species"] = [self.SpeciesIndex(SpcNames[iSpc]) \
+                          for iSpc in Blk["Spc"]]
+        Idx["nLoc"]    = Blk["nLoc"]
+        self._IdxBlks.append(Idx)
+
+        #.. Rows grouped by location; each row keeps its event and its
+        #   record number in the event:
+        Loc   = np.asarray(Blk["Loc"], dtype="<i4")
+        nLoc  = np.asarray(Blk["nLoc"], dtype="<i4")
+        Evt   = np.repeat(np.arange(nEvt, dtype="<i4"), nLoc)
+        iRcrd = (np.arange(nRow) - \
+                 np.repeat(np.cumsum(nLoc) - nLoc, nLoc)).astype("<i4")
+        Rows  = np.concatenate(Blk["Rows"]).astype("<f8")
+        Order = np.argsort(Loc, kind="stable")
+        GrpLoc, GrpN = np.unique(Loc, return_counts=True)
+
+        #.. z and s dropped from a group if every row matches the
+        #   dictionary entry for its location:
+        GrpSel = np.split(Order, np.cumsum(GrpN)[:-1])
+        GrpCol = np.full(len(GrpLoc), 8)
+        LocZs  = self.getLocZs()
+        for iGrp, iLoc in enumerate(GrpLoc):
+            if iLoc < len(LocZs) and \
+               np.all(Rows[GrpSel[iGrp], :2] == LocZs[iLoc]):
+                GrpCol[iGrp] = 6
+
+        dataFILE.write(strct.pack("<5i", nEvt, nRow, len(Blk["XtrLoc"]), \
+                                  len(Blk["XtrSpc"]), len(GrpLoc)))
+        self.writeNames(dataFILE, Blk["XtrLoc"])
+        self.writeNames(dataFILE, Blk["XtrSpc"])
+        dataFILE.write(np.asarray(Blk["Spc"], dtype="<i2").tobytes())
+        dataFILE.write(nLoc.tobytes())
+        GrpTbl = np.column_stack((GrpLoc, GrpN, GrpCol))
+        dataFILE.write(GrpTbl.astype("<i4").tobytes())
+
+        #.. Group data encoded as one payload:
+        Codec, nByte, Level = self.getStorage()
+        tStrt = time.perf_counter()
+        Raw   = b"".join([ Evt[Sel].tobytes() + iRcrd[Sel].tobytes() + \
+                           Rows[Sel, 8-nCol:].astype("<f"+str(nByte)). \
+                           tobytes() for Sel, nCol in zip(GrpSel, GrpCol) ])
+        if BeamIO.Codecs[Codec] == "zlib":
+            Stored = zlib.compress(Raw, 6 if Level == None else Level)
+        elif BeamIO.Codecs[Codec] == "lzma":
+            Stored = lzma.compress(Raw, preset=Level)
+        else:
+            Stored = Raw
+        self.addStatistics(EncodeTime=time.perf_counter() - tStrt, \
+                           nEncoded=len(Raw), RawBytes=len(Raw), \
+                           StoredBytes=len(Stored))
+
+        dataFILE.write(strct.pack("<2i2q", Codec, nByte, len(Raw), \
+                                  len(Stored)))
+        dataFILE.write(Stored)
+
+#.. Asynchronous write:
+    def setAsyncWrite(self, Async=True, QueueSize=2):
+        if Async and (not self.getcreate() or \
+                      self.getdataFILEversion() == None or \
+                      self.getdataFILEversion() < 9):
+            raise badArgument( \
+              " BeamIO.setAsyncWrite: no columnar file open for write.")
+        if not isinstance(QueueSize, int) or QueueSize < 1:
+            raise badArgument(" BeamIO.setAsyncWrite: bad queue size.")
+
+        self.drainWriter(True)
+        if Async:
+            Q    = queue.Queue(maxsize=QueueSize)
+            Thrd = threading.Thread(target=self.runWriter, args=(Q,), \
+                                    daemon=True)
+            self._Wrtr = {"Queue": Q, "Thread": Thrd, "Pid": os.getpid(), \
+                          "QueueSize": QueueSize, "Error": None}
+            Thrd.start()
+
+        if self.getDebug():
+            print(" BeamIO.setAsyncWrite:", Async, "queue size:", QueueSize)
+
+    def getAsyncWrite(self):
+        return self._Wrtr != None
+
+    def runWriter(self, Q):
+        #.. Writer thread; None on the queue stops it.  After an error
+        #   blocks are discarded; the error is raised in the caller at
+        #   the next queueBlock or drainWriter.
+        while True:
+            Data = Q.get()
+            try:
+                if Data is None:
+                    return
+                if self._Wrtr["Error"] == None:
+                    self.encodeBlock(Data)
+            except Exception as Err:
+                self._Wrtr["Error"] = Err
+            finally:
+                Q.task_done()
+
+    def queueBlock(self, Data):
+        #.. Threads do not survive fork; a forked worker starts its own:
+        if self._Wrtr["Pid"] != os.getpid():
+            QueueSize  = self._Wrtr["QueueSize"]
+            self._Wrtr = None
+            self.setAsyncWrite(True, QueueSize)
+
+        tStrt = time.perf_counter()
+        self._Wrtr["Queue"].put(Data)
+        self.addStatistics(QueueWait=time.perf_counter() - tStrt)
+
+        if self._Wrtr["Error"] != None:
+            raise self._Wrtr["Error"]
+
+    def drainWriter(self, Stop=False):
+        #.. Barrier: returns once every queued block has been written.
+        if self._Wrtr == None:
+            return
+        if self._Wrtr["Pid"] != os.getpid():
+            self._Wrtr = None
+            return
+
+        Wrtr = self._Wrtr
+        Wrtr["Queue"].join()
+        if Stop:
+            Wrtr["Queue"].put(None)
+            Wrtr["Thread"].join()
+            self._Wrtr = None
+        if Wrtr["Error"] != None:
+            raise Wrtr["Error"]
+
+    def readBlockHeader(self, dataFILE):
+        #.. Returns nEvt, nRow, extra location and species names,
+        #   offset of first array, groups [iLoc, nRow, offset, nCol] and
+        #   frame [codec, nByte, offset of payload, nRaw, nStored]; group
+        #   offsets are relative to the (decompressed) payload.  File
+        #   left after the payload.
+        brecord = dataFILE.read(20)
+        if len(brecord) < 20:
+            return None
+
+        nEvt, nRow, nXtrLoc, nXtrSpc, nGrp = strct.unpack("<5i", brecord)
+        XtrLoc  = self.readNames(dataFILE, nXtrLoc)
+        XtrSpc  = self.readNames(dataFILE, nXtrSpc)
+        ArrStrt = dataFILE.tell()
+
+        dataFILE.seek(ArrStrt + 6*nEvt)
+        GrpTbl = np.frombuffer(dataFILE.read(4*3*nGrp), \
+                               dtype="<i4").reshape(nGrp, 3)
+        Codec, nByte, nRaw, nStored = \
+                        strct.unpack("<2i2q", dataFILE.read(24))
+        Frame  = [Codec, nByte, ArrStrt + 6*nEvt + 4*3*nGrp + 24, \
+                  nRaw, nStored]
+        Grps   = []
+        GrpOff = 0
+        for iLoc, n, nCol in GrpTbl:
+            Grps.append([int(iLoc), int(n), GrpOff, int(nCol)])
+            GrpOff += (4+4+nByte*int(nCol))*int(n)
+        dataFILE.seek(Frame[2] + Frame[4])
+
+        return nEvt, nRow, XtrLoc, XtrSpc, ArrStrt, Grps, Frame
+
+    @staticmethod
+    def RowDtype(nCol, nByte=8):
+        Float = "<f" + str(nByte)
+        if nCol == 6:
+            return np.dtype([("TrcSpc", Float, (6,))])
+        return np.dtype([("z", Float), ("s", Float), \
+                         ("TrcSpc", Float, (6,))])
+
+    @staticmethod
+    def GroupArrays(Buf, GrpOff, n, nCol, nByte=8):
+        #.. Views, no copy, of group of n rows at GrpOff in Buf:
+        Evt   = np.frombuffer(Buf, dtype="<i4", count=n, offset=GrpOff)
+        iRcrd = np.frombuffer(Buf, dtype="<i4", count=n, offset=GrpOff+4*n)
+        Rows  = np.frombuffer(Buf, dtype=BeamIO.RowDtype(nCol, nByte), \
+                              count=n, offset=GrpOff+8*n)
+        return Evt, iRcrd, Rows
+
+    def readPayload(self, Frame, mm=None, dataFILE=None):
+        #.. Group data of a block, decompressed; read from
+        #   file (default data file; left positioned after payload), or,
+        #   if given, the memory map (uncompressed payload is then not
+        #   copied).
+        Codec, nByte, PayStrt, nRaw, nStored = Frame
+        tStrt = time.perf_counter()
+        if mm is None:
+            if dataFILE == None:
+                dataFILE = self.getdataFILE()
+            dataFILE.seek(PayStrt)
+            Stored = dataFILE.read(nStored)
+        else:
+            Stored = mm[PayStrt:PayStrt+nStored]
+        if BeamIO.Codecs[Codec] == "zlib":
+            Raw = zlib.decompress(Stored)
+        elif BeamIO.Codecs[Codec] == "lzma":
+            Raw = lzma.decompress(Stored)
+        else:
+            Raw = Stored
+        self.addStatistics(DecodeTime=time.perf_counter() - tStrt, \
+                           nDecoded=nRaw, RawBytes=nRaw, \
+                           StoredBytes=nStored)
+        return Raw
+
+    def readBlock(self):
+        Blk = self.decodeBlock(self.getdataFILE())
+        if Blk == None:
+            return True
+        self._Blk = Blk
+        return False
+
+    def decodeBlock(self, dataFILE, Slot=None):
+        #.. Decode next block into rows in event order.  With a
+        #   projection set, groups for other locations are skipped; the
+        #   payload is not decompressed if no group is wanted.  Rows are
+        #   written into Slot["Rows"], enlarged as needed, if a ring slot
+        #   is given.
+        #   Returns dict of block, None at end of file.
+        Hdr      = self.readBlockHeader(dataFILE)
+        if Hdr == None:
+            if self.getDebug():
+                print(" BeamIO.decodeBlock: end of file.")
+            return None
+
+        nEvt, nRow, XtrLoc, XtrSpc, ArrStrt, Grps, Frame = Hdr
+        BlkEnd = dataFILE.tell()
+        Locs   = self.getLocDict() + XtrLoc
+        Spcs   = self.getSpcDict() + XtrSpc
+        Wanted = self.ProjectionMask(Locs)
+
+        dataFILE.seek(ArrStrt)
+        Spc  = np.frombuffer(dataFILE.read(2*nEvt), dtype="<i2")
+        nLoc = np.frombuffer(dataFILE.read(4*nEvt), dtype="<i4")
+
+        Loc, Evt, iRcrd, Rows = [], [], [], []
+        nByte = Frame[1]
+        Raw   = None
+        if any([Wanted[Grp[0]] for Grp in Grps]):
+            Raw = self.readPayload(Frame, None, dataFILE)
+        for iLoc, n, GrpOff, nCol in Grps:
+            if not Wanted[iLoc]:
+                continue
+            GrpEvt, GrpRcrd, GrpRows = self.GroupArrays( \
+                Raw, GrpOff, n, nCol, nByte)
+            Loc.append(np.full(n, iLoc, dtype="<i4"))
+            Evt.append(GrpEvt)
+            iRcrd.append(GrpRcrd)
+            GrpRows = GrpRows.view("<f"+str(nByte)).reshape(n, nCol). \
+                      astype(float)
+            if nCol == 6:
+                GrpRows = np.column_stack( \
+                    (np.tile(self.getLocZs()[iLoc], (n, 1)), GrpRows))
+            Rows.append(GrpRows)
+        Loc   = np.concatenate(Loc)   if len(Loc) > 0 else \
+                np.zeros(0, dtype="<i4")
+        Evt   = np.concatenate(Evt)   if len(Evt) > 0 else \
+                np.zeros(0, dtype="<i4")
+        iRcrd = np.concatenate(iRcrd) if len(iRcrd) > 0 else \
+                np.zeros(0, dtype="<i4")
+        Rows  = np.concatenate(Rows)  if len(Rows) > 0 else \
+                np.zeros((0, 8))
+        Order = np.lexsort((iRcrd, Evt))
+        Loc   = Loc[Order]
+        nLoc  = np.bincount(Evt, minlength=nEvt)
+        if Slot == None:
+            Rows = Rows[Order]
+        else:
+            Rows = np.take(Rows, Order, axis=0, \
+                           out=self.SlotRows(Slot, len(Order)))
+        dataFILE.seek(BlkEnd)
+
+        iRow = np.zeros(nEvt+1, dtype=int)
+        np.cumsum(nLoc, out=iRow[1:])
+        Blk  = {"Locs": Locs, "Spcs": Spcs, "Spc": Spc, \
+                "Loc": Loc, "Rows": Rows, "iRow": iRow, \
+                "nEvt": nEvt, "iEvt": 0}
+
+        if self.getDebug():
+            print(" BeamIO.decodeBlock: events, rows:", nEvt, nRow)
+
+        return Blk
+
+    @staticmethod
+    def SlotRows(Slot, n):
+        #.. View of first n rows of the preallocated buffer of a ring
+        #   slot; buffer is enlarged if block does not fit.
+        if len(Slot["Rows"]) < n:
+            Slot["Rows"] = np.empty((max(n, 2*len(Slot["Rows"])), 8))
+        return Slot["Rows"][:n]
+
+    def setPrefetch(self, nBlocks=2):
+        if not isinstance(nBlocks, int) or nBlocks < 0:
+            raise badArgument(" BeamIO.setPrefetch: bad number of blocks.")
+        if nBlocks > 0 and (self.getcreate() or \
+                            self.getdataFILEversion() == None or \
+                            self.getdataFILEversion() < 9):
+            raise badArgument( \
+              " BeamIO.setPrefetch: no columnar file open for read.")
+
+        if self._Pftch != None:
+            Pftch = self._Pftch
+            Pftch["Stop"].set()
+            Pftch["Free"].put(-1)
+            Pftch["Thread"].join()
+            Pftch["File"].close()
+            self.getdataFILE().seek(Pftch["Pos"])
+            self._Pftch = None
+
+        if nBlocks > 0:
+            nRow  = self.getBlockSize() * max(1, len(self.getLocDict()))
+            Slots = [{"Rows": np.empty((nRow, 8))} for i in range(nBlocks)]
+            Free  = queue.Queue()
+            for iSlot in range(nBlocks):
+                Free.put(iSlot)
+            Pos   = self.getdataFILE().tell()
+            File  = open(self.getpathFILE(), "rb")
+            File.seek(Pos)
+            Pftch = {"Slots": Slots, "Free": Free, "Ready": queue.Queue(), \
+                     "Stop": threading.Event(), "Thread": None, \
+                     "File": File, "Held": None, "Pos": Pos, \
+                     "nBlocks": nBlocks}
+            Pftch["Thread"] = threading.Thread(target=self.runPrefetch, \
+                                               args=(Pftch,), daemon=True)
+            self._Pftch = Pftch
+            Pftch["Thread"].start()
+
+        if self.getDebug():
+            print(" BeamIO.setPrefetch: blocks read ahead:", nBlocks)
+
+    def getPrefetch(self):
+        return 0 if self._Pftch == None else self._Pftch["nBlocks"]
+
+    def runPrefetch(self, Pftch):
+        #.. Read-ahead thread; decodes a block into each free slot and
+        #   puts (slot, block, offset after block) on the ready queue.
+        #   Stops at end of file (block None) or on error (block is the
+        #   exception, raised in the reader), or when Stop is set.
+        while True:
+            iSlot = Pftch["Free"].get()
+            if Pftch["Stop"].is_set():
+                return
+            tStrt = time.perf_counter()
+            try:
+                Blk = self.decodeBlock(Pftch["File"], Pftch["Slots"][iSlot])
+            except Exception as Err:
+                Blk = Err
+            self.addStatistics(PrefetchTime=time.perf_counter() - tStrt)
+            Pftch["Ready"].put((iSlot, Blk, Pftch["File"].tell()))
+            if Blk is None or isinstance(Blk, Exception):
+                return
+
+    def nextBlock(self):
+        #.. Time in the call is I/O wait (all of reading and decoding
+        #   without read ahead); time between calls is caller compute.
+        tStrt = time.perf_counter()
+        if self._tBlk != None:
+            self.addStatistics(ComputeTime=tStrt - self._tBlk)
+        Pftch = self._Pftch
+        if Pftch == None:
+            EoF = self.readBlock()
+        else:
+            if Pftch["Held"] != None:
+                Pftch["Free"].put(Pftch["Held"])
+                Pftch["Held"] = None
+            Item = Pftch["Ready"].get()
+            iSlot, Blk, Pftch["Pos"] = Item
+            if isinstance(Blk, Exception):
+                raise Blk
+            EoF = Blk is None
+            if EoF:
+                Pftch["Ready"].put(Item)
+            else:
+                Pftch["Held"] = iSlot
+                self._Blk     = Blk
+
+        self._tBlk = time.perf_counter()
+        self.addStatistics(IOWait=self._tBlk - tStrt, nBlocks=0 if EoF else 1)
+        if EoF:
+            self._tBlk = None
+        return EoF
+
+    def readBlockParticle(self):
+        while self._Blk == None or self._Blk["iEvt"] >= self._Blk["nEvt"]:
+            if self.nextBlock():
+                return True
+        Blk  = self._Blk
+        iEvt = Blk["iEvt"]
+        Blk["iEvt"] += 1
+
+        iRefPrtcl = BL.BeamLine.findReferenceParticle( \
+                                              Blk["Spcs"][Blk["Spc"][iEvt]])
+        BL.BeamLine.setcurrentReferenceParticle(iRefPrtcl)
+
+        iStrt = Blk["iRow"][iEvt]
+        iEnd  = Blk["iRow"][iEvt+1]
+        if iEnd > iStrt:
+            iPrtcl = Prtcl.Particle.createParticle()
+            Locs   = Blk["Locs"]
+            Rows   = Blk["Rows"]
+            iPrtcl.recordParticleBlock( \
+                        [Locs[iLoc] for iLoc in Blk["Loc"][iStrt:iEnd]], \
+                        Rows[iStrt:iEnd, 0], Rows[iStrt:iEnd, 1], \
+                        Rows[iStrt:iEnd, 2:])
+
+        return False
+
+#.. Event index:
+    @staticmethod
+    def SpeciesIndex(Species):
+        if Species in constants_instance.getSpecies():
+            return constants_instance.getSpecies().index(Species)
+        return -1
+
+    def getIndex(self):
+        if self._Index is not None:
+            return self._Index
+
+        if not self.getReadFirstRecord():
+            self.readBeamDataRecord()
+
+        pathIDX = self.getpathFILE() + ".idx"
+        if os.path.isfile(pathIDX):
+            with open(pathIDX, "rb") as IdxFILE:
+                Size, nEvt = strct.unpack("<2q", IdxFILE.read(16))
+                if Size == os.path.getsize(self.getpathFILE()):
+                    self._Index = np.frombuffer(IdxFILE.read(), \
+                                                dtype=BeamIO.IndexDtype)
+            if self.getDebug() and self._Index is not None:
+                print(" BeamIO.getIndex: index read from", pathIDX)
+
+        if self._Index is None:
+            self._Index = self.buildIndex()
+            try:
+                self.writeIndex(self._Index)
+            except OSError:
+                if self.getDebug():
+                    print(" BeamIO.getIndex: index could not be saved.")
+
+        return self._Index
+
+    def buildIndex(self):
+        if self.getBDSIMfile():
+            raise badArgument( \
+                    " BeamIO.buildIndex: no index for BDSIM files.")
+
+        dataFILE = self.getdataFILE()
+        Here     = dataFILE.tell()
+        dataFILE.seek(self._DataStrt)
+        version  = self.getdataFILEversion()
+
+        Idx = []
+        if version >= 9:
+            for Blk in self.iterBlockViews([]):
+                nEvt   = len(Blk["nLoc"])
+                IdxBlk = np.zeros(nEvt, dtype=BeamIO.IndexDtype)
+                IdxBlk["Offset"]  = Blk["Offset"]
+                IdxBlk["iInBlk"]  = np.arange(nEvt)
+                IdxBlk["Species"] = [self.SpeciesIndex(Blk["Spcs"][iSpc]) \
+                                     for iSpc in Blk["Spc"]]
+                IdxBlk["nLoc"]    = Blk["nLoc"]
+                Idx.append(IdxBlk)
+        else:
+            Rcrds = []
+            iSpc  = self.SpeciesIndex( \
+                    BL.BeamLine.getcurrentReferenceParticle().getSpecies())
+            while True:
+                Offset = dataFILE.tell()
+                if version >= 7:
+                    brecord = dataFILE.read(4)
+                    if len(brecord) < 4:
+                        break
+                    nChr = strct.unpack(">i", brecord)[0]
+                    iSpc = self.SpeciesIndex( \
+                                    dataFILE.read(nChr).decode('utf-8'))
+                brecord = dataFILE.read(4)
+                if len(brecord) < 4:
+                    break
+                nLoc = strct.unpack(">i", brecord)[0]
+                for iLoc in range(nLoc):
+                    nChr = strct.unpack(">i", dataFILE.read(4))[0]
+                    dataFILE.seek(nChr + 8*8, 1)
+                Rcrds.append((Offset, 0, iSpc, nLoc))
+            Idx.append(np.array(Rcrds, dtype=BeamIO.IndexDtype))
+
+        dataFILE.seek(Here)
+
+        Index = np.concatenate(Idx) if len(Idx) > 0 else \
+                np.zeros(0, dtype=BeamIO.IndexDtype)
+        if self.getDebug():
+            print(" BeamIO.buildIndex:", len(Index), "events indexed.")
+
+        return Index
+
+#.. Memory-mapped (version >= 9) read:
+    def getmemmap(self):
+        if self._Memmap is None:
+            self._Memmap = np.memmap(self.getpathFILE(), dtype=np.uint8, \
+                                     mode="r")
+        return self._Memmap
+
+    def getBlockTable(self):
+        #.. Scan block headers only; entries are
+        #   [Offset, nEvt, nRow, [extra locations], [extra species],
+        #    offset of first array, groups, frame]
+        if self._BlkTbl is not None:
+            return self._BlkTbl
+
+        if self.getBDSIMfile() or self.getdataFILEversion() == None or \
+           self.getdataFILEversion() < 9:
+            raise badArgument( \
+                    " BeamIO.getBlockTable: columnar (version >= 9) only.")
+
+        dataFILE = self.getdataFILE()
+        Here     = dataFILE.tell()
+        dataFILE.seek(self._DataStrt)
+
+        BlkTbl = []
+        while True:
+            Offset = dataFILE.tell()
+            Hdr    = self.readBlockHeader(dataFILE)
+            if Hdr == None:
+                break
+            BlkTbl.append([Offset] + list(Hdr))
+
+        dataFILE.seek(Here)
+        self._BlkTbl = BlkTbl
+
+        if self.getDebug():
+            print(" BeamIO.getBlockTable:", len(BlkTbl), "blocks.")
+
+        return BlkTbl
+
+    def iterBlockViews(self, locations=None):
+        #.. Views into the memory-mapped file; no data copied and no
+        #   Particle instances created.  Only groups for the requested
+        #   locations (default: projection, or all) are mapped.  Rows of
+        #   groups written without z and s are TrcSpcDtype; z and s are
+        #   then getLocZs()[iLoc].  Compressed payloads are decompressed
+        #   a block at a time, and only if a group is wanted; float32
+        #   rows are returned as stored.
+        if not self.getReadFirstRecord():
+            self.readBeamDataRecord()
+
+        mm = self.getmemmap()
+        for Offset, nEvt, nRow, XtrLoc, XtrSpc, ArrStrt, Grps, Frame in \
+            self.getBlockTable():
+            Locs   = self.getLocDict() + XtrLoc
+            Wanted = self.ProjectionMask(Locs, locations)
+            onLoc  = ArrStrt + 2*nEvt
+            nLoc   = mm[onLoc:onLoc+4*nEvt].view("<i4")
+
+            Groups = []
+            Buf    = None
+            nByte  = Frame[1]
+            if any([Wanted[Grp[0]] for Grp in Grps]):
+                Buf = self.readPayload(Frame, mm)
+            for iLoc, n, GrpOff, nCol in Grps:
+                if not Wanted[iLoc]:
+                    continue
+                Groups.append([iLoc] + \
+                    list(self.GroupArrays(Buf, GrpOff, n, nCol, nByte)))
+
+            yield {"Offset": Offset, \
+                   "Locs":   Locs, \
+                   "Spcs":   self.getSpcDict() + XtrSpc, \
+                   "Spc":    mm[ArrStrt:onLoc].view("<i2"), \
+                   "nLoc":   nLoc, \
+                   "Groups": Groups}
+
+#.. Projection:
+    def setProjection(self, locations=None):
+        if locations == None:
+            self._Prjctn = None
+        else:
+            self._Prjctn = set(self.LocationNames(locations))
+        if self.getDebug():
+            print(" BeamIO.setProjection:", self._Prjctn)
+
+    def getProjection(self):
+        return self._Prjctn
+
+    def ProjectionMask(self, Locs, locations=None):
+        #.. Boolean per entry in Locs; True if location is to be read.
+        if locations != None:
+            Names = set(self.LocationNames(locations))
+        else:
+            Names = self.getProjection()
+        if Names == None:
+            return np.ones(len(Locs), dtype=bool)
+        return np.array([Loc in Names for Loc in Locs], dtype=bool)
+
+#.. Batched read:
+    def LocationNames(self, locations=None):
+        if locations == None:
+            if self.getLocDict() != None:
+                return list(self.getLocDict())
+            return [iBLE.getName() for iBLE in \
+                    BLE.BeamLineElement.getinstances()]
+
+        Names = []
+        for Loc in locations:
+            if isinstance(Loc, (int, np.integer)):
+                Loc = BLE.BeamLineElement.getinstances()[Loc].getName()
+            if not isinstance(Loc, str):
+                raise badArgument( \
+                    " BeamIO.LocationNames: bad location " + str(Loc))
+            Names.append(Loc)
+        return Names
+
+    def iterBatches(self, batchSize=1000, locations=None, species=None):
+        if not isinstance(batchSize, int) or batchSize < 1:
+            raise badArgument(" BeamIO.iterBatches: bad batch size.")
+        if self.getBDSIMfile():
+            raise badArgument(" BeamIO.iterBatches: BDSIM file.")
+
+        if not self.getReadFirstRecord():
+            self.readBeamDataRecord()
+
+        Names = self.LocationNames(locations)
+        nSel  = len(Names)
+        Col   = {Name: iCol for iCol, Name in enumerate(Names)}
+        if isinstance(species, str):
+            species = [species]
+        Spcs  = None if species == None else \
+                [self.SpeciesIndex(Spc) for Spc in species]
+
+        if self.getdataFILEversion() >= 9:
+            Pending = [[], [], []]
+            nPndng  = 0
+            for Blk in self.iterBlockViews(Names):
+                nEvt   = len(Blk["nLoc"])
+                Spc    = np.array([self.SpeciesIndex(Name) for Name in \
+                                   Blk["Spcs"]], dtype="<i2")[Blk["Spc"]]
+                Keep   = np.ones(nEvt, dtype=bool) if Spcs == None else \
+                         np.isin(Spc, Spcs)
+
+                TrcSpc = np.zeros((nEvt, nSel, 6))
+                Mask   = np.zeros((nEvt, nSel), dtype=bool)
+                for iLoc, Evt, iRcrd, Rows in Blk["Groups"]:
+                    iCol = Col[Blk["Locs"][iLoc]]
+                    TrcSpc[Evt, iCol] = Rows["TrcSpc"]
+                    Mask[Evt, iCol]   = True
+
+                Pending[0].append(TrcSpc[Keep])
+                Pending[1].append(Mask[Keep])
+                Pending[2].append(Spc[Keep])
+                nPndng += np.count_nonzero(Keep)
+
+                while nPndng >= batchSize:
+                    Pending = [[np.concatenate(Arrs)] for Arrs in Pending]
+                    yield tuple(Arrs[0][:batchSize] for Arrs in Pending)
+                    Pending = [[Arrs[0][batchSize:]] for Arrs in Pending]
+                    nPndng -= batchSize
+
+            if nPndng > 0:
+                yield tuple(np.concatenate(Arrs) for Arrs in Pending)
+            return
+
+        #.. Record-by-record file; each particle is discarded once copied:
+        self.getdataFILE().seek(self._DataStrt)
+        TrcSpc, Mask, Spc = [], [], []
+        while True:
+            nPrtcl = len(Prtcl.Particle.getinstances())
+            if self.readBeamDataRecord():
+                break
+            if len(Prtcl.Particle.getinstances()) == nPrtcl:
+                continue
+            iPrtcl = Prtcl.Particle.getinstances().pop()
+
+            iSpc = self.SpeciesIndex(iPrtcl.getSpecies())
+            if Spcs != None and iSpc not in Spcs:
+                continue
+            TrcSpc.append(np.zeros((nSel, 6)))
+            Mask.append(np.zeros(nSel, dtype=bool))
+            Spc.append(iSpc)
+            for Loc, TrcSpc1 in zip(iPrtcl.getLocation(), \
+                                    iPrtcl.getTraceSpace()):
+                iCol = Col.get(Loc)
+                if iCol != None:
+                    TrcSpc[-1][iCol] = TrcSpc1
+                    Mask[-1][iCol]   = True
+
+            if len(Spc) == batchSize:
+                yield np.array(TrcSpc), np.array(Mask), \
+                      np.array(Spc, dtype="<i2")
+                TrcSpc, Mask, Spc = [], [], []
+
+        if len(Spc) > 0:
+            yield np.array(TrcSpc), np.array(Mask), \
+                  np.array(Spc, dtype="<i2")
+
+    def writeIndex(self, Index):
+        with open(self.getpathFILE() + ".idx", "wb") as IdxFILE:
+            IdxFILE.write(strct.pack("<2q", \
+                                     os.path.getsize(self.getpathFILE()), \
+                                     len(Index)))
+            IdxFILE.write(Index.astype(BeamIO.IndexDtype).tobytes())
+
+    def seek(self, iEvt):
+        Index = self.getIndex()
+        if not isinstance(iEvt, (int, np.integer)) or \
+           iEvt < 0 or iEvt > len(Index):
+            raise badArgument( \
+                    " BeamIO.seek: event " + str(iEvt) + " not in file.")
+
+        nPftch = self.getPrefetch()
+        self.setPrefetch(0)
+        if iEvt == len(Index):
+            self.getdataFILE().seek(0, 2)
+            self._Blk = None
+        elif self.getdataFILEversion() >= 9:
+            self.getdataFILE().seek(int(Index["Offset"][iEvt]))
+            self.readBlock()
+            self._Blk["iEvt"] = int(Index["iInBlk"][iEvt])
+        else:
+            self.getdataFILE().seek(int(Index["Offset"][iEvt]))
+        self.setPrefetch(nPftch)
+
+        if self.getDebug():
+            print(" BeamIO.seek: positioned at event", iEvt)
+
+    def readRange(self, start, stop):
+        stop = min(stop, len(self.getIndex()))
+        self.seek(start)
+
+        Prtcls = []
+        for iEvt in range(start, stop):
+            nPrtcl = len(Prtcl.Particle.getinstances())
+            if self.readBeamDataRecord():
+                break
+            if len(Prtcl.Particle.getinstances()) > nPrtcl:
+                Prtcls.append(Prtcl.Particle.getinstances()[-1])
+
+        return Prtcls
+
+    def appendShard(self, ShardPATH):
+        #.. Shard index offsets are relative to the shard; shift them to
+        #   the position of the shard in the file being written.
+        self.drainWriter()
+        dataFILE = self.getdataFILE()
+        dataFILE.flush()
+        Base = dataFILE.tell()
+        with open(ShardPATH, "rb") as ShardFILE:
+            shutil.copyfileobj(ShardFILE, dataFILE)
+        os.remove(ShardPATH)
+
+        if os.path.isfile(ShardPATH + ".idx"):
+            with open(ShardPATH + ".idx", "rb") as IdxFILE:
+                IdxFILE.read(16)
+                Idx = np.frombuffer(IdxFILE.read(), \
+                                    dtype=BeamIO.IndexDtype).copy()
+            os.remove(ShardPATH + ".idx")
+            Idx["Offset"] += Base
+            self._IdxBlks.append(Idx)
+
+    @classmethod
+    def mergeFiles(cls, MergedPATH, ShardPATHs):
+        #.. Shards must start with byte-identical headers (version,
+        #   repository version, beam line and, version >= 9,
+        #   dictionary), checked by hash; event sections are then
+        #   copied without decoding.  Blocks are self contained, so the
+        #   index of the merged file is rebuilt from block headers.
+        if not isinstance(ShardPATHs, (list, tuple)) or \
+           len(ShardPATHs) == 0:
+            raise badArgument(" BeamIO.mergeFiles: no shards given.")
+        if MergedPATH in ShardPATHs:
+            raise badArgument( \
+                " BeamIO.mergeFiles: merged file is one of the shards.")
+
+        Frst = cls(None, ShardPATHs[0])
+        Frst.readBeamDataRecord()
+        Frst.getdataFILE().seek(0)
+        Hdr  = Frst.getdataFILE().read(Frst._DataStrt)
+        Hash = hashlib.sha256(Hdr).hexdigest()
+        if Frst.getdataFILEversion() < 2:
+            Frst.getdataFILE().close()
+            raise badShard(" BeamIO.mergeFiles: " + ShardPATHs[0] + \
+                           " has no header (version 1).")
+
+        for ShardPATH in ShardPATHs[1:]:
+            with open(ShardPATH, "rb") as ShardFILE:
+                ShardHash = hashlib.sha256(ShardFILE.read(len(Hdr))). \
+                            hexdigest()
+            if ShardHash != Hash:
+                Frst.getdataFILE().close()
+                raise badShard(" BeamIO.mergeFiles: header of " + \
+                               ShardPATH + " differs from that of " + \
+                               ShardPATHs[0])
+
+        with open(MergedPATH, "wb") as MergedFILE:
+            MergedFILE.write(Hdr)
+            for ShardPATH in ShardPATHs:
+                with open(ShardPATH, "rb") as ShardFILE:
+                    ShardFILE.seek(len(Hdr))
+                    shutil.copyfileobj(ShardFILE, MergedFILE)
+
+        Mrgd = cls(None, MergedPATH)
+        for Attr in ["_Rd1stRcrd", "_dataFILEversion", "_repoVERSION", \
+                     "_LocDict", "_SpcDict", "_LocZs", "_DataStrt"]:
+            setattr(Mrgd, Attr, getattr(Frst, Attr))
+        Frst.getdataFILE().close()
+        Mrgd.getdataFILE().seek(Mrgd._DataStrt)
+        Mrgd._Index = Mrgd.buildIndex()
+        Mrgd.writeIndex(Mrgd._Index)
+
+        if cls.getDebug():
+            print(" BeamIO.mergeFiles:", len(ShardPATHs), "shards,", \
+                  len(Mrgd._Index), "events; header sha256:", Hash)
+
+        return Mrgd
+
+#.. Conversion of legacy files:
+    @classmethod
+    def convertFile(cls, InPATH, OutPATH, dataFILEversion=None, \
+                    Storage=None, beamlineCSV=None):
+        #.. Streams events from file of any version read by
+        #   readBeamDataRecord to a new file; each particle is buffered
+        #   and cleaned as it is written, so memory is bounded by one
+        #   block (encoded in the writer thread, version >= 9).
+        tStrt = time.perf_counter()
+        Rdr   = cls(None, InPATH)
+        Rdr.readBeamDataRecord()
+        if BL.BeamLine.getinstances() == None:
+            if beamlineCSV == None:
+                raise badArgument(" BeamIO.convertFile: " + InPATH + \
+                    " holds no beam line and no specification given.")
+            BL.BeamLine(beamlineCSV)
+
+        Wrtr = cls(None, OutPATH, True, False, dataFILEversion)
+        if Storage != None:
+            Wrtr.setStorage(*Storage)
+        if Wrtr.getdataFILEversion() >= 9:
+            Wrtr.setAsyncWrite(True)
+        BL.BeamLine.getinstances().writeBeamLine(Wrtr.getdataFILE())
+
+        nEvt = 0
+        while not Rdr.readBeamDataRecord():
+            iPrtcl = Prtcl.Particle.getinstances()[-1]
+            if not isinstance(iPrtcl, Prtcl.ReferenceParticle):
+                iPrtcl.writeParticle(Wrtr.getdataFILE())
+                nEvt += 1
+        Wrtr.flushNclosedataFile(Wrtr.getdataFILE())
+        Rdr.getdataFILE().close()
+
+        Time = time.perf_counter() - tStrt
+        Stats = {"Input": InPATH, "Output": OutPATH, \
+                 "InVersion": Rdr.getdataFILEversion(), \
+                 "OutVersion": Wrtr.getdataFILEversion(), \
+                 "nEvt": nEvt, "Time": Time, \
+                 "EvtPerSec": nEvt / Time if Time > 0. else None, \
+                 "InBytes": os.path.getsize(InPATH), \
+                 "OutBytes": os.path.getsize(OutPATH)}
+
+        if cls.getDebug():
+            print(" BeamIO.convertFile:", Stats)
+
+        return Stats
+
+    @classmethod
+    def convertFiles(cls, Jobs, nWorkers=1, dataFILEversion=None, \
+                     Storage=None, beamlineCSV=None):
+        #.. Each file is converted in its own forked process; a pool of
+        #   nWorkers processes works through the list.
+        if not isinstance(nWorkers, int) or nWorkers < 1:
+            raise badArgument(" BeamIO.convertFiles: bad number of workers.")
+
+        tStrt = time.perf_counter()
+        Args  = [ (InPATH, OutPATH, dataFILEversion, Storage, beamlineCSV) \
+                  for InPATH, OutPATH in Jobs ]
+        with mp.get_context("fork").Pool(min(nWorkers, max(1, len(Jobs))), \
+                                         maxtasksperchild=1) as Pool:
+            Stats = Pool.starmap(convertWorker, Args, chunksize=1)
+        Time  = time.perf_counter() - tStrt
+
+        nEvt  = sum([iStats["nEvt"] for iStats in Stats])
+        Total = {"nFiles": len(Stats), "nEvt": nEvt, "Time": Time, \
+                 "EvtPerSec": nEvt / Time if Time > 0. else None}
+
+        if cls.getDebug():
+            print(" BeamIO.convertFiles:", Total)
+
+        return Stats, Total
+
 #.. Flush and close
     def flushNclosedataFile(self, dataFILE=None):
         if self.getDebug():
@@ -623,6 +2065,17 @@ class BeamIO:
             raise noFILE( \
                     " BeamIO.flushNcloseParticle: file does not exist.")
 
+        if self.getcreate() and self.getdataFILEversion() != None and \
+           self.getdataFILEversion() >= 9 and \
+           dataFILE is self.getdataFILE():
+            self.writeDictionary()
+            self.writeBlock()
+            self.drainWriter(True)
+
+            dataFILE.flush()
+            if len(self._IdxBlks) > 0:
+                self.writeIndex(np.concatenate(self._IdxBlks))
+
         dataFILE.flush()
         dataFILE.close()
 
@@ -660,4 +2113,7 @@ class badCreate(Exception):
 
 class badArgument(Exception):
     pass
+
+class badShard(Exception):
+    pass
         
@@ -25,6 +25,10 @@ __BeamLineInst: Instance of BeamLine class.  Set on creation of first
             _BeamLineParamPandas : Pandas data frame instance containing
                                    parameters.
                       _SrcTrcSpc : 6D trace space at source (np.ndarray)
+                        _Observe : List of observation points (element
+                                   names, trailing parts of names, or
+                                   indices) at which trackBeam writes the
+                                   particle; None means every element.
     
   Methods:
   --------
@@ -39,6 +43,10 @@ __BeamLineInst: Instance of BeamLine class.  Set on creation of first
     setSrcTrcSpc: Set trace space at source.
              Input: np.array([6,]) containing 6D trace space vector.
 
+      setObserve: Set observation points.
+             Input: None, or list of element names (or trailing parts
+                    of names, e.g. "Arc:Dipole:2") and/or indices
+
   Get methods:
      getinstance: Get instance of beam class
       getDebug  : get debug flag
@@ -49,6 +57,7 @@ getBeamLineParamPandas:
       getElement: get list of instances of BeamLineElement objects that make
                   up the beam line
     getSrcTrcSpc: get source trace space nd.array(6,)
+      getObserve: get list of observation points (None if not set)
 
   Processing method:
       print()   : Dumps parameters
@@ -83,7 +92,59 @@ getBeamLineParamPandas:
                 Input: None
                Return: True/False: consistent/not consistent
 
-          trackBeam: Tracks through the beam line.
+          trackBeam: Tracks through the beam line.  If observation
+                     points are set (setObserve, or "Observation point"
+                     rows of the Facility section of the specification
+                     file) each particle is still tracked through every
+                     element, but is written only at the source, the
+                     observation points and, for particles that are
+                     lost, the last location reached.
+                Input: NEvts, ParticleFILE, iParticle, LocStrt,
+                       CleanAfterWrite, trackDECAYproducts, Observe
+                       [optional list of observation points; default
+                       getObserve()]
+
+       parseObserve: Parse observation points from pandas dataframe
+               Return: list of element names, or None if none given
+
+  ObservationPoints: Resolve list of observation points to set of the
+                     names of the elements they select
+                Input: Observe [list of names, trailing parts of names
+                       or indices]
+               Return: set of element names
+
+      applyObserve: Remove records not at an observation point from a
+                     particle, keeping the first record and the loss
+                     point.
+                Input: Particle instance, set of observed element names
+
+     trackBeamBatch: Tracks events through the beam line in batches; each
+                     element transports an (N,6) array of trace-space
+                     vectors and losses are tracked with a survival mask.
+                     Records and writes Particle instances identical to
+                     those produced by trackBeam, including the last
+                     location reached by particles that are lost.
+                     Unstable species are handed to trackBeam.
+                Input: NEvts, ParticleFILE, SrcTrcSpcs [optional (N,6)
+                       source trace spaces], BatchSize, CleanAfterWrite,
+                       Observe [optional list of element names or indices
+                       at which trace space is recorded; default
+                       getObserve(), all if not set]
+
+     compileLattice: Groups beam-line elements into segments for batch
+                     tracking.  Consecutive aligned Drift and Octupole
+                     (drift-like) elements are fused as long as no
+                     observation point lies inside the run; x, y and z
+                     then advance by the cumulative drift coefficients,
+                     without matrix products, and the beam-pipe and z
+                     cuts are applied at each element's entrance.
+                Input: Observe [as for trackBeamBatch]
+               Return: list of segments
+
+         DriftBatch: Static; advance (N,6) trace space through a
+                     drift-like map
+                Input: TrcSpc[N,6], Crdnts [Lx, Ly, Lz] (or [N,3])
+               Return: TrcSpc[N,6] with x + Lx x', y + Ly y', z + Lz delta
 
   I/o methods:
 To be added ...
@@ -135,6 +196,7 @@ class BeamLine(object):
     __BeamLineInst = None
     __Debug        = False
     _SrcTrcSpc     = None
+    _Observe       = None
 
     _currentReferenceParticle = None
 
@@ -242,6 +304,9 @@ class BeamLine(object):
             if cls.getDebug():
                 print("        <---- Reference particle completion done. ")
 
+#    ----> Observation points:  --------  --------  --------  --------
+            cls.setObserve(cls.parseObserve())
+
 #    <---- Completed reference particles  --------  --------  --------
 
         else:
@@ -316,6 +381,10 @@ class BeamLine(object):
                     print( \
                   "         <---- Reference particle for species:", \
                            iRefPrtcl.getSpecies(), "done.")
+
+        #.. Tabulate reference kinematics, read by index when tracking:
+        for iRefPrtcl in Prtcl.ReferenceParticle.getinstances("All"):
+            iRefPrtcl.setKinematics()
                         
         if cls.getDebug():
             print(" <---- Reference particle completion done. ")
@@ -330,6 +399,7 @@ class BeamLine(object):
         cls._BeamLineParamPandas           = None
         cls._SrcTrcSpc                     = []
         cls._currentReferenceParticle      = None
+        cls._Observe                       = None
 
     @classmethod
     def setDebug(cls, Debug=False):
@@ -380,6 +450,23 @@ class BeamLine(object):
                         " BeamLine.setSrcTrcSpc:", SrcTrcSpc)
 
         cls._SrcTrcSpc = SrcTrcSpc
+
+    @classmethod
+    def setObserve(cls, _Observe=None):
+        if cls.getDebug():
+            print(" BeamLine.setObserve: ", _Observe)
+
+        if isinstance(_Observe, (str, int)):
+            _Observe = [_Observe]
+        if _Observe != None:
+            if not isinstance(_Observe, (list, tuple)):
+                raise badParameter(" BeamLine.setObserve:", _Observe)
+            for Point in _Observe:
+                if not isinstance(Point, (str, int)):
+                    raise badParameter(" BeamLine.setObserve:", Point)
+            _Observe = list(_Observe)
+
+        cls._Observe = _Observe
         
 #--------  "Get methods"
 #.. Method believed to be self documenting(!)
@@ -410,6 +497,10 @@ class BeamLine(object):
     @classmethod
     def getSrcTrcSpc(cls):
         return cls._SrcTrcSpc
+
+    @classmethod
+    def getObserve(cls):
+        return cls._Observe
     
         
 #--------  Processing methods:
@@ -476,6 +567,22 @@ class BeamLine(object):
             print(SourceBLE)
             print("                 <---- Done.")
 
+    @classmethod
+    def parseObserve(cls):
+        #.. "Observation point" rows of the Facility section, one per
+        #   element, name (or trailing part of name) in the Value column:
+        pndsParams   = cls.getBeamLineParamPandas()
+        pndsObserve  = pndsParams[ (pndsParams["Section"] == "Facility") & \
+                                   (pndsParams["Type"] == "Observation point") ]
+        Observe = None
+        if not pndsObserve.empty:
+            Observe = [str(Value).strip() for Value in pndsObserve["Value"]]
+
+        if cls.getDebug():
+            print("                 ----> BeamLine.parseObserve:", Observe)
+
+        return Observe
+
     @classmethod
     def parseFacility(cls):
         Name  = None
@@ -1324,7 +1431,7 @@ class BeamLine(object):
     @classmethod
     def trackBeam(cls, NEvts=0, ParticleFILE=None, \
                   iParticle=None, LocStrt=None, CleanAfterWrite=True, \
-                  trackDECAYproducts=False):
+                  trackDECAYproducts=False, Observe=None):
         if cls.getDebug():
             print(" BeamLine.trackBeam start")
             print("     ----> NEvts:", NEvts)
@@ -1335,6 +1442,10 @@ class BeamLine(object):
                 print("     ----> iParticle:", id(iParticle))
             print("     ----> LocStrt:", LocStrt)
             print("     ----> CleanAfterWrite:", CleanAfterWrite)
+            print("     ----> Observe:", Observe)
+
+        if Observe == None:
+            Observe = cls.getObserve()
 
         if isinstance(iParticle, Prtcl.Particle): NEvts = 1
         if (cls.getDebug() or NEvts > 1) and \
@@ -1345,6 +1456,11 @@ class BeamLine(object):
 
         iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
 
+        Observed = None
+        if Observe != None and \
+           isinstance(ParticleFILE, io.BufferedWriter):
+            Observed = cls.ObservationPoints(Observe)
+
         for iEvt in range(0, NEvts):
             if (iEvt % Scl) == 0:
                 if (cls.getDebug() or NEvts > 1) and \
@@ -1369,17 +1485,8 @@ class BeamLine(object):
                 if iLoc-1 >= len(PrtclInst.getTraceSpace()):
                     continue
                 
-                del PrtclInst.getLocation() \
-                    [iLoc:len(PrtclInst.getLocation())]
-                del PrtclInst.getz()[iLoc:len(PrtclInst.getz())]
-                del PrtclInst.gets()[iLoc:len(PrtclInst.gets())]
-                del PrtclInst.getTraceSpace() \
-                    [iLoc:len(PrtclInst.getTraceSpace())]
-                del PrtclInst.getRPLCPhaseSpace()\
-                    [iLoc:len(PrtclInst.getRPLCPhaseSpace())]
-                del PrtclInst.getLabPhaseSpace()\
-                    [iLoc:len(PrtclInst.getLabPhaseSpace())]
-                SrcTrcSpc = PrtclInst.getTraceSpace()[iLoc-1]
+                PrtclInst.truncateRecords(iLoc)
+                SrcTrcSpc = PrtclInst.getTraceSpace()[iLoc-1].copy()
             else:
                 PrtclInst   = Prtcl.Particle.createParticle()
                 if cls.getDebug():
@@ -1414,6 +1521,8 @@ class BeamLine(object):
             if isinstance(ParticleFILE, io.BufferedWriter):
                 if cls.getDebug():
                     print("     ----> Write particle to file:", ParticleFILE)
+                if Observed != None:
+                    cls.applyObserve(PrtclInst, Observed)
                 PrtclInst.writeParticle(ParticleFILE, CleanAfterWrite)
                 if CleanAfterWrite:
                     Prtcl.Particle.cleanParticles()
@@ -1499,6 +1608,8 @@ class BeamLine(object):
                         if cls.getDebug():
                             print("     ----> Write particle to file:", \
                                   ParticleFILE)
+                        if Observed != None:
+                            cls.applyObserve(iPRDCT, Observed)
                         iPRDCT.writeParticle(ParticleFILE, CleanAfterWrite)
                         if CleanAfterWrite:
                             Prtcl.Particle.cleanParticles()
@@ -1519,7 +1630,48 @@ class BeamLine(object):
                   " events generated")
 
 
-            
+
+    @classmethod
+    def ObservationPoints(cls, Observe):
+        #.. Names of the elements selected by Observe; an entry selects
+        #   an element if it is its index, its name or the trailing part
+        #   of its name following a ":":
+        Observed = set()
+        for iLoc, iBLE in enumerate(BLE.BeamLineElement.getinstances()):
+            Name = iBLE.getName()
+            for Point in Observe:
+                if (isinstance(Point, str) and \
+                    (Name == Point or Name.endswith(":"+Point))) or \
+                   (isinstance(Point, int) and Point == iLoc):
+                    Observed.add(Name)
+                    break
+
+        if cls.getDebug():
+            print(" BeamLine.ObservationPoints:", len(Observed), \
+                  "elements observed.")
+
+        return Observed
+
+    @classmethod
+    def applyObserve(cls, PrtclInst, Observed):
+        #.. Keep first record (source or start of track), records at
+        #   observation points and, if the particle did not reach the
+        #   end of the beam line, the record at which it was lost:
+        Location = PrtclInst.getLocation()
+        nRcrd    = len(Location)
+        LastName = BLE.BeamLineElement.getinstances()[-1].getName()
+        Keep     = [iRcrd for iRcrd in range(nRcrd) \
+                    if iRcrd == 0 or Location[iRcrd] in Observed or \
+                       (iRcrd == nRcrd-1 and Location[iRcrd] != LastName)]
+        if len(Keep) == nRcrd:
+            return
+
+        PrtclInst.keepRecords(Keep)
+
+        if cls.getDebug():
+            print(" BeamLine.applyObserve:", len(Keep), "of", nRcrd, \
+                  "records kept.")
+
     @staticmethod
     def trackPARTICLE(SrcTrcSpc, LocStrt, iRefPrtcl, PrtclInst):
         #.. Track particle through beam line:
@@ -1582,6 +1734,310 @@ class BeamLine(object):
         if BeamLine.getDebug():
             print(" <---- Reached end of beam line.")
 
+    @classmethod
+    def trackBeamBatch(cls, NEvts=0, ParticleFILE=None, SrcTrcSpcs=None, \
+                       BatchSize=10000, CleanAfterWrite=True, Observe=None):
+        if cls.getDebug():
+            print(" BeamLine.trackBeamBatch start")
+            print("     ----> NEvts:", NEvts)
+            print("     ----> ParticleFILE:", ParticleFILE)
+            print("     ----> BatchSize:", BatchSize)
+            print("     ----> CleanAfterWrite:", CleanAfterWrite)
+            print("     ----> Observe:", Observe)
+
+        if isinstance(SrcTrcSpcs, np.ndarray):
+            SrcTrcSpcs = SrcTrcSpcs.reshape(-1, 6)
+            NEvts      = SrcTrcSpcs.shape[0]
+        if not isinstance(BatchSize, int) or BatchSize < 1:
+            raise badParameter(" BeamLine.trackBeamBatch: bad BatchSize:", \
+                               BatchSize)
+
+        if Observe == None:
+            Observe = cls.getObserve()
+
+        iRefPrtcl = cls.getcurrentReferenceParticle()
+
+        #.. Decays are handled particle by particle:
+        if iRefPrtcl.getSpecies() in Prtcl.Particle.unstable_species:
+            if cls.getDebug():
+                print("     ----> Unstable species, track one by one.")
+            if not isinstance(SrcTrcSpcs, np.ndarray):
+                cls.trackBeam(NEvts, ParticleFILE, None, None, \
+                              CleanAfterWrite, Observe=Observe)
+                return
+            for SrcTrcSpc in SrcTrcSpcs:
+                PrtclInst = Prtcl.Particle.createParticle()
+                PrtclInst.recordParticle(cls.getElement()[1].getName(), \
+                                         0., 0., np.array(SrcTrcSpc))
+                cls.trackBeam(1, ParticleFILE, PrtclInst, None, \
+                              CleanAfterWrite, Observe=Observe)
+            return
+
+        if (cls.getDebug() or NEvts > 1) and \
+           Smltn.Simulation.getProgressPrint():
+            print("     ----> BeamLine.trackBeamBatch for", NEvts, \
+                  " events in batches of", BatchSize)
+
+        Segments = cls.compileLattice(Observe)
+
+        for iStrt in range(0, NEvts, BatchSize):
+            nBtch = min(BatchSize, NEvts-iStrt)
+            if (cls.getDebug() or NEvts > 1) and \
+               Smltn.Simulation.getProgressPrint():
+                print("         ----> Generating events ", iStrt, \
+                      "to", iStrt+nBtch-1)
+
+            #.. Generate batch at source:
+            if isinstance(SrcTrcSpcs, np.ndarray):
+                Name      = cls.getElement()[1].getName()
+                SrcTrcSpc = np.array(SrcTrcSpcs[iStrt:iStrt+nBtch], \
+                                     dtype=float)
+            elif isinstance(cls.getSrcTrcSpc(), np.ndarray):
+                Name      = BLE.BeamLineElement.getinstances()[0].getName()+\
+                    ":Source:User"
+                SrcTrcSpc = np.tile(cls.getSrcTrcSpc(), (nBtch, 1))
+            else:
+                Name      = cls.getElement()[1].getName()
+                SrcTrcSpc = cls.getElement()[1].getParticles(nBtch)
+
+            #.. Track batch through beam line:
+            Locations, s, TrcSpc, nRcrd, LossCode, LossPoint = \
+                cls.trackPARTICLEbatch(SrcTrcSpc, Segments)
+            if cls.getDebug():
+                for iCode in np.unique(LossCode):
+                    print("         ---->", \
+                          BLE.BeamLineElement.getLossReason(iCode), ":", \
+                          np.count_nonzero(LossCode == iCode))
+
+            #.. Record and write events:
+            for iPrtcl in range(nBtch):
+                PrtclInst = Prtcl.Particle.createParticle()
+                nHstry    = nRcrd[iPrtcl]
+                PrtclInst.recordParticle(Name, 0., 0., TrcSpc[iPrtcl, 0])
+                PrtclInst.recordParticleBlock(Locations[:nHstry], \
+                                              -999999., \
+                                              s[:nHstry], \
+                                              TrcSpc[iPrtcl, 1:nHstry+1])
+
+                #.. Last location reached by a lost particle, as kept by
+                #   applyObserve:
+                iLast = LossPoint[0][iPrtcl]
+                if iLast >= 0:
+                    LastName = \
+                        BLE.BeamLineElement.getinstances()[iLast].getName()
+                    if nHstry == 0 or Locations[nHstry-1] != LastName:
+                        PrtclInst.recordParticle(LastName, -999999., \
+                                                 LossPoint[1][iPrtcl], \
+                                                 LossPoint[2][iPrtcl])
+
+                if isinstance(ParticleFILE, io.BufferedWriter):
+                    PrtclInst.writeParticle(ParticleFILE, CleanAfterWrite)
+                    if CleanAfterWrite:
+                        Prtcl.Particle.cleanParticles()
+
+        if (cls.getDebug() or NEvts > 1) and \
+        Smltn.Simulation.getProgressPrint():
+            print(" <---- End of this simulation, ", NEvts, \
+                  " events generated")
+
+    @staticmethod
+    def trackPARTICLEbatch(SrcTrcSpc, Segments=None):
+        #.. Track (N,6) batch through beam line segment by segment (see
+        #   compileLattice).  Returns names and s of the locations
+        #   recorded, the (N, nLoc+1, 6) trace-space history (source
+        #   first), the number of locations each particle reached, the
+        #   loss-reason code (BeamLineElement.LossReasons; 0 if the
+        #   particle reached the end of the beam line) and the loss
+        #   point, [iLoc, s, TrcSpc], of the last element each lost
+        #   particle passed through (iLoc = -1 if none or not lost).
+        if BeamLine.getDebug():
+            print(" BeamLine.trackPARTICLEbatch:", \
+                  "Transport batch of", SrcTrcSpc.shape[0], \
+                  "particles through beam line")
+
+        if Segments == None:
+            Segments = BeamLine.compileLattice()
+
+        nPrtcl    = SrcTrcSpc.shape[0]
+        TrcSpc    = np.array(SrcTrcSpc, dtype=float)
+        Alive     = np.ones(nPrtcl, dtype=bool)
+        nRcrd     = np.zeros(nPrtcl, dtype=int)
+        LossCode  = np.zeros(nPrtcl, dtype=np.int8)
+        Locations = []
+        s         = []
+        Hstry     = [TrcSpc.copy()]
+        LossPoint = [np.full(nPrtcl, -1, dtype=int), np.zeros(nPrtcl), \
+                     TrcSpc.copy()]
+
+        sEnd  = 0.
+        iPrev = -1
+        for Sgmnt in Segments:
+            iAlive = np.flatnonzero(Alive)
+            if len(iAlive) == 0:
+                break
+
+            iBLE  = BLE.BeamLineElement.getinstances()[Sgmnt[1]]
+            sStrt = sEnd
+            TrcSpcIn = TrcSpc[iAlive]
+            nPassed  = np.zeros(len(iAlive), dtype=int)
+            if not isinstance(Sgmnt[2], np.ndarray):
+                TrcSpcOut, Ok, Loss = iBLE.TransportBatch(TrcSpcIn)
+            else:
+                #.. Fused drift-like segment; full acceptance at its
+                #   entrance, then beam-pipe and z cuts at each inner
+                #   entrance.  x', y' and delta are constant along the
+                #   run, so the expansion parameter is unchanged:
+                iBLEstrt  = BLE.BeamLineElement.getinstances()[Sgmnt[0]]
+                Ok, Loss  = iBLEstrt.Acceptance(TrcSpcIn)
+                VCMVr     = BLE.Facility.getinstances().getVCMVr()
+                for Crdnts in Sgmnt[2][:-1]:
+                    nPassed[Ok] += 1
+                    x    = TrcSpcIn[:,0] + Crdnts[0]*TrcSpcIn[:,1]
+                    y    = TrcSpcIn[:,2] + Crdnts[1]*TrcSpcIn[:,3]
+                    z    = TrcSpcIn[:,4] + Crdnts[2]*TrcSpcIn[:,5]
+                    Fail = Ok & (np.sqrt(x**2 + y**2) >= VCMVr)
+                    Loss[Fail] = 2
+                    Ok[Fail]   = False
+                    Fail = Ok & np.logical_not(np.abs(z) <= 5.)
+                    Loss[Fail] = 4
+                    Ok[Fail]   = False
+                TrcSpcOut = BeamLine.DriftBatch(TrcSpcIn, Sgmnt[2][-1])
+
+            #.. Exit check is against this element's reference velocity:
+            Fail = Ok & iBLE.ExpansionParameterFailBatch(TrcSpcOut)
+            Loss[Fail] = 3
+            Ok[Fail]   = False
+
+            Alive[iAlive[np.logical_not(Ok)]]    = False
+            LossCode[iAlive[np.logical_not(Ok)]] = \
+                Loss[np.logical_not(Ok)]
+            sExt = []
+            for Length in Sgmnt[4]:
+                sEnd = sEnd + Length
+                sExt.append(sEnd)
+
+            #.. Loss point: exit of the last element passed, inside this
+            #   segment (nPassed > 0) or at the end of the previous one:
+            iLost = np.flatnonzero(np.logical_not(Ok))
+            iInsd = iLost[nPassed[iLost] > 0]
+            iPrvs = iAlive[iLost[nPassed[iLost] == 0]]
+            if len(iInsd) > 0:
+                iExt = nPassed[iInsd] - 1
+                LossPoint[0][iAlive[iInsd]] = Sgmnt[0] + iExt
+                LossPoint[1][iAlive[iInsd]] = np.array(sExt)[iExt]
+                LossPoint[2][iAlive[iInsd]] = \
+                    BeamLine.DriftBatch(TrcSpcIn[iInsd], Sgmnt[2][iExt])
+            if iPrev >= 0:
+                LossPoint[0][iPrvs] = iPrev
+                LossPoint[1][iPrvs] = sStrt
+                LossPoint[2][iPrvs] = TrcSpc[iPrvs]
+            iPrev = Sgmnt[1]
+
+            TrcSpc[iAlive[Ok]] = TrcSpcOut[Ok]
+
+            if Sgmnt[3]:
+                nRcrd[iAlive[Ok]] += 1
+                Locations.append(iBLE.getName())
+                s.append(float(sEnd))
+                Hstry.append(TrcSpc.copy())
+
+            if BeamLine.getDebug():
+                print("     ---->", iBLE.getName(), ":", \
+                      np.count_nonzero(Alive), "particles remain")
+
+        if BeamLine.getDebug():
+            print(" <---- Reached end of beam line.")
+
+        return Locations, s, np.stack(Hstry, axis=1), nRcrd, LossCode, \
+            LossPoint
+
+    @staticmethod
+    def DriftBatch(TrcSpc, Crdnts):
+        #.. Drift-like map: x, y and z advance by Lx x', Ly y' and
+        #   Lz delta, Crdnts = [Lx, Ly, Lz] (or one row per particle):
+        TrcSpcOut = np.array(TrcSpc, dtype=float)
+        TrcSpcOut[:, [0, 2, 4]] += TrcSpcOut[:, [1, 3, 5]] * Crdnts
+        return TrcSpcOut
+
+    @classmethod
+    def compileLattice(cls, Observe=None):
+        #.. Group beam-line elements into segments.  Runs of aligned
+        #   Drift and Octupole elements, ending at an observation point,
+        #   are fused.  Their transfer matrices are the identity plus
+        #   the (x, x'), (y, y') and (z, delta) terms [Lx, Ly, Lz], which
+        #   add along the run, so a run is tracked with the cumulative
+        #   coefficients at each element's exit instead of matrix
+        #   products.  Elements that change the reference momentum
+        #   (CylindricalRFCavity) or carry an aperture are never fused.
+        #   Observe: list of observation points (see
+        #   ObservationPoints) at which the trace space is to be
+        #   recorded; None means everywhere.
+        #   Each segment is a list:
+        #     [iFirst, iLast, Drift, Record, Lengths]
+        #   with Drift = None for a single element, which is then
+        #   transported using its own TransportBatch, or the (n, 3)
+        #   array of cumulative [Lx, Ly, Lz] at the exit of each of the
+        #   n elements of a fused run.
+        if cls.getDebug():
+            print(" BeamLine.compileLattice: start")
+            print("     ----> Observe:", Observe)
+
+        if Observe != None:
+            Observed = cls.ObservationPoints(Observe)
+
+        Segments = []
+        Open     = None
+        for iLoc, iBLE in enumerate(BLE.BeamLineElement.getinstances()):
+            if isinstance(iBLE, BLE.Source) or \
+               isinstance(iBLE, BLE.Facility):
+                continue
+
+            Record = Observe is None or iBLE.getName() in Observed
+
+            Fusable = (isinstance(iBLE, BLE.Drift) or \
+                       isinstance(iBLE, BLE.Octupole)) and \
+                      not iBLE.getShifted() and not iBLE.getTilted()
+
+            if not Fusable:
+                if Open != None:
+                    Segments.append(Open)
+                    Open = None
+                Segments.append([iLoc, iLoc, None, Record, \
+                                 [iBLE.getLength()]])
+                continue
+
+            TrnsMtrx = np.array(iBLE.getTransferMatrix(), dtype=float)
+            Crdnts   = TrnsMtrx[[0, 2, 4], [1, 3, 5]]
+            if Open == None:
+                Open = [iLoc, iLoc, [Crdnts], Record, [iBLE.getLength()]]
+            else:
+                Open[1] = iLoc
+                Open[2].append(Open[2][-1] + Crdnts)
+                Open[3] = Record
+                Open[4].append(iBLE.getLength())
+
+            if Record:
+                Segments.append(Open)
+                Open = None
+
+        if Open != None:
+            Segments.append(Open)
+
+        #.. A run of one element is transported by the element itself:
+        for Sgmnt in Segments:
+            if isinstance(Sgmnt[2], list):
+                Sgmnt[2] = np.array(Sgmnt[2]) if len(Sgmnt[2]) > 1 \
+                           else None
+
+        if cls.getDebug():
+            nBLE = 0
+            for Sgmnt in Segments:
+                nBLE += len(Sgmnt[4])
+            print(" <----", nBLE, "elements compiled into", \
+                  len(Segments), "segments.")
+
+        return Segments
+
     @classmethod
     def checkDecay(cls, iBLE, iRefPrtcl, PrtclInst, iLoc, TrcSpc):
         decayed = False
@@ -1596,10 +2052,9 @@ class BeamLine(object):
                 print("         ----> Length of element:", \
                       iBLE.getLength())
                         
-            m = \
-        PhysCnsts.PhysicalConstants().getparticleMASS(PrtclInst.getSpecies())
-            E = iRefPrtcl.getPrOut()[iLoc-1][3] + \
-                         TrcSpc[5] * iRefPrtcl.getMomentumOut(iLoc-1)
+            m   = constants_instance.getparticleMASS(PrtclInst.getSpecies())
+            Kin = iRefPrtcl.getKinematics()
+            E = Kin["E0"][iLoc-1] + TrcSpc[5] * Kin["p0"][iLoc-1]
             p = mth.sqrt(E**2 - m**2)
             if cls.getDebug():
                 print("         ----> iLoc, E, p, mass:", iLoc, E, p, m)
@@ -19,6 +19,12 @@ Class BeamLineElement:
       __Debug     : Debug flag
 constants_instance: Instance of PhysicalConstants class
     speed_of_light: Speed of light from PhysicalConstants
+  __TrnsMtrxCacheSize : Maximum number of transfer matrices cached per
+                        element (least recently used dropped first)
+__TrnsMtrxCacheQuantum: Bin width in delta (TraceSpace[5]) used to key the
+                        transfer-matrix cache.  None (default): matrices
+                        are cached only when NOdispersion is set, in which
+                        case the matrix is exact and constant per element.
 
       
   Instance attributes:
@@ -70,6 +76,19 @@ constants_instance: Instance of PhysicalConstants class
      setRot2LbStrt : set rotation matrix totransform from RLBC to lab at
                      start.
 
+  Transfer-matrix cache:
+  setTrnsMtrxCacheSize    : Class method; set cache size per element [int]
+  setTrnsMtrxCacheQuantum : Class method; set delta bin width [int/float > 0,
+                            None disables the cache]
+  resetTrnsMtrxCache      : Class method; empty all caches, zero counters
+  clearTrnsMtrxCache      : Empty this element's cache; called by every
+                            setter of a parameter the transfer matrix
+                            depends on
+  getTrnsMtrxCacheStats   : Return (hits, misses) for this element
+  setTransferMatrixCached : Set transfer matrix for trace space _R from the
+                            cache, calculating it at the delta-bin centre
+                            on a miss.  Returns transfer matrix.
+
   Get methods:
          getDebug  : get debug flag
      getinstances  : get list of instances
@@ -102,7 +121,34 @@ OutsideBeamPipe : Returns true of  particle outside beam pipe defined in
              Input: 6D phase-space vector, np.array.
             Return: Transformed 6D phase-space vector
 
-   
+     Tilt2Local, Tilt2RPLC : Rotate to/from element-centred coordinates
+
+  Shift and tilt methods accept a single 6D vector or an (N,6) array.
+  Whether an element is shifted or tilted is flagged when drStrt and
+  dvStrt are set (getShifted, getTilted); for an aligned element the
+  input is returned unchanged, without a copy.
+
+ TransportBatch : Batch version of Transport.
+             Input: (N,6) np.array of trace-space vectors
+            Return: (N,6) np.array of transported trace-space vectors,
+                    (N,) bool np.array survival mask and (N,) loss-reason
+                    code.  Rows for which the mask is False are lost and
+                    should be ignored.
+
+     Acceptance : Loss criteria (aperture, beam pipe, expansion parameter,
+                  longitudinal displacement) for an (N,6) array.
+             Input: (N,6) np.array in element-local coordinates, cut on
+                    abs(R[4]) (default 5.)
+            Return: (N,) bool survival mask, (N,) int loss-reason code;
+                    getLossReason(code) returns the name in LossReasons.
+
+  Batch versions of the loss criteria (OutsideBeamPipeBatch,
+  ExpansionParameterFailBatch) take (N,6) arrays.  The element's index
+  in the instances list (getiLctn) is set on creation and the
+  reference-particle velocity at entrance (getRefb0) is held, so neither
+  is recomputed per particle.
+
+
   I/o methods:
       writeElement : Class method; write element data to "dataFILE"
           i/p: dataFILE; i.o writer
@@ -134,7 +180,7 @@ Created on Mon 12Jun23: Version history:
 
 import warnings as wrnngs
 
-from copy import deepcopy
+from collections import OrderedDict
 import matplotlib.patches as patches
 import scipy  as sp
 import numpy  as np
@@ -188,6 +234,15 @@ class BeamLineElement:
     __Debug        = False
     __NOdispersion = False
 
+#.. Transfer-matrix cache; size per element and quantum in delta.  Quantum
+#   None means matrices are only cached when NOdispersion is set:
+    __TrnsMtrxCacheSize    = 256
+    __TrnsMtrxCacheQuantum = None
+
+#.. Loss-reason codes returned by the acceptance kernel; index is the code:
+    LossReasons = ("Survived", "Aperture", "BeamPipe", \
+                   "ExpansionParameter", "Longitudinal", "Slope")
+
 #--------  "Built-in methods":
     def __init__(self, _Name=None, \
                  _rStrt=None, _vStrt=None, _drStrt=None, _dvStrt=None):
@@ -203,6 +258,7 @@ class BeamLineElement:
         BeamLineElement.instances.append(self)
 
         BeamLineElement.setAll2None(self)
+        self._iLctn = len(BeamLineElement.instances) - 1
         
         if  not isinstance( _Name, str)        or \
             not isinstance( _rStrt, np.ndarray) or \
@@ -275,6 +331,30 @@ class BeamLineElement:
     @classmethod
     def setNOdispersion(cls, _NOdispersion):
         cls.__NOdispersion = _NOdispersion
+        cls.resetTrnsMtrxCache()
+
+    @classmethod
+    def setTrnsMtrxCacheSize(cls, _TrnsMtrxCacheSize):
+        if not isinstance(_TrnsMtrxCacheSize, int) or \
+           _TrnsMtrxCacheSize < 1:
+            raise badParameter( \
+                    " BeamLineElement.setTrnsMtrxCacheSize: bad size:", \
+                               _TrnsMtrxCacheSize)
+        cls.__TrnsMtrxCacheSize = _TrnsMtrxCacheSize
+        cls.resetTrnsMtrxCache()
+
+    @classmethod
+    def setTrnsMtrxCacheQuantum(cls, _TrnsMtrxCacheQuantum):
+        if _TrnsMtrxCacheQuantum is not None:
+            if isinstance(_TrnsMtrxCacheQuantum, bool) or \
+               not isinstance(_TrnsMtrxCacheQuantum, (int, float)) or \
+               not _TrnsMtrxCacheQuantum > 0.:
+                raise badParameter( \
+                        " BeamLineElement.setTrnsMtrxCacheQuantum:", \
+                        " bad quantum:", _TrnsMtrxCacheQuantum)
+            _TrnsMtrxCacheQuantum = float(_TrnsMtrxCacheQuantum)
+        cls.__TrnsMtrxCacheQuantum = _TrnsMtrxCacheQuantum
+        cls.resetTrnsMtrxCache()
 
     def setAll2None(self):
         self._Name       = None
@@ -282,11 +362,20 @@ class BeamLineElement:
         self._vStrt      = None
         self._drStrt     = None
         self._dvStrt     = None
+        self._Shifted    = False
+        self._Tilted     = False
         self._Length     = None
         self._Strt2End   = None
         self._Rot2LbStrt = None
         self._Rot2LbEnd  = None
         self._TrnsMtrx   = None
+        self._iLctn      = None
+        self._Refb0      = None
+        self._Refb0Key   = None
+
+        self._TrnsMtrxCache       = OrderedDict()
+        self._TrnsMtrxCacheHits   = 0
+        self._TrnsMtrxCacheMisses = 0
     
     def setName(self, _Name):
         if not isinstance(_Name, str):
@@ -317,6 +406,9 @@ class BeamLineElement:
                                " bad start offset:", \
                                _drStrt)
         self._drStrt = _drStrt
+
+        #.. Only the transverse offset enters Shift2Local/Shift2RPLC:
+        self._Shifted = bool(_drStrt[0] != 0. or _drStrt[1] != 0.)
         
     def setdvStrt(self, _dvStrt):
         if not isinstance(_dvStrt, np.ndarray):
@@ -352,6 +444,7 @@ class BeamLineElement:
 
         self._dRotStrt    = np.matmul( R3, np.matmul(R2, R1) )
         self._dRotStrtINV = np.linalg.inv(self._dRotStrt)
+        self._Tilted      = bool(np.linalg.norm(_dvStrt) != 0.)
 
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
@@ -365,6 +458,7 @@ class BeamLineElement:
 
     def setLength(self, _Length):
         self._Length = _Length
+        self.clearTrnsMtrxCache()
 
     def setRot2LbStrt(self):
         if not isinstance(self.getvStrt(), np.ndarray):
@@ -446,6 +540,24 @@ class BeamLineElement:
     @classmethod
     def getNOdispersion(cls):
         return cls.__NOdispersion
+
+    @classmethod
+    def getTrnsMtrxCacheSize(cls):
+        return cls.__TrnsMtrxCacheSize
+
+    @classmethod
+    def getTrnsMtrxCacheQuantum(cls):
+        return cls.__TrnsMtrxCacheQuantum
+
+    def getTrnsMtrxCacheStats(self):
+        return self._TrnsMtrxCacheHits, self._TrnsMtrxCacheMisses
+
+    @classmethod
+    def getLossReason(cls, _LossCode):
+        return cls.LossReasons[int(_LossCode)]
+
+    def getiLctn(self):
+        return self._iLctn
         
     @classmethod
     def getinstances(self):
@@ -466,6 +578,12 @@ class BeamLineElement:
     def getdvStrt(self):
         return self._dvStrt
 
+    def getShifted(self):
+        return self._Shifted
+
+    def getTilted(self):
+        return self._Tilted
+
     def getdRotStrt(self):
         return self._dRotStrt
     
@@ -558,31 +676,37 @@ class BeamLineElement:
             Outside = True
         return Outside
 
+    def getRefb0(self):
+        #.. Reference-particle velocity at entrance to element.  Held
+        #   until the reference particle, or the number of locations at
+        #   which it has been recorded, changes:
+        iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
+        Key       = (id(iRefPrtcl), len(iRefPrtcl.getPrIn()))
+        if Key != self._Refb0Key:
+            iAddr = self.getiLctn() - 1
+            p0    = mth.sqrt(np.dot(iRefPrtcl.getPrIn()[iAddr][:3], \
+                                    iRefPrtcl.getPrIn()[iAddr][:3]))
+            E0    = iRefPrtcl.getPrOut()[iAddr][3]
+            self._Refb0    = p0/E0
+            self._Refb0Key = Key
+        return self._Refb0
+
     def ExpansionParameterFail(self, _R):
-        iLctn = BeamLineElement.getinstances().index(self)
-        iAddr = iLctn - 1
-        
         if self.getDebug():
             print(" Particle.ExpansionParameterFail: start")
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> TraceSpace:", _R)
-                print("     ----> iLctn:", iLctn, self.getName())
-                print("     ----> iAddr:", iAddr)
+                print("     ----> iLctn:", self.getiLctn(), self.getName())
                 
         Fail = False
         
-        iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
-
-        p0    = mth.sqrt(np.dot(iRefPrtcl.getPrIn()[iAddr][:3], \
-                                iRefPrtcl.getPrIn()[iAddr][:3]))
-        E0    = iRefPrtcl.getPrOut()[iAddr][3]
-        b0    = p0/E0
+        b0    = self.getRefb0()
         D     = mth.sqrt(1. + \
                          2.*_R[5]/b0 +
                          _R[5]**2)
         eps   = ( _R[1]**2 + _R[3]**2  ) / (2.*D**2)
         if self.getDebug():
-            print("     ----> p0, E0, b0, D:", p0, E0, b0, D)
+            print("     ----> b0, D:", b0, D)
             print("     <---- Epsilon:", eps)
             
         if eps > 1.0:
@@ -593,10 +717,49 @@ class BeamLineElement:
 
         return Fail
 
-    def Transport(self, __R):        #<---- class BeamLineElement:
-        #.. Protect input vector; planning to transform it to coordinate
-        #   system referred to beam-line element
-        _R = deepcopy(__R)
+    def setTransferMatrixCached(self, _R):
+        #.. Look up transfer matrix in the element's LRU cache.  Key is
+        #   reference species, reference-particle record and delta in
+        #   units of the cache quantum.  On a miss, the matrix is
+        #   calculated at the centre of the delta bin.
+        iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
+        Quantum   = BeamLineElement.getTrnsMtrxCacheQuantum()
+
+        if BeamLineElement.getNOdispersion():
+            iDelta = None
+        elif Quantum is None:
+            self.setTransferMatrix(_R)
+            return self.getTransferMatrix()
+        else:
+            iDelta = int(round(_R[5] / Quantum))
+
+        Key = (iRefPrtcl.getSpecies(), len(iRefPrtcl.getPrOut()), iDelta)
+        if Key in self._TrnsMtrxCache:
+            self._TrnsMtrxCacheHits += 1
+            self._TrnsMtrxCache.move_to_end(Key)
+            self._TrnsMtrx = self._TrnsMtrxCache[Key]
+        else:
+            self._TrnsMtrxCacheMisses += 1
+            _Rq = np.zeros(6)
+            if iDelta is not None:
+                _Rq[5] = iDelta * Quantum
+            self.setTransferMatrix(_Rq)
+            self._TrnsMtrxCache[Key] = self.getTransferMatrix()
+            if len(self._TrnsMtrxCache) > \
+               BeamLineElement.getTrnsMtrxCacheSize():
+                self._TrnsMtrxCache.popitem(last=False)
+
+        if self.getDebug():
+            print(" BeamLineElement.setTransferMatrixCached:", \
+                  self.getName(), "key:", Key, \
+                  "hits, misses:", self.getTrnsMtrxCacheStats())
+
+        return self.getTransferMatrix()
+
+    def Transport(self, _R):        #<---- class BeamLineElement:
+        #.. Input vector is not modified; the shift and tilt to the
+        #   coordinate system referred to the beam-line element return a
+        #   new vector only if the element is misaligned.
         if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
             raise badParameter( \
                         " BeamLineElement.Transport: bad input vector:", \
@@ -642,7 +805,7 @@ class BeamLineElement:
                isinstance(self, GaborLens)         or \
                isinstance(self, QuadDoublet)       or \
                isinstance(self, QuadTriplet):         \
-                self.setTransferMatrix(_R)
+                self.setTransferMatrixCached(_R)
 
             detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
             error         = abs(1. - abs(detTrnsfrMtrx))
@@ -675,18 +838,22 @@ class BeamLineElement:
         return _Rprime
 
     def Shift2Local(self, _R):
-        if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
+        if not isinstance(_R, np.ndarray) or np.shape(_R)[-1] != 6:
             raise badParameter( \
                         " BeamLineElement.Shift2Local: bad input vector:", \
                                 _R)
-        
+
+        #.. Aligned element, nothing to do:
+        if not self.getShifted():
+            return _R
+
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print(" Shift2Local: R:", _R)
 
-        _Rprime    = deepcopy(_R)
-        _Rprime[0] -= self._drStrt[0]
-        _Rprime[2] -= self._drStrt[1]
+        _Rprime         = np.array(_R, dtype=float)
+        _Rprime[...,0] -= self._drStrt[0]
+        _Rprime[...,2] -= self._drStrt[1]
 
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
@@ -695,96 +862,75 @@ class BeamLineElement:
         return _Rprime
 
     def Tilt2Local(self, _R):
-        if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
+        if not isinstance(_R, np.ndarray) or np.shape(_R)[-1] != 6:
             raise badParameter( \
                         " BeamLineElement.Tilt2Local: bad input vector:", \
                                 _R)
         
+        #.. Aligned element, nothing to do:
+        if not self.getTilted():
+            return _R
+
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print(" Tilt2Local: R:", _R)
-                print("     ----> Norm(dv):", np.linalg.norm(self.getdvStrt()))
+                print("     ----> dRotINV: \n", self.getdRotStrtINV())
 
-        _Rprime = deepcopy(_R)
-
-        if np.linalg.norm(self.getdvStrt()) != 0:
-            r    = np.array([_Rprime[0], _Rprime[2], _Rprime[4]])
-            rPRM = np.matmul(self.getdRotStrtINV(), r)
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=7,suppress=True):
-                    print("     ---->       r:", r)
-                    print("     ----> dRotINV: \n", self.getdRotStrtINV())
-                    print("     <----    rPRM:", rPRM)
-                    
-            dzds   = mth.sqrt(1. - _Rprime[1]**2 - _Rprime[3]**2)
-            vec    = np.array([_Rprime[1], _Rprime[3], dzds])
-            vecPRM = np.matmul(self.getdRotStrtINV(), vec)
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=7,suppress=True):
-                    print("     ---->    vec:", vec)
-                    print("     ----> dRotINV: \n", self.getdRotStrtINV())
-                    print("     <---- vecPRM:", vecPRM)
-                
-            _Rprime[0] = rPRM[0]
-            _Rprime[1] = vecPRM[0]
-            _Rprime[2] = rPRM[1]
-            _Rprime[3] = vecPRM[1]
-            _Rprime[4] = rPRM[2]
-
-        if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(" <---- Rprime:", _Rprime)
-        
-        return _Rprime
+        return self.Tilt(_R, self.getdRotStrtINV())
 
     def Shift2RPLC(self, _R):
-        if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
+        if not isinstance(_R, np.ndarray) or np.shape(_R)[-1] != 6:
             raise badParameter( \
                         " BeamLineElement.Shift2RPLC: bad input vector:", \
                                 _R)
         
-        _Rprime    = deepcopy(_R)
-        _Rprime[0] += self._drStrt[0]
-        _Rprime[2] += self._drStrt[1]
+        if not self.getShifted():
+            return _R
+
+        _Rprime         = np.array(_R, dtype=float)
+        _Rprime[...,0] += self._drStrt[0]
+        _Rprime[...,2] += self._drStrt[1]
         
         return _Rprime
 
     def Tilt2RPLC(self, _R):
-        if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
+        if not isinstance(_R, np.ndarray) or np.shape(_R)[-1] != 6:
             raise badParameter( \
                         " BeamLineElement.Tilt2RPLC: bad input vector:", \
                                 _R)
         
+        if not self.getTilted():
+            return _R
+
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print(" Tilt2RPLC: R:", _R)
-                print("     ----> Norm(dv):", np.linalg.norm(self.getdvStrt()))
+                print("     ----> dRot: \n", self.getdRotStrt())
+
+        return self.Tilt(_R, self.getdRotStrt())
+
+    def Tilt(self, _R, Rot):
+        #.. Rotate position (x, y, z) and direction (x', y', dz/ds) by Rot.
+        #   _R may be a single trace-space vector or an (N,6) array.
+        #   Unphysical slopes (x'^2 + y'^2 > 1) are an error for a single
+        #   vector; in a batch dz/ds is set to zero and the caller is
+        #   expected to flag such particles as lost.
+        dzds2 = 1. - _R[...,1]**2 - _R[...,3]**2
+        if np.ndim(_R) == 1 and dzds2 < 0.:
+            raise badParameter( \
+                        " BeamLineElement.Tilt: unphysical slope:", _R)
+        dzds  = np.sqrt(np.maximum(dzds2, 0.))
 
-        _Rprime = deepcopy(_R)
+        rPRM   = np.matmul(_R[...,[0,2,4]], Rot.T)
+        vecPRM = np.matmul(np.stack((_R[...,1], _R[...,3], dzds), axis=-1), \
+                           Rot.T)
 
-        if np.linalg.norm(self.getdvStrt()) != 0:
-            r    = np.array([_Rprime[0], _Rprime[2], _Rprime[4]])
-            rPRM = np.matmul(self.getdRotStrt(), r)
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=7,suppress=True):
-                    print("     ---->       r:", r)
-                    print("     ----> dRot: \n", self.getdRotStrt())
-                    print("     <----    rPRM:", rPRM)
-                    
-            dzds   = mth.sqrt(1. - _Rprime[1]**2 - _Rprime[3]**2)
-            vec    = np.array([_Rprime[1], _Rprime[3], dzds])
-            vecPRM = np.matmul(self.getdRotStrt(), vec)
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=7,suppress=True):
-                    print("     ---->    vec:", vec)
-                    print("     ---->   dRot: \n", self.getdRotStrt())
-                    print("     <---- vecPRM:", vecPRM)
-                
-            _Rprime[0] = rPRM[0]
-            _Rprime[1] = vecPRM[0]
-            _Rprime[2] = rPRM[1]
-            _Rprime[3] = vecPRM[1]
-            _Rprime[4] = rPRM[2]
+        _Rprime        = np.array(_R, dtype=float)
+        _Rprime[...,0] = rPRM[...,0]
+        _Rprime[...,1] = vecPRM[...,0]
+        _Rprime[...,2] = rPRM[...,1]
+        _Rprime[...,3] = vecPRM[...,1]
+        _Rprime[...,4] = rPRM[...,2]
 
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
@@ -793,6 +939,122 @@ class BeamLineElement:
         return _Rprime
 
     
+#--------  Batch processing methods:
+#.. Work on an (N,6) array of trace-space vectors, one row per particle.
+#   Loss is flagged in a boolean survival mask rather than by returning
+#   None.
+    def OutsideBeamPipeBatch(self, _R):
+        Rad = np.sqrt(_R[:,0]**2 + _R[:,2]**2)
+        return Rad >= Facility.getinstances().getVCMVr()
+
+    def ExpansionParameterFailBatch(self, _R):
+        b0    = self.getRefb0()
+        with np.errstate(invalid='ignore'):
+            D = np.sqrt(1. + \
+                        2.*_R[:,5]/b0 +
+                        _R[:,5]**2)
+            eps = ( _R[:,1]**2 + _R[:,3]**2  ) / (2.*D**2)
+
+        return np.logical_not(eps <= 1.0)
+
+    def Acceptance(self, _R, _R4Max=5.):
+        #.. Loss criteria applied to an (N,6) array in element-local
+        #   coordinates.  Returns the survival mask and, per particle,
+        #   the code (see LossReasons) of the first criterion failed, in
+        #   the order aperture, beam pipe, expansion parameter and
+        #   longitudinal displacement, as in Transport.
+        LossCode = np.zeros(_R.shape[0], dtype=np.int8)
+        if isinstance(self, Aperture):
+            LossCode[np.logical_not(self.passTHROUGHBatch(_R))] = 1
+        LossCode[(LossCode == 0) & self.OutsideBeamPipeBatch(_R)]        = 2
+        LossCode[(LossCode == 0) & self.ExpansionParameterFailBatch(_R)] = 3
+        LossCode[(LossCode == 0) & \
+                 np.logical_not(np.abs(_R[:,4]) <= _R4Max)]              = 4
+
+        if self.getDebug():
+            print(" BeamLineElement.Acceptance:", self.getName(), \
+                  np.count_nonzero(LossCode == 0), "of", _R.shape[0], \
+                  "accepted.")
+
+        return LossCode == 0, LossCode
+
+    def setTransferMatrixBatch(self, _R, _Alive):
+        #.. Derived classes with a trace-space dependent transfer matrix.
+        #   With the cache enabled one matrix is looked up per delta bin,
+        #   otherwise matrices are evaluated particle by particle.  Lost
+        #   particles get the identity.
+        TrnsMtrx    = np.zeros((_R.shape[0], 6, 6))
+        TrnsMtrx[:] = np.identity(6)
+        iAlive      = np.flatnonzero(_Alive)
+        Quantum     = BeamLineElement.getTrnsMtrxCacheQuantum()
+
+        if len(iAlive) == 0:
+            return TrnsMtrx
+
+        if BeamLineElement.getNOdispersion():
+            TrnsMtrx[iAlive] = self.setTransferMatrixCached(np.zeros(6))
+        elif Quantum is None:
+            for iPrtcl in iAlive:
+                self.setTransferMatrix(_R[iPrtcl])
+                TrnsMtrx[iPrtcl] = self.getTransferMatrix()
+        else:
+            iDelta = np.rint(_R[iAlive,5] / Quantum)
+            iBin, iInv = np.unique(iDelta, return_inverse=True)
+            TrnsMtrxBin = np.array( \
+                [self.setTransferMatrixCached( \
+                    np.array([0., 0., 0., 0., 0., iDelta_i*Quantum])) \
+                 for iDelta_i in iBin] )
+            TrnsMtrx[iAlive] = TrnsMtrxBin[iInv.reshape(-1)]
+
+        return TrnsMtrx
+
+    def TransportBatch(self, __R):   #<---- class BeamLineElement:
+        if not isinstance(__R, np.ndarray) or __R.ndim != 2 or \
+           __R.shape[1] != 6:
+            raise badParameter( \
+                    " BeamLineElement.TransportBatch: bad input array:", \
+                                np.shape(__R))
+
+        if self.getDebug():
+            print(" BeamLineElement.TransportBatch:", self.getName(), \
+                  "; number of particles:", __R.shape[0])
+
+        _R = self.Shift2Local(__R)
+        if self.getTilted():
+            Slope = np.logical_not(_R[:,1]**2 + _R[:,3]**2 <= 1.)
+            _R    = self.Tilt2Local(_R)
+
+        Alive, LossCode = self.Acceptance(_R)
+        if self.getTilted():
+            LossCode[Slope] = 5
+            Alive[Slope]    = False
+
+        if isinstance(self, DefocusQuadrupole) or \
+           isinstance(self, FocusQuadrupole)   or \
+           isinstance(self, Solenoid)          or \
+           isinstance(self, SectorDipole)      or \
+           isinstance(self, GaborLens)         or \
+           isinstance(self, QuadDoublet)       or \
+           isinstance(self, QuadTriplet):
+            TrnsMtrx = self.setTransferMatrixBatch(_R, Alive)
+            _Rprime  = np.einsum('nij,nj->ni', TrnsMtrx, _R)
+        else:
+            _Rprime  = np.matmul(_R, self.getTransferMatrix().T)
+
+        if self.getTilted():
+            Slope   = Alive & \
+                np.logical_not(_Rprime[:,1]**2 + _Rprime[:,3]**2 <= 1.)
+            LossCode[Slope] = 5
+            Alive[Slope]    = False
+            _Rprime = self.Tilt2RPLC(_Rprime)
+        _Rprime = self.Shift2RPLC(_Rprime)
+
+        if self.getDebug():
+            print(" <---- Number surviving:", np.count_nonzero(Alive))
+
+        return _Rprime, Alive, LossCode
+
+
 #--------  I/o methods:
     def writeElement(self, dataFILE):        #<---- class BeamLineElement:
         if self.getDebug():
@@ -923,6 +1185,18 @@ class BeamLineElement:
             print(' <---- BeamLineElement.cleaninstance: instances removed.')
         cls.setDebug(False)
 
+    @classmethod
+    def resetTrnsMtrxCache(cls):
+        for inst in BeamLineElement.getinstances():
+            inst._TrnsMtrxCache       = OrderedDict()
+            inst._TrnsMtrxCacheHits   = 0
+            inst._TrnsMtrxCacheMisses = 0
+
+    def clearTrnsMtrxCache(self):
+        #.. Called by the parameter setters; cached matrices are stale once
+        #   length, strength, field etc. change.
+        self._TrnsMtrxCache = OrderedDict()
+
     @classmethod
     def removeInstance(cls, inst):
         if inst in cls.getinstances():
@@ -930,6 +1204,8 @@ class BeamLineElement:
                 print(" BeamLineElement.removeInstance: remove", \
                       inst.getName(), "from beamline instances list")
             cls.getinstances().remove(inst)
+            for iLctn, jnst in enumerate(cls.getinstances()):
+                jnst._iLctn = iLctn
         else:
             if cls.getDebug():
                 print(" BeamLineElement.removeInstance: instance", \
@@ -1598,9 +1874,8 @@ class Drift(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0        = iRefPrtcl.getp0(iPrev)
+        E0        = iRefPrtcl.getKinematics()["E0"][iPrev]
         b02       = (p0/E0)**2
         g02       = 1./(1.-b02)
         
@@ -1949,6 +2224,25 @@ class Aperture(BeamLineElement):
             print(" <---- Return, passsTHROUGH:", NotCut)
         return NotCut
 
+    def passTHROUGHBatch(self, _R):
+        NotCut = np.ones(_R.shape[0], dtype=bool)
+        if self.getType() == 0:
+            Rad    = np.sqrt(_R[:,0]**2 + _R[:,2]**2)
+            NotCut = Rad < self.getParameters()[0]
+        elif self.getType() == 1:
+            RadX2  = (_R[:,0]/self.getParameters()[0])**2
+            RadY2  = (_R[:,2]/self.getParameters()[1])**2
+            NotCut = (RadX2+RadY2) < 1.
+        elif self.getType() == 2:
+            NotCut = np.logical_and( \
+                        np.abs(_R[:,0]) <= self.getParameters()[0], \
+                        np.abs(_R[:,2]) <= self.getParameters()[1])
+
+        if self.getDebug():
+            print(" Aperture(BeamLineElement).passTHROUGHBatch:", \
+                  np.count_nonzero(NotCut), "of", _R.shape[0], "pass.")
+        return NotCut
+
     def visualise(self, axs, CoordSys, Proj):
         if self.getDebug():
             print(" Aperture(BeamLineElement).visualise: start")
@@ -2279,6 +2573,7 @@ class FocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setFQmode:", \
                             " bad FQmode:", _FQmode)
         self._FQmode = _FQmode
+        self.clearTrnsMtrxCache()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
@@ -2286,6 +2581,7 @@ class FocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setLength:", \
                             " bad length:", _Length)
         self._Length = _Length
+        self.clearTrnsMtrxCache()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -2293,6 +2589,7 @@ class FocusQuadrupole(BeamLineElement):
                     "BeamLineElement.FocusQuadrupole.setStrength:", \
                     " bad quadrupole strength:", _Strength)
         self._Strength = _Strength
+        self.clearTrnsMtrxCache()
 
     def setkFQ(self, _kFQ):
         if not isinstance(_kFQ, float):
@@ -2300,6 +2597,7 @@ class FocusQuadrupole(BeamLineElement):
                     "BeamLineElement.FocusQuadrupole.setStrength:", \
                                 " bad quadrupole k constant:", _kFQ)
         self._kFQ = _kFQ
+        self.clearTrnsMtrxCache()
 
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -2310,9 +2608,8 @@ class FocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0        = iRefPrtcl.getp0(iPrev)
+        E0        = iRefPrtcl.getKinematics()["E0"][iPrev]
         b0        = p0/E0
         b02       = b0**2
         g02       = 1./(1.-b02)
@@ -2334,8 +2631,7 @@ class FocusQuadrupole(BeamLineElement):
         if self.getFQmode() == 1:
             D = mth.sqrt(1. + 2.*_R[5]/b0 + _R[5]**2)
         else:
-            particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                                   iRefPrtcl.getSpecies() )
+            particleMASS = iRefPrtcl.getparticleMASS()
             E   = E0 + _R[5]*p0
             p   = mth.sqrt(E**2 - particleMASS**2)
             if p > 0:
@@ -2400,8 +2696,7 @@ class FocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" FocusQuadrupole(BeamLineElement).calckFQ:")
@@ -2428,8 +2723,7 @@ class FocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" FocusQuadrupole(BeamLineElement).calcStrength:")
@@ -2856,6 +3150,7 @@ class DefocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setDQmode:", \
                             " bad DQmode:", _DQmode)
         self._DQmode = _DQmode
+        self.clearTrnsMtrxCache()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
@@ -2863,6 +3158,7 @@ class DefocusQuadrupole(BeamLineElement):
                 "BeamLineElement.DefocusQuadrupole.setLength:", \
                 " bad length:", _Length)
         self._Length = _Length
+        self.clearTrnsMtrxCache()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -2870,6 +3166,7 @@ class DefocusQuadrupole(BeamLineElement):
                 "BeamLineElement.DefocusQuadrupole.setStrength:", \
                 " bad quadrupole strength:", _Strength)
         self._Strength = _Strength
+        self.clearTrnsMtrxCache()
 
     def setkDQ(self, _kDQ):
         if not isinstance(_kDQ, float):
@@ -2877,6 +3174,7 @@ class DefocusQuadrupole(BeamLineElement):
                     "BeamLineElement.DefocusQuadrupole.setkDQ:", \
                                 " bad quadrupole k constant:", _kDQ)
         self._kDQ = _kDQ
+        self.clearTrnsMtrxCache()
 
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -2887,9 +3185,8 @@ class DefocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0        = iRefPrtcl.getp0(iPrev)
+        E0        = iRefPrtcl.getKinematics()["E0"][iPrev]
         b0        = p0/E0
         b02       = b0**2
         g02       = 1./(1.-b02)
@@ -2912,8 +3209,7 @@ class DefocusQuadrupole(BeamLineElement):
             D = mth.sqrt(1. + 2.*_R[5]/b0 + _R[5]**2)
         else:
             E   = E0 + _R[5]*p0
-            particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                                   iRefPrtcl.getSpecies() )
+            particleMASS = iRefPrtcl.getparticleMASS()
             p   = mth.sqrt(E**2 - particleMASS**2)
             if p > 0:
                 Scl = p0 / p
@@ -2977,8 +3273,7 @@ class DefocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" DefocusQuadrupole(BeamLineElement).calckDQ:")
@@ -3005,8 +3300,7 @@ class DefocusQuadrupole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" DefocusQuadrupole(BeamLineElement).calcStrength:")
@@ -3517,6 +3811,7 @@ class SectorDipole(BeamLineElement):
                                "BeamLineElement.SectorDipole.setAngle:", \
                                "bad bending angle (Angle):", _Angle)
         self._Angle = _Angle
+        self.clearTrnsMtrxCache()
 
     def setB(self, _B):
         if not isinstance(_B, float):
@@ -3524,6 +3819,7 @@ class SectorDipole(BeamLineElement):
                                "BeamLineElement.SectorDipole.setB:", \
                                "bad B:", _B)
         self._B = _B
+        self.clearTrnsMtrxCache()
 
     def setLength(self):
         iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
@@ -3532,8 +3828,7 @@ class SectorDipole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0   = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0   = iRefPrtcl.getp0(iPrev)
 
         if self.getDebug():
             print(" Dipole(BeamLineElement).setLength:")
@@ -3551,6 +3846,7 @@ class SectorDipole(BeamLineElement):
             print("     ----> Brho, r, l:", Brho, r, l)
 
         self._Length = l
+        self.clearTrnsMtrxCache()
 
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -3561,9 +3857,8 @@ class SectorDipole(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0        = iRefPrtcl.getp0(iPrev)
+        E0        = iRefPrtcl.getKinematics()["E0"][iPrev]
         b0        = p0/E0
         b02       = b0**2
         g02       = 1./(1.-b02)
@@ -3578,8 +3873,7 @@ class SectorDipole(BeamLineElement):
             print("     <---- b02, g02:", b02, g02)
         
         E    = E0 + p0*_R[5]
-        particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                               iRefPrtcl.getSpecies() )
+        particleMASS = iRefPrtcl.getparticleMASS()
         p    = mth.sqrt(E**2 - particleMASS**2)
         
         if self.getDebug():
@@ -3912,6 +4206,7 @@ class Solenoid(BeamLineElement):
                 "BeamLineElement.Solenoid.setLength: bad length:", \
                                 _Length)
         self._Length = _Length
+        self.clearTrnsMtrxCache()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -3919,6 +4214,7 @@ class Solenoid(BeamLineElement):
                                " bad strength value:", \
                                _Strength)
         self._Strength = _Strength
+        self.clearTrnsMtrxCache()
 
     def setksol(self, _ksol):
         if not isinstance(_ksol, float):
@@ -3926,6 +4222,7 @@ class Solenoid(BeamLineElement):
                     "BeamLineElement.Solenloid.setcsol:", \
                                 " bad quadrupole k constant:", _kDQ)
         self._ksol = _ksol
+        self.clearTrnsMtrxCache()
 
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -3936,9 +4233,8 @@ class Solenoid(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0        = iRefPrtcl.getp0(iPrev)
+        E0        = iRefPrtcl.getKinematics()["E0"][iPrev]
 
         b02       = (p0/E0)**2
         g02       = 1./(1.-b02)
@@ -3956,8 +4252,7 @@ class Solenoid(BeamLineElement):
                 print("     ----> Trace space:", _R)
 
         E    = E0 + p0*_R[5]
-        particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                               iRefPrtcl.getSpecies() )
+        particleMASS = iRefPrtcl.getparticleMASS()
         p    = mth.sqrt(E**2 - particleMASS**2)
         
         if self.getDebug():
@@ -4076,8 +4371,7 @@ class Solenoid(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" Solenoid(BeamLineElement).calckDQ:")
@@ -4106,8 +4400,7 @@ class Solenoid(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+        p0        = iRefPrtcl.getp0(iPrev)
         
         if self.getDebug():
             print(" Solenoid(BeamLineElement).calcStrength:")
@@ -4364,30 +4657,35 @@ class GaborLens(BeamLineElement):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setBz: bad length:", _Bz)
         self._Bz = _Bz
+        self.clearTrnsMtrxCache()
 
     def setVA(self, _VA):
         if not isinstance(_VA, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setVA: bad length:", _VA)
         self._VA = _VA
+        self.clearTrnsMtrxCache()
 
     def setRA(self, _RA):
         if not isinstance(_RA, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setRA: bad length:", _RA)
         self._RA = _RA
+        self.clearTrnsMtrxCache()
 
     def setRp(self, _Rp):
         if not isinstance(_Rp, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setRp: bad length:", _Rp)
         self._Rp = _Rp
+        self.clearTrnsMtrxCache()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setLength: bad length:", _Length)
         self._Length = _Length
+        self.clearTrnsMtrxCache()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -4395,6 +4693,7 @@ class GaborLens(BeamLineElement):
                 "BeamLineElement.GaborLens.setLength: bad strength:", \
                                 _Strength)
         self._Strength = _Strength
+        self.clearTrnsMtrxCache()
 
     def setElectronDensity(self):
         if self.getDebug():
@@ -4405,8 +4704,7 @@ class GaborLens(BeamLineElement):
                 raise ReferenceParticleNotSpecified()
 
             iPrev = len(iRefPrtcl.getPrOut()) - 1
-            p0    = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
+            p0    = iRefPrtcl.getp0(iPrev)
 
             Brho = (1./(speed_of_light*1.E-9))*p0/1000.
             Rgty = p0 / constants_instance.getparticleCHARGE(
@@ -4447,6 +4745,7 @@ class GaborLens(BeamLineElement):
             print("     <---- ne_trans, ne_longi:", ne_trans, ne_longi)
 
         self._ElectronDensity = min(ne_trans, ne_longi)
+        self.clearTrnsMtrxCache()
         
         if self.getDebug():
             print(" <---- Electron density:", self.getElectronDensity())
@@ -4460,9 +4759,8 @@ class GaborLens(BeamLineElement):
 
         iPrev = len(iRefPrtcl.getPrOut()) - 1
 
-        p0  = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                              iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0  = iRefPrtcl.getPrOut()[iPrev][3]
+        p0  = iRefPrtcl.getp0(iPrev)
+        E0  = iRefPrtcl.getKinematics()["E0"][iPrev]
         b02 = (p0/E0)**2
         g02 = 1./(1.-b02)
         g0  = mth.sqrt(g02)
@@ -4480,8 +4778,7 @@ class GaborLens(BeamLineElement):
                 print("     ----> Trace space:", _R)
 
         E = E0 + p0*_R[5]
-        particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                               iRefPrtcl.getSpecies() )
+        particleMASS = iRefPrtcl.getparticleMASS()
         p = mth.sqrt(E**2 - particleMASS**2)
         g = E / particleMASS  
         
@@ -5271,6 +5568,24 @@ class CylindricalRFCavity(BeamLineElement):
 
         return _Rprime
 
+    def TransportBatch(self, _R=None):
+        if not isinstance(_R, np.ndarray) or _R.ndim != 2 or \
+           _R.shape[1] != 6:
+            raise badParameter( \
+            " CylindricalRFCavity(BeamLineElement).TransportBatch:" + \
+                                "bad input array:", \
+                                np.shape(_R))
+
+        Alive, LossCode = self.Acceptance(_R)
+
+        _Rprime = np.matmul(_R, self.getTransferMatrix().T) + self.getmrf()
+
+        if self.getDebug():
+            print(" CylindricalRFCavity(BeamLineElement).TransportBatch:", \
+                  np.count_nonzero(Alive), "of", _R.shape[0], "survive.")
+
+        return _Rprime, Alive, LossCode
+
 #--------  I/o methods:
     def writeElement(self, dataFILE):
         if self.getDebug():
@@ -5343,6 +5658,7 @@ Derived class Source:
   -----------------
     instances : List of instances of BeamLineElement class
   __Debug     : Debug flag
+   BatchModes : Modes for which getParticles generates n particles at once
 
 
   Parent class instance attributes:
@@ -5451,6 +5767,16 @@ getLaserDrivenProtonEnergy: Generate proton energy at source using
                   Input : x, y, energy, cos(theta), phi [floats]
                  Return : np.ndarray : 6D phase space of particle at source.
 
+getTraceSpaceMoments : Mean and covariance of the trace space at the
+                      source, without generating particles.  Analytic
+                      for Modes 1, 2 and 4; for Mode 0 integrated over
+                      the inverse cumulative energy distribution by
+                      Gauss-Legendre quadrature (nQuadrature points)
+                      and cached until parameters or reference
+                      momentum change.
+                  Input : None
+                 Return : Mean [np.ndarray(6)], Cov [np.ndarray(6,6)]
+
 
 """
 
@@ -5461,6 +5787,7 @@ class Source(BeamLineElement):
     ModeList   = [0, 1, 2, 3, 4]
     ModeText   = ["Parameterised laser driven", "Gaussian", "Flat", \
                   "Read from file", "UniformDisc"]
+    BatchModes = [0, 1, 2, 4]
     
     ParamUnit  = [ ["$\\mu$m", "W", " ", "m", "s", "MeV", \
                     "MeV", "MeV", \
@@ -5502,6 +5829,13 @@ class Source(BeamLineElement):
     Lsrdrvng_E = None
     LsrDrvnIni = False
 
+#.. Number of Gauss-Legendre points used to integrate the Mode 0 moments:
+    nQuadrature = 256
+
+#.. NumPy random generator used by getParticles; None means create one,
+#   seeded from the "random" module, on first use:
+    __Generator = None
+
 #--------  Initialisation and built-in methods  --------  --------  --------
     def __init__(self, _Name=None, \
                  _rStrt=None, _vStrt=None, _drStrt=None, _dvStrt=None, \
@@ -5592,6 +5926,7 @@ class Source(BeamLineElement):
         self._ModeText     = None
         self._Param        = None
         self._derivedParam = []
+        self._TrcSpcMoments = None
         
     def setMode(self, _Mode):
         if self.getDebug():
@@ -5618,6 +5953,13 @@ class Source(BeamLineElement):
             print(" Source.setParamters; Parameter:", _ParameterUnit)
         self._ParameterUnit = _ParameterUnit
 
+    @classmethod
+    def setGenerator(cls, _Generator=None):
+        if _Generator is not None and \
+           not isinstance(_Generator, np.random.Generator):
+            _Generator = np.random.default_rng(_Generator)
+        cls.__Generator = _Generator
+
         
 #--------  "get methods"  --------  --------  --------  --------  --------
 #.. Methods believed to be self documenting(!)
@@ -5629,8 +5971,29 @@ class Source(BeamLineElement):
         
         return self._derivedParam
 
+    @classmethod
+    def getGenerator(cls):
+        if cls.__Generator is None:
+            cls.__Generator = np.random.default_rng(rnd.getrandbits(64))
+        return cls.__Generator
+
     
 #--------  Processing methods:
+    def getParticles(self, n):
+        #.. Generate n particles at once; returns (n,6) trace-space array:
+        if not isinstance(n, (int, np.integer)) or n < 0:
+            raise badParameter(" Source.getParticles: bad n:", n)
+        
+        X, Y, KE, cosTheta, Phi, xp, yp = self.getParticleArrays(int(n))
+
+        TrcSpc = self.getTraceSpace(X, Y, KE, cosTheta, Phi, xp, yp)
+
+        if self.__Debug:
+            print(" BeamLineElement(Source).getParticles:", \
+                  np.shape(TrcSpc), "trace-space array generated.")
+
+        return TrcSpc
+
     def getParticleFromSource(self):
         if self.__Debug:
             print(" BeamLineElement(Source).getParticleFromSource: start")
@@ -6012,6 +6375,80 @@ class Source(BeamLineElement):
 
         return X, Y, KE, cosTheta, Phi, xp, yp
 
+    #.. Array version of getParticle using the NumPy generator:
+    def getParticleArrays(self, n):
+        Rng = self.getGenerator()
+
+        X        = None
+        Y        = None
+        KE       = None
+        cosTheta = None
+        Phi      = None
+        xp       = None
+        yp       = None
+
+        #-------- Laser driven:
+        if self._Mode == 0:
+            KE     = self.getLaserDrivenProtonEnergy(n)
+            X      = Rng.normal(0., self.getParameters()[3], n)
+            Y      = Rng.normal(0., self.getParameters()[3], n)
+
+            #.. Acceptance-rejection, repeated for rejected particles only:
+            upmax  = np.sin(np.radians(self.g_theta(KE)))
+            xp     = np.zeros(n)
+            yp     = np.zeros(n)
+            iTry   = np.arange(n)
+            iCnt   = 0
+            while len(iTry) > 0:
+                iCnt += 1
+                if iCnt > 1E6:
+                    raise KillInfiniteLoop(" iCnt: " + str(iCnt))
+
+                upmaxTry = upmax[iTry]
+                xpTry    = Rng.uniform(-upmaxTry, upmaxTry)
+                ypTry    = Rng.uniform(-upmaxTry, upmaxTry)
+                grp      = self.getgofrp(upmaxTry, xpTry, ypTry)
+
+                Accept   = Rng.random(len(iTry)) < grp
+                if self.getParameters()[10] != -9999.:
+                    Accept &= np.sqrt(xpTry**2 + ypTry**2) < \
+                        self.getParameters()[10]
+
+                xp[iTry[Accept]] = xpTry[Accept]
+                yp[iTry[Accept]] = ypTry[Accept]
+                iTry             = iTry[np.logical_not(Accept)]
+
+        elif self._Mode == 1 or self._Mode == 2:
+            X             = Rng.normal(0., self.getParameters()[0], n)
+            Y             = Rng.normal(0., self.getParameters()[1], n)
+            cosTheta      = Rng.uniform(self.getParameters()[2], 1., n)
+            Phi           = Rng.uniform(0., 2.*mth.pi, n)
+            if self._Mode == 1:
+                KE        = Rng.normal(self.getParameters()[3], \
+                                       self.getParameters()[4], n)
+            else:
+                KE        = Rng.uniform(self.getParameters()[3], \
+                                        self.getParameters()[4], n)
+        elif self._Mode == 4:
+            KE            = Rng.normal(self.getParameters()[0], \
+                                       self.getParameters()[1], n)
+            rd            = self.getParameters()[2] * np.sqrt(Rng.random(n))
+            phi           = 2. * mth.pi * Rng.random(n)
+            X             = rd * np.cos(phi)
+            Y             = rd * np.sin(phi)
+            xp            = np.zeros(n)
+            yp            = np.zeros(n)
+        else:
+            raise badSourceSpecification( \
+                " Source.getParticleArrays: no generator for mode", \
+                                          self._Mode)
+
+        if self.getDebug():
+            print(" BeamLineElement(Source).getParticleArrays:", n, \
+                  "particles, mode", self._Mode)
+
+        return X, Y, KE, cosTheta, Phi, xp, yp
+
     #..  Used for Modes 1 and 2:
     def getFlatThetaPhi(self):
         cosTheta = rnd.uniform(self.getParameters()[2], 1.)
@@ -6071,7 +6508,7 @@ class Source(BeamLineElement):
 
     # Generates energy values for the distribution
     #..  Used for Mode 0
-    def getLaserDrivenProtonEnergy(self):
+    def getLaserDrivenProtonEnergy(self, n=None):
         if not Source.LsrDrvnIni:
             if self.__Debug:
                 print( \
@@ -6090,6 +6527,12 @@ class Source(BeamLineElement):
 
         if self.getDebug():
             print("     ----> Get kinetic energy:")
+
+        #.. Array of n energies by the same inverse cumulative probability:
+        if n is not None:
+            GE    = self.getGenerator().random(n)
+            sqrtK = np.sqrt(Kmin) - np.sqrt(Te/2.) * np.log(1.-GE/Gamma)
+            return sqrtK**2
             
         GE = rnd.random()
 
@@ -6201,7 +6644,8 @@ class Source(BeamLineElement):
     # Returns trace space given position (x,y), kinetic energy (K),
     # cosine of the polar angle (cTheta) and the azimuthal angle (Phi).
     # If xprime (xp) and yp (yprime) are given, these are used instead
-    # of cTheta and Phi.
+    # of cTheta and Phi.  If K is an np.ndarray, all arguments are
+    # arrays (or None) and an (n,6) array is returned.
     #..  Used for Mode 0
     def getTraceSpace(self, x, y, K, cTheta, Phi, xp=None, yp=None):
         if self.getDebug():
@@ -6210,15 +6654,35 @@ class Source(BeamLineElement):
                   x, y, K, cTheta, Phi)
             
         iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
-        particleMASS = PhysCnst.PhysicalConstants().getparticleMASS(   \
-                                            iRefPrtcl.getSpecies() )
-        p0        = iRefPrtcl.getMomentumIn(0)
-        E0        = mth.sqrt( particleMASS**2 + p0**2)
-        b0        = p0/E0
+        particleMASS = iRefPrtcl.getparticleMASS()
+        Kin       = iRefPrtcl.getKinematics()
+        p0        = Kin["p0"][0]
+        E0        = Kin["E0"][0]
+        b0        = Kin["b0"][0]
         if self.getDebug():
             print("     ----> p0, E0, b0, ( K0 ):", p0, E0, b0, \
                   "(", E0-particleMASS, ")")
 
+        if isinstance(K, np.ndarray):
+            E = particleMASS + K
+            p = np.sqrt(E**2 - particleMASS**2)
+            if cTheta is not None:
+                sTheta = np.sqrt(1.-cTheta**2)
+                xPrime = sTheta * np.cos(Phi) * p / p0
+                yPrime = sTheta * np.sin(Phi) * p / p0
+            if xp is not None:
+                xPrime = xp * p / p0
+            if yp is not None:
+                yPrime = yp * p / p0
+
+            TrcSpc      = np.zeros((len(K), 6))
+            TrcSpc[:,0] = x
+            TrcSpc[:,1] = xPrime
+            TrcSpc[:,2] = y
+            TrcSpc[:,3] = yPrime
+            TrcSpc[:,5] = (E - E0) / p0
+            return TrcSpc
+
         E = particleMASS+K
         p = mth.sqrt(E**2 - particleMASS**2)
         if self.getDebug():
@@ -6253,6 +6717,96 @@ class Source(BeamLineElement):
 
         return TrcSpc
 
+    # Returns mean and covariance (about the mean) of the trace space at
+    # the source, computed from the source parameters without
+    # generating particles.  Transverse angles are independent of the
+    # azimuth, so only the diagonal and the delta mean survive.
+    def getTraceSpaceMoments(self):
+        iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
+        particleMASS = iRefPrtcl.getparticleMASS()
+        p0        = iRefPrtcl.getp0(0)
+        E0        = iRefPrtcl.getKinematics()["E0"][0]
+
+        Key = (self._Mode, tuple(self.getParameters()), particleMASS, p0)
+        if self._TrcSpcMoments is not None and \
+           self._TrcSpcMoments[0] == Key:
+            return self._TrcSpcMoments[1], self._TrcSpcMoments[2]
+
+        Prm  = self.getParameters()
+        Mean = np.zeros(6)
+        Var  = np.zeros(6)
+
+        #-------- Laser driven; integrate over u = cumulative probability:
+        if self._Mode == 0:
+            if len(self.getderivedParameters()) == 0:
+                self.getLaserCumProbParam()
+            Te    = Prm[5]
+            Kmin  = Prm[6]
+            Kmax  = Prm[7]
+            Gamma = self.getderivedParameters()[0]
+
+            u, w  = np.polynomial.legendre.leggauss(self.nQuadrature)
+            u     = 0.5 * (u + 1.)
+            w     = 0.5 * w
+            K     = (mth.sqrt(Kmin) - \
+                     mth.sqrt(Te/2.) * np.log(1.-u/Gamma))**2
+            E     = particleMASS + K
+            p2    = E**2 - particleMASS**2
+
+            #.. <r'^2> for density (1 - r'^2/upmax^2) on the disc,
+            #   truncated at rp max if set:
+            upmax = np.sin(np.radians(self.g_theta(K)))
+            rc    = upmax
+            if Prm[10] != -9999.:
+                rc = np.minimum(upmax, Prm[10])
+            rp2   = (rc**4/4. - rc**6/(6.*upmax**2)) / \
+                    (rc**2/2. - rc**4/(4.*upmax**2))
+
+            Var[0]  = Var[2] = Prm[3]**2
+            Var[1]  = Var[3] = np.sum(w * p2 * rp2) / 2. / p0**2
+            Mean[5] = np.sum(w * (E - E0)) / p0
+            Var[5]  = np.sum(w * ((E - E0)/p0 - Mean[5])**2)
+
+        #-------- Gaussian or flat energy, flat in cos(theta) and phi:
+        elif self._Mode == 1 or self._Mode == 2:
+            if self._Mode == 1:
+                MeanK = Prm[3]
+                VarK  = Prm[4]**2
+            else:
+                MeanK = (Prm[3] + Prm[4]) / 2.
+                VarK  = (Prm[4] - Prm[3])**2 / 12.
+            p2      = VarK + MeanK**2 + 2.*particleMASS*MeanK
+            s2Theta = 1. - (1. + Prm[2] + Prm[2]**2) / 3.
+
+            Var[0]  = Prm[0]**2
+            Var[2]  = Prm[1]**2
+            Var[1]  = Var[3] = s2Theta * p2 / 2. / p0**2
+            Mean[5] = (particleMASS + MeanK - E0) / p0
+            Var[5]  = VarK / p0**2
+
+        #-------- Uniform disc, parallel beam:
+        elif self._Mode == 4:
+            Var[0]  = Var[2] = Prm[2]**2 / 4.
+            Mean[5] = (particleMASS + Prm[0] - E0) / p0
+            Var[5]  = Prm[1]**2 / p0**2
+
+        else:
+            raise badSourceSpecification( \
+                " Source.getTraceSpaceMoments: no moments for mode", \
+                                          self._Mode)
+
+        Cov = np.diag(Var)
+        self._TrcSpcMoments = (Key, Mean, Cov)
+
+        if self.getDebug():
+            print(" Source(BeamLineElement).getTraceSpaceMoments: mode", \
+                  self._Mode)
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Mean:", Mean)
+                print("     ----> Covariance: \n", Cov)
+
+        return Mean, Cov
+
 #--------  Utilities:
     def tabulateParameters(self, filename="LaTeX.tex"):
         LTX.TableHeader(filename, '|l|c|l|', \
@@ -6787,6 +7341,7 @@ class QuadDoublet(BeamLineElement):
                     "BeamLineElement.QuadDoublet.setFDorDF:", \
                                 " bad FDorDF:", _FDorDF)
         self._FDorDF = _FDorDF
+        self.clearTrnsMtrxCache()
         
     def setSeparation(self, _d):
         if not(isinstance(_d, float)):
@@ -6795,6 +7350,7 @@ class QuadDoublet(BeamLineElement):
                     " bad separation:", _d)
                
         self._Separation = _d
+        self.clearTrnsMtrxCache()
         
     def setQ1par(self, _Q1par):
         if isinstance(_Q1par,list):
@@ -6808,6 +7364,7 @@ class QuadDoublet(BeamLineElement):
                 " for Q1par")
         
         self._Q1par = _Q1par
+        self.clearTrnsMtrxCache()
         
     def setQ2par(self, _Q2par):
         if isinstance(_Q2par,list):
@@ -6821,6 +7378,7 @@ class QuadDoublet(BeamLineElement):
                 " for Q2par")
         
         self._Q2par = _Q2par
+        self.clearTrnsMtrxCache()
 
     def setQ1(self, iQ1):
         if not isinstance(iQ1, BeamLineElement):
@@ -6828,6 +7386,7 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setQ1:", \
                 " not a beamline element")
         self._iQ1 = iQ1
+        self.clearTrnsMtrxCache()
             
     def setD(self, iD):
         if not isinstance(iD, BeamLineElement):
@@ -6835,6 +7394,7 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setD:", \
                 " not a beamline element")
         self._iD = iD
+        self.clearTrnsMtrxCache()
             
     def setQ2(self, iQ2):
         if not isinstance(iQ2, BeamLineElement):
@@ -6842,6 +7402,7 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setQ2:", \
                 " not a beamline element")
         self._iQ2 = iQ2
+        self.clearTrnsMtrxCache()
             
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -7149,6 +7710,7 @@ class QuadTriplet(BeamLineElement):
                     "BeamLineElement.QuadDoublet.setFDForDFD:", \
                                 " bad FDForDFD:", _FDForDFD)
         self._FDForDFD = _FDForDFD
+        self.clearTrnsMtrxCache()
         
     def setQ1par(self, _Q1par):
         if isinstance(_Q1par,list):
@@ -7162,6 +7724,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q1par")
         
         self._Q1par = _Q1par
+        self.clearTrnsMtrxCache()
         
     def setSeparation1(self, _d1):
         if not(isinstance(_d1, float)):
@@ -7170,6 +7733,7 @@ class QuadTriplet(BeamLineElement):
                     " bad separation 1:", _d1)
                
         self._Separation1 = _d1
+        self.clearTrnsMtrxCache()
         
     def setQ2par(self, _Q2par):
         if isinstance(_Q2par,list):
@@ -7183,6 +7747,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q2par")
         
         self._Q2par = _Q2par
+        self.clearTrnsMtrxCache()
 
     def setSeparation2(self, _d2):
         if not(isinstance(_d2, float)):
@@ -7191,6 +7756,7 @@ class QuadTriplet(BeamLineElement):
                     " bad separation 2:", _d2)
                
         self._Separation2 = _d2
+        self.clearTrnsMtrxCache()
         
     def setQ3par(self, _Q3par):
         if isinstance(_Q3par,list):
@@ -7204,6 +7770,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q3par")
         
         self._Q3par = _Q3par
+        self.clearTrnsMtrxCache()
 
     def setQ1(self, iQ1):
         if not isinstance(iQ1, BeamLineElement):
@@ -7211,6 +7778,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ1:", \
                 " not a beamline element")
         self._iQ1 = iQ1
+        self.clearTrnsMtrxCache()
             
     def setD1(self, iD1):
         if not isinstance(iD1, BeamLineElement):
@@ -7218,6 +7786,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setD1:", \
                 " not a beamline element")
         self._iD1 = iD1
+        self.clearTrnsMtrxCache()
             
     def setQ2(self, iQ2):
         if not isinstance(iQ2, BeamLineElement):
@@ -7225,6 +7794,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ2:", \
                 " not a beamline element")
         self._iQ2 = iQ2
+        self.clearTrnsMtrxCache()
             
     def setD2(self, iD2):
         if not isinstance(iD2, BeamLineElement):
@@ -7232,6 +7802,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setD2:", \
                 " not a beamline element")
         self._iD2 = iD2
+        self.clearTrnsMtrxCache()
             
     def setQ3(self, iQ3):
         if not isinstance(iQ3, BeamLineElement):
@@ -7239,6 +7810,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ3:", \
                 " not a beamline element")
         self._iQ3 = iQ3
+        self.clearTrnsMtrxCache()
             
     def setTransferMatrix(self, _R):
         if BeamLineElement.getNOdispersion():
@@ -7801,6 +8373,31 @@ class RPLCswitch(BeamLineElement):
 
         return _Rprime
 
+    def TransportBatch(self, _R=None):
+        if not isinstance(_R, np.ndarray) or _R.ndim != 2 or \
+           _R.shape[1] != 6:
+            raise badParameter( \
+            " RPLCswitch(BeamLineElement).TransportBatch:" + \
+                                "bad input array:", \
+                                np.shape(_R))
+
+        Alive, LossCode = self.Acceptance(_R, 2.5)
+
+        #.. 3D rotation goes through phase space, particle by particle:
+        if self.get3Drotation():
+            _Rprime = np.array(_R, dtype=float)
+            for iPrtcl in np.flatnonzero(Alive):
+                _Rprime[iPrtcl] = self.Transport(_R[iPrtcl])
+            return _Rprime, Alive, LossCode
+
+        _Rprime = np.matmul(_R, self.getTransferMatrix().T)
+
+        if self.getDebug():
+            print(" RPLCswitch(BeamLineElement).TransportBatch:", \
+                  np.count_nonzero(Alive), "of", _R.shape[0], "survive.")
+
+        return _Rprime, Alive, LossCode
+
     
 #--------  Exceptions:
 class badBeamLineElement(Exception):
@@ -17,17 +17,23 @@ Class Particle:
   -----------------
     instances : List of instances of Particle class
  __Debug     : Debug flag
+    nLocMax   : Initial capacity (number of records) of a new particle;
+                the record doubles in size when full.
+ __LocLIST   : Location names; particles record the index into this list
+ __LocIndex  : dict: location name -> index in __LocLIST
 
       
   Instance attributes:
   --------------------
    All instance attributes are initialised to Null
+   Instances use __slots__; species classes add no attributes.
    _Species    :   str   : Species, has to be in list in PhysicalConstants.
-   _Location[] :   str   : Name of location where trace space recorded
-   _z[]        : float   : z coordinate at which trace space recorded
-   _s[]        : float   : s coordinate at which trace space recorded
-   _TrcSpc[]   : ndarray : 6D trace space: x, x', y, y', z, delta, all
+   _iLoc[]     : ndarray : int32 [nLocMax]: index in __LocLIST of location
+                           where trace space recorded
+   _Rcrd[]     : ndarray : [nLocMax, 8]: one row per record: z, s and 6D
+                           trace space: x, x', y, y', z, delta, all
                            in reference particle local coordinates
+   _nRcrd      :   int   : Number of records filled
    _PhsSpc[]   : array   : RPLC 6D phase space: [(x, y, z), (px, py, pz)]
                            List ot two ndarrays.
    _LabPhsSpc[]: array   : Lab 6D phase space: [(x, y, z), (px, py, pz)]
@@ -55,7 +61,8 @@ Class Particle:
   setAll2None: Set all instance attributes to None.
         No input or return.
 
-  setLocation: str : Set location string at which phase-space is stored.
+  setLocation: str : Open a new record at location; setz, sets and
+                     setTraceSpace fill the most recent record.
 
          setz: float : Set z coordinate at which phase-space is stored.
 
@@ -67,9 +74,18 @@ setRPLCPhaseSpace: [np.ndarray(3,), np.ndarray(3,)]: two three vectors
 
 setLabPhaseSpace: [np.ndarray(3,), np.ndarray(3,)]: two three vectors
 
-recordParticle: i/p: Location, s, z, TraceSpace:
-                calls, setLocation, setz, sets, setTraceSpace in turn
-                to store all variables.
+recordParticle: i/p: Location, z, s, TraceSpace:
+                stores all variables as one new record.
+
+recordParticleBlock: i/p: Locations[n], z, s, TraceSpace[n,6]:
+                stores n records in one go; z and s scalar or [n].
+
+   newRecords: i/p: nRcrd; make room for nRcrd more records.
+          Return: address of the first new record
+
+truncateRecords: i/p: nRcrd; drop records from address nRcrd onwards.
+
+  keepRecords: i/p: Keep; keep only records at addresses in Keep.
 
   setSourceTraceSpace: set trace space after source
            Input: numpy.array(6,); 6D phase to store
@@ -80,6 +96,13 @@ recordParticle: i/p: Location, s, z, TraceSpace:
       getDebug, getinstances, getLocation, getz, gets, 
       getTraceSpace, getRPLCPhaseSpace, getPhaseSpace
           -- thought to be self documenting!
+      getnRecords: number of records filled
+      getz, gets, getTraceSpace, getRecords (rows of z, s, trace space)
+          and getLocationIndex return views of the filled records;
+          getLocation returns a list of location names.
+      getLocationLIST: class method, interned location names
+       internLocation: class method, index of location name (added to
+                       __LocLIST if new)
 
   Processing methods:
     cleanParticles : Deletes all particle instances and resets list of
@@ -116,6 +139,8 @@ recordParticle: i/p: Location, s, z, TraceSpace:
     writeParticle: Write one particle to datafile.
           Input: particleFILE full path to file to which event will be
                  written
+                 If the file is owned by a BeamIO instance writing
+                 version >= 9, particle is buffered in the BeamIO block.
 
       flushNcloseParticleFile: Flush and close file.
           Input: ParticleFILE full path to NEW file to which events will be
@@ -127,6 +152,8 @@ recordParticle: i/p: Location, s, z, TraceSpace:
      readParticle: Read particle from ParticleFILE
           Input: particleFILE full path to file to which event will be
                  read
+                 For version >= 9 read is passed to the BeamIO instance
+                 that owns the file.
          Return: OK flag: True ==> event read fine
 
   closeParticleFile: Close particle file being read.
@@ -174,9 +201,18 @@ iPhysclCnstnts = PhysicalConstants()
 
 
 class Particle:
+    __slots__  = ("_Species", "_iLoc", "_Rcrd", "_nRcrd", "_PhsSpc", \
+                  "_LabPhsSpc", "_ct", "_RemainingLifetime", "_Decay")
+
     instances  = []
     __Debug    = False
 
+    #.. Record storage; location names interned once for all particles,
+    #   nLocMax is the initial capacity of the record of a new particle:
+    nLocMax    = 16
+    __LocLIST  = []
+    __LocIndex = {}
+
     decayPRODUCTstack = []
 
     stable_species   = {"proton", "neutrino", "12c6", "electron"}
@@ -286,10 +322,9 @@ class Particle:
         
     def setAll2None(self):
         self._Species           = None
-        self._Location          = []
-        self._z                 = []
-        self._s                 = []
-        self._TrcSpc            = []
+        self._iLoc              = np.empty(Particle.nLocMax, dtype=np.int32)
+        self._Rcrd              = np.empty((Particle.nLocMax, 8))
+        self._nRcrd             = 0
         self._PhsSpc            = []
         self._LabPhsSpc         = []
         self._ct                = []
@@ -311,30 +346,34 @@ class Particle:
                                _Species + " not allowed!")
 
     def setLocation(self, Location):
+        #.. Opens a new record; setz, sets and setTraceSpace fill it:
         Success = False
         if isinstance(Location, str):
-            self._Location.append(Location)
+            iRcrd = self.newRecords(1)
+            self._iLoc[iRcrd]  = Particle.internLocation(Location)
+            self._Rcrd[iRcrd]  = np.nan
+            self._nRcrd       += 1
             Success = True
         return Success
 
     def setz(self, z):
         Success = False
-        if isinstance(z, float):
-            self._z.append(z)
+        if isinstance(z, float) and self._nRcrd > 0:
+            self._Rcrd[self._nRcrd-1, 0] = z
             Success = True
         return Success
 
     def sets(self, s):
         Success = False
-        if isinstance(s, float):
-            self._s.append(s)
+        if isinstance(s, float) and self._nRcrd > 0:
+            self._Rcrd[self._nRcrd-1, 1] = s
             Success = True
         return Success
 
     def setTraceSpace(self, TraceSpace):
         Success = False
-        if isinstance(TraceSpace, np.ndarray):
-            self._TrcSpc.append(TraceSpace)
+        if isinstance(TraceSpace, np.ndarray) and self._nRcrd > 0:
+            self._Rcrd[self._nRcrd-1, 2:] = TraceSpace
             Success = True
         return Success
 
@@ -359,24 +398,72 @@ class Particle:
         return Success
 
     def recordParticle(self, Location, z, s, TraceSpace):
-        Success = self.setLocation(Location)
-        if Success:
-            Success = self.setz(z)
-        if Success:
-            Success = self.sets(s)
-        if Success:
-            Success = self.setTraceSpace(TraceSpace)
+        Success = False
+        if isinstance(Location, str) and isinstance(z, float) and \
+           isinstance(s, float) and isinstance(TraceSpace, np.ndarray):
+            iRcrd = self.newRecords(1)
+            self._iLoc[iRcrd]       = Particle.internLocation(Location)
+            self._Rcrd[iRcrd, 0]    = z
+            self._Rcrd[iRcrd, 1]    = s
+            self._Rcrd[iRcrd, 2:]   = TraceSpace
+            self._nRcrd            += 1
+            Success = True
         return Success
 
+    def recordParticleBlock(self, Locations, z, s, TraceSpace):
+        #.. Append len(Locations) records in one go; z and s may be
+        #   scalars or arrays, TraceSpace is [nRcrd, 6]:
+        nRcrd = len(Locations)
+        if nRcrd == 0:
+            return True
+        iRcrd = self.newRecords(nRcrd)
+        iEnd  = iRcrd + nRcrd
+        self._iLoc[iRcrd:iEnd]     = [Particle.internLocation(Location) \
+                                      for Location in Locations]
+        self._Rcrd[iRcrd:iEnd, 0]  = z
+        self._Rcrd[iRcrd:iEnd, 1]  = s
+        self._Rcrd[iRcrd:iEnd, 2:] = TraceSpace
+        self._nRcrd = iEnd
+        return True
+
+    def newRecords(self, nRcrd):
+        #.. Make room for nRcrd more records, doubling the capacity as
+        #   needed; returns address of first new record:
+        iRcrd   = self._nRcrd
+        nLocMax = len(self._iLoc)
+        if iRcrd + nRcrd > nLocMax:
+            while iRcrd + nRcrd > nLocMax:
+                nLocMax = 2 * nLocMax
+            iLoc = np.empty(nLocMax, dtype=np.int32)
+            Rcrd = np.empty((nLocMax, 8))
+            iLoc[:iRcrd] = self._iLoc[:iRcrd]
+            Rcrd[:iRcrd] = self._Rcrd[:iRcrd]
+            self._iLoc   = iLoc
+            self._Rcrd   = Rcrd
+        return iRcrd
+
+    def truncateRecords(self, nRcrd):
+        #.. Drop records from address nRcrd onwards:
+        if nRcrd < self._nRcrd:
+            self._nRcrd = nRcrd
+        del self._PhsSpc[nRcrd:]
+        del self._LabPhsSpc[nRcrd:]
+        del self._ct[nRcrd:]
+
+    def keepRecords(self, Keep):
+        #.. Keep only records at (increasing) addresses in Keep:
+        nRcrd = self._nRcrd
+        Keep  = np.asarray(Keep, dtype=int)
+        nKeep = len(Keep)
+        self._iLoc[:nKeep] = self._iLoc[Keep]
+        self._Rcrd[:nKeep] = self._Rcrd[Keep]
+        self._nRcrd        = nKeep
+        for Rcrds in [self._PhsSpc, self._LabPhsSpc, self._ct]:
+            if len(Rcrds) == nRcrd:
+                Rcrds[:] = [Rcrds[iRcrd] for iRcrd in Keep]
+
     def setSourceTraceSpace(self, TraceSpace):
-        Success = self.setLocation("Source")
-        if Success:
-            Success = self.setz(0.)
-        if Success:
-            Success = self.sets(0.)
-        if Success:
-            Success = self.setTraceSpace(TraceSpace)
-        return Success
+        return self.recordParticle("Source", 0., 0., TraceSpace)
 
     def setDECAY(self, _Decay):
 
@@ -404,17 +491,41 @@ class Particle:
     def getSpecies(self):
         return self._Species
             
+    @classmethod
+    def getLocationLIST(cls):
+        return cls.__LocLIST
+
+    @classmethod
+    def internLocation(cls, Location):
+        iLoc = cls.__LocIndex.get(Location)
+        if iLoc == None:
+            iLoc = len(cls.__LocLIST)
+            cls.__LocLIST.append(Location)
+            cls.__LocIndex[Location] = iLoc
+        return iLoc
+
     def getLocation(self):
-        return self._Location
-    
+        LocLIST = Particle.__LocLIST
+        return [LocLIST[iLoc] for iLoc in \
+                self._iLoc[:self._nRcrd].tolist()]
+
+    def getLocationIndex(self):
+        return self._iLoc[:self._nRcrd]
+
+    def getnRecords(self):
+        return self._nRcrd
+
+    def getRecords(self):
+        return self._Rcrd[:self._nRcrd]
+
     def getz(self):
-        return self._z
+        return self._Rcrd[:self._nRcrd, 0]
     
     def gets(self):
-        return self._s
+        return self._Rcrd[:self._nRcrd, 1]
     
     def getTraceSpace(self):
-        return self._TrcSpc
+        return self._Rcrd[:self._nRcrd, 2:]
     
     def getRPLCPhaseSpace(self):
         return self._PhsSpc
@@ -687,12 +798,14 @@ class Particle:
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> trace space:", TrcSpc)
 
-        species      = BL.BeamLine.getcurrentReferenceParticle().getSpecies()
-        particleMASS = iPhysclCnstnts.getparticleMASS(species)
+        iRefPrtcl    = BL.BeamLine.getcurrentReferenceParticle()
+        species      = iRefPrtcl.getSpecies()
+        particleMASS = iRefPrtcl.getparticleMASS()
 
-        p0  = BL.BeamLine.getcurrentReferenceParticle().getMomentumOut(0)
-        E0  = np.sqrt(particleMASS**2 + p0**2)
-        b0  = p0/E0
+        Kin = iRefPrtcl.getKinematics()
+        p0  = Kin["p0"][0]
+        E0  = Kin["E0"][0]
+        b0  = Kin["b0"][0]
         E   = E0 + TrcSpc[5]*p0
 
         if cls.getDebug():
@@ -781,12 +894,12 @@ class Particle:
                 print("     ----> PhsSpx:", PhsSpc)
 
         iRefPrtcl    = BL.BeamLine.getcurrentReferenceParticle()
-        species      = iRefPrtcl.getSpecies()
-        particleMASS = iPhysclCnstnts.getparticleMASS(species)
+        particleMASS = iRefPrtcl.getparticleMASS()
 
-        p0        = iRefPrtcl.getp0(nLoc)
-        E0        = mth.sqrt( particleMASS**2 + p0**2)
-        b0        = p0/E0
+        Kin       = iRefPrtcl.getKinematics()
+        p0        = Kin["p0"][nLoc]
+        E0        = Kin["E0"][nLoc]
+        b0        = Kin["b0"][nLoc]
         if cls.getDebug():
             print("     ----> p0, E0, b0, ( K0 ):", p0, E0, b0, \
                   "(", E0-particleMASS, ")")
@@ -1010,10 +1123,10 @@ class Particle:
                     ELab.append([])
                     Scl.append([])
 
-                p0 = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iLoc][:3], \
-                                     iRefPrtcl.getPrOut()[iLoc][:3]))
-                E0  = iRefPrtcl.getPrOut()[iLoc][3]
-                b0  = p0/E0
+                Kin = iRefPrtcl.getKinematics()
+                p0  = Kin["p0"][iLoc]
+                E0  = Kin["E0"][iLoc]
+                b0  = Kin["b0"][iLoc]
                 E   = E0 + iPrtcl.getTraceSpace()[iLoc][5] * p0
                 p   = mth.sqrt(E**2 - particleMASS**2)
                 E  -= particleMASS
@@ -1141,10 +1254,10 @@ class Particle:
                     tLoc.append([])
                     ELoc.append([])
 
-                p0 = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iLoc][:3], \
-                                     iRefPrtcl.getPrOut()[iLoc][:3]))
-                E0  = iRefPrtcl.getPrOut()[iLoc][3]
-                b0  = p0/E0
+                Kin = iRefPrtcl.getKinematics()
+                p0  = Kin["p0"][iLoc]
+                E0  = Kin["E0"][iLoc]
+                b0  = Kin["b0"][iLoc]
                 E   = E0 + iPrtcl.getTraceSpace()[iLoc][5] * p0
                 p   = mth.sqrt(E**2 - particleMASS**2)
                 b   = p/E
@@ -1235,6 +1348,14 @@ class Particle:
             raise noFILE( \
                     " Particle.writeParticle: file does not exist.")
 
+        ibmIO = bmIO.BeamIO.getBeamIO4FILE(ParticleFILE)
+        if ibmIO != None and ibmIO.getdataFILEversion() != None and \
+           ibmIO.getdataFILEversion() >= 9:
+            ibmIO.bufferParticle(self)
+            if CleanAfterWrite:
+                Cleaned = self.cleanParticles()
+            return
+
         species = self.getSpecies()
         bversion = bytes(species, 'utf-8')
         record   = strct.pack(">i", len(species))
@@ -1268,15 +1389,8 @@ class Particle:
             if self.getDebug():
                 print("         ----> Location:", bLocation.decode('utf-8'))
 
-            record = strct.pack(">8d",                           \
-                                self.getz()[iLoc],               \
-                                self.gets()[iLoc],               \
-                                self.getTraceSpace()[iLoc][0],   \
-                                self.getTraceSpace()[iLoc][1],   \
-                                self.getTraceSpace()[iLoc][2],   \
-                                self.getTraceSpace()[iLoc][3],   \
-                                self.getTraceSpace()[iLoc][4],   \
-                                self.getTraceSpace()[iLoc][5])
+            #.. Record row is z, s, trace space:
+            record = strct.pack(">8d", *self.getRecords()[iLoc])
             ParticleFILE.write(record)
             if self.getDebug():
                 print("         ----> z, s, trace space:", \
@@ -1388,6 +1502,13 @@ class Particle:
         if cls.getDebug():
             print("     ----> bmIOversion:", bmIOversion)
 
+        if bmIOversion >= 9:
+            ibmIO = bmIO.BeamIO.getBeamIO4FILE(ParticleFILE)
+            if ibmIO == None:
+                raise noFILE( \
+                    " Particle.readParticle: no BeamIO instance for file.")
+            return ibmIO.readBlockParticle()
+
         if bmIOversion >= 7:
             brecord = ParticleFILE.read(4)
             if brecord == b'':
@@ -1419,7 +1540,7 @@ class Particle:
         if brecord == b'':
             if cls.getDebug():
                 print(" <---- end of file, return.")
-                return True
+            return True
         record  = strct.unpack(">i", brecord)
         nLoc    = record[0]
         
@@ -1513,6 +1634,10 @@ Derived class ReferenceParticle(Particle):
                            beamline element.
   _Rot2LabOut[]: ndarray : Rotation matrix from RPLC to lab at exit from
                            beamline element.
+   _Kinematics : ndarray : Reference kinematics table, one row (of
+                           KinematicsDtype) per _PrOut record: p0, E0,
+                           b0, g0, b0g0, s (= _sOut) and Brho (T m).
+ _particleMASS : float   : Mass of the reference species (MeV)
 
    All instance attributes are initialised to Null
 
@@ -1530,7 +1655,12 @@ Derived class ReferenceParticle(Particle):
     getRPDebug: Get ReferenceParticle class debug flag.
 
      getsIn, getsOut, getRrIn, getRrOut, getPrIn, getPrOut, getRot2LabIn,
-     getRot2LabOut all believed to be self documenting.
+     getRot2LabOut, getparticleMASS all believed to be self documenting.
+
+ getKinematics: Returns the reference kinematics table, extended (or
+                rebuilt) first if records have been added since it was
+                filled.  Hot-path code reads p0, E0, b0, etc. from it
+                by record index instead of recomputing them from _PrOut.
 
   Set methods:
    setinstance: Class method, sets ReferencePartcicle instance.
@@ -1557,6 +1687,10 @@ Derived class ReferenceParticle(Particle):
     setRot2LabIn : i/p 3x3 param, ndarray : Sets _Rot2LabIn
    setRot2LabOut : i/p 3x3 param, ndarray : Sets _Rot2LabOut
 
+   setKinematics : Fill the reference kinematics table for records not
+                   yet tabulated.  Called for all reference particles by
+                   BeamLine.completeREFERENCEparticles.
+
   Processing method:
          setReferenceParticle: No input, runs through beam line elements
                                (instances of BeamLineElement class) to
@@ -1591,6 +1725,11 @@ class ReferenceParticle(Particle):
     __RPDebug     = False
     __speciesLIST = []
 
+    KinematicsDtype = np.dtype([("p0", "<f8"), ("E0", "<f8"), \
+                                ("b0", "<f8"), ("g0", "<f8"), \
+                                ("b0g0", "<f8"), ("s", "<f8"), \
+                                ("Brho", "<f8")])
+
 #--------  "Built-in methods":
     def __new__(cls, _species="proton"):
         if cls.getRPDebug():
@@ -1623,6 +1762,7 @@ class ReferenceParticle(Particle):
 
         #.. Particle class initialisation:
         self.callSPECIEScreator(_species)
+        self._particleMASS = iPhysclCnstnts.getparticleMASS(_species)
         
         # Only constants; print values that will be used:
         if ReferenceParticle.getRPDebug():
@@ -1744,8 +1884,7 @@ class ReferenceParticle(Particle):
         return self._PrOut
     
     def getMomentumOut(self, iLoc):
-        return mth.sqrt(np.dot(self.getPrOut()[iLoc][:3], \
-                               self.getPrOut()[iLoc][:3]))
+        return self.getKinematics()["p0"][iLoc]
         
     def getRot2LabIn(self):
         return self._Rot2LabIn
@@ -1753,24 +1892,23 @@ class ReferenceParticle(Particle):
     def getRot2LabOut(self):
         return self._Rot2LabOut
 
+    def getKinematics(self):
+        if self._Kinematics is None or \
+           len(self._Kinematics) != len(self.getPrOut()):
+            self.setKinematics()
+        return self._Kinematics
+
+    def getparticleMASS(self):
+        return self._particleMASS
+
     def getp0(self, iLoc):
-        p0  = mth.sqrt(np.dot(self.getPrOut()[iLoc][:3], \
-                              self.getPrOut()[iLoc][:3]))
-        return p0
+        return self.getKinematics()["p0"][iLoc]
     
     def getb0(self, iLoc):
-        p0  = mth.sqrt(np.dot(self.getPrOut()[iLoc][:3], \
-                              self.getPrOut()[iLoc][:3]))
-        E0  = self.getPrOut()[iLoc][3]
-        b0 = p0/E0
-        return b0
+        return self.getKinematics()["b0"][iLoc]
         
     def getg0b0(self, iLoc):
-        p0   = mth.sqrt(np.dot(self.getPrOut()[iLoc][:3], \
-                              self.getPrOut()[iLoc][:3]))
-        g0b0 = p0 / \
-            iPhysclCnstnts.getparticleMASS(self.getSpecies())
-        return g0b0
+        return self.getKinematics()["b0g0"][iLoc]
         
 
 #--------  "Set methods";
@@ -1815,6 +1953,42 @@ class ReferenceParticle(Particle):
         self._PrOut      = []
         self._Rot2LabIn  = []
         self._Rot2LabOut = []
+        self._Kinematics = None
+
+    def setKinematics(self):
+        #.. Rows already tabulated are kept if records have only been
+        #   appended since:
+        Kin   = np.zeros(len(self.getPrOut()), \
+                         dtype=ReferenceParticle.KinematicsDtype)
+        iStrt = 0
+        if self._Kinematics is not None and \
+           len(self._Kinematics) <= len(Kin):
+            iStrt           = len(self._Kinematics)
+            Kin[:iStrt]     = self._Kinematics
+
+        Mass = self.getparticleMASS()
+        Chrg = iPhysclCnstnts.getparticleCHARGE(self.getSpecies())
+        SoL  = iPhysclCnstnts.SoL()
+        for iRcrd in range(iStrt, len(Kin)):
+            p0   = mth.sqrt(np.dot(self.getPrOut()[iRcrd][:3], \
+                                   self.getPrOut()[iRcrd][:3]))
+            E0   = self.getPrOut()[iRcrd][3]
+            g0   = E0/Mass   if Mass > 0. else mth.inf
+            b0g0 = p0/Mass   if Mass > 0. else mth.inf
+            Brho = (1./(SoL*1.E-9))*p0/1000./Chrg if Chrg != 0. \
+                                                  else mth.inf
+            Kin[iRcrd] = (p0, E0, p0/E0, g0, b0g0, mth.nan, Brho)
+
+        #.. Path length may be recorded after the momentum:
+        nS            = min(len(self.getsOut()), len(Kin))
+        Kin["s"][:nS] = self.getsOut()[:nS]
+        Kin["s"][nS:] = mth.nan
+
+        self._Kinematics = Kin
+
+        if self.getRPDebug():
+            print(" ReferenceParticle.setKinematics:", len(Kin) - iStrt, \
+                  "of", len(Kin), "records tabulated.")
 
     def setsIn(self, sIn):
         Success = False
@@ -2143,6 +2317,8 @@ Created on Mon 05Aug25: Version history:
 @author: paulkyberd
 """
 class UnstableParticle(Particle):
+    __slots__ = ("_meanLife", "_remainingPath")
+
     def __init__(self, species):
         UnstableSpecies = {"pion", "muon", "proton"}
 
@@ -2226,6 +2402,7 @@ class badDECAY(Exception):
 
 
 class proton(Particle):
+    __slots__       = ()
     __instances     = []
 
 #--------  "Built-in methods":
@@ -2253,6 +2430,7 @@ class proton(Particle):
 
 
 class pion(Particle):
+    __slots__       = ()
     __instances     = []
 
 #--------  "Built-in methods":
@@ -2363,6 +2541,7 @@ class pion(Particle):
 
             
 class muon(Particle):
+    __slots__       = ()
     __instances     = []
 
 #--------  "Built-in methods":
@@ -2483,6 +2662,7 @@ class muon(Particle):
 
             
 class neutrino(Particle):
+    __slots__       = ()
     __instances     = []
     __Debug      = False
 
@@ -2515,6 +2695,7 @@ class neutrino(Particle):
             
 
 class electron(Particle):
+    __slots__       = ()
     __instances     = []
     __Debug      = False
 
@@ -2547,6 +2728,7 @@ class electron(Particle):
 
             
 class twelveC6(Particle):
+    __slots__       = ()
     __instances     = []
     __Debug      = False
 
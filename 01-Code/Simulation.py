@@ -22,14 +22,25 @@ __Facility     : Address of instance of a facility
   Methods defined at Module level:
   --------------------------------
     getRandom : no input, returns random numerm calls random.random.
+ RunSimWorker : Runs in a worker process; seeds random and np.random
+                and tracks events (Simulation.trackEvents) into a shard
+                file.
+           Input : iWorker, NEvt, Seed, ShardPATH
  getParabolic : Generate random number distributed as an inverted parabola
-                from -p1 to p1.
-           Input : p1 [float]
-       Return : Probability [float]
+                from -p1 to p1; closed-form (trigonometric) inversion.
+           Input : p1 [float], optional n [int]
+       Return : Probability [float], or np.ndarray of n values if n set
 
   Instance attributes:
   --------------------
             _NEvt : Number of events to generate
+        _nWorkers : Number of worker processes (default 1, serial)
+      _BatchSize : Number of events tracked together by
+                    BeamLine.trackBeamBatch (default 10000); 0 tracks
+                    event by event with BeamLine.trackBeam
+        _Observe  : Optional list of observation points passed to
+                    BeamLine.setObserve; overrides any given in the
+                    beam-line specification file
    _ParamFileName : csv file containing parameters of the simulation
     _RootFileName : Root file for o/p
     
@@ -44,6 +55,11 @@ __Facility     : Address of instance of a facility
   Get/set methods:
       CdVrsn()     : Returns code version number.
       getRandomSeed: Returns random seed
+      setRandomSeed: Set master random seed
+   setnWorkers, getnWorkers: Set/get number of worker processes
+   setBatchSize, getBatchSize: Set/get batch size (0: event by event)
+     getWorkerSeeds: Returns list of independent seeds, one per worker,
+                     spawned (np.random.SeedSequence) from the master seed
            setDebug: Set debug flag
            getDebug: Get debug flag
    getFacility: Get __Facility
@@ -52,8 +68,21 @@ __Facility     : Address of instance of a facility
   Simulation methods:
       getRandom    : Returns uniformly distributed randum number
       getParabolic : Generates a parabolic distributed random number from
-                     -p1 to p1 (p1 input)
-            RunSim : CEO method to run simulation.
+                     -p1 to p1 (p1 input); n numbers if n given
+       trackEvents : Track NEvt events from the source into a data file;
+                     in batches (BeamLine.trackBeamBatch) if the batch
+                     size is > 0, the reference species is stable and
+                     the source mode is in Source.BatchModes, otherwise
+                     event by event (BeamLine.trackBeam)
+             Input : NEvt, dataFILE
+            Return : True if tracked in batches
+            RunSim : CEO method to run simulation.  Source mode 3 with a
+                     columnar (version >= 9) input file decodes blocks
+                     ahead in a BeamIO read-ahead thread.
+    RunSimParallel : Called by RunSim if nWorkers > 1.  Splits NEvt
+                     across a pool of forked processes; shards are
+                     merged into the data file after its single header.
+                     Source mode 3 (read from file) runs serially.
 
           Utilities:
                 print : Print summary of paramters
@@ -69,6 +98,8 @@ Created on Thu 10Jan21;11:04: Version history:
 #--------  Module dependencies
 import random as __Rnd
 import numpy as np
+import math as mth
+import multiprocessing as mp
 import sys
 
 import BeamIO          as BmIO
@@ -80,21 +111,45 @@ import Particle        as Prtcl
 def getRandom():
     return __Rnd.random()
 
-def getParabolic(p1):
-    ran = getRandom()
-    a = np.array( [ 1., 0., (-3.*p1*p1), (2.*p1*p1*p1*(2.*ran - 1.)) ] )
-    r = np.roots(a)
-    isol = 0
-    for ri in r:
-        if not isinstance(ri, complex):
-            if ri >= -p1:
-                if ri <= p1:
-                    isol += 1
-                    p = ri
-    if isol != 1:
-        raise Exception("Simulation.getParabolic; p multiply defined")
-
-    return p
+def getParabolic(p1, n=None):
+    #.. Inverts cumulative probability, ran, by trigonometric solution of
+    #   p^3 - 3 p1^2 p + 2 p1^3 (2 ran - 1) = 0 for the root in [-p1, p1].
+    #   With n set, returns np.ndarray of n values from np.random.
+    if n is None:
+        ran = getRandom()
+        p   = p1 * 2. * mth.cos((mth.acos(1. - 2.*ran) - 2.*mth.pi) / 3.)
+        return min(max(p, -p1), p1)
+
+    ran = np.random.random(n)
+    p   = p1 * 2. * np.cos((np.arccos(1. - 2.*ran) - 2.*np.pi) / 3.)
+    return np.clip(p, -p1, p1)
+
+def RunSimWorker(_iWorker, _NEvt, _Seed, _ShardPATH):
+    #.. Runs in a forked worker; beam line is inherited from the parent.
+    #   Random streams (including the Source generator, which is reset
+    #   to be re-seeded from "random") are seeded from the worker's seed
+    #   and particles
+    #   are written, without header, to the shard file.  The worker's
+    #   copy of the BeamIO writer is pointed at the shard so that
+    #   columnar (version >= 9) blocks, and the shard's event index, are
+    #   written there.
+    __Rnd.seed(_Seed)
+    np.random.seed(_Seed)
+    BLE.Source.setGenerator(None)
+    Simulation.setProgressPrint(False)
+
+    ShardFILE = None
+    if _ShardPATH != None:
+        ShardFILE = open(_ShardPATH, "wb")
+        Simulation.getiBmIOw().setdataFILE(ShardFILE)
+        Simulation.getiBmIOw().setpathFILE(_ShardPATH)
+
+    Simulation.trackEvents(_NEvt, ShardFILE)
+
+    if ShardFILE != None:
+        Simulation.getiBmIOw().flushNclosedataFile(ShardFILE)
+
+    return _iWorker, _NEvt
 
 #--------  Simulation class  --------
 class Simulation(object):
@@ -111,7 +166,9 @@ class Simulation(object):
 #--------  "Built-in methods":
     def __new__(cls, NEvt=5, filename=None, 
                 _dataFileDir=None, _dataFileName=None, \
-                _inputFILE=None, _BDSIMfile=False):
+                _inputFILE=None, _BDSIMfile=False, \
+                _nWorkers=1, _RandomSeed=None, _Observe=None, \
+                _BatchSize=10000):
         
         if cls.__instance is None:
             if cls.getDebug():
@@ -120,10 +177,14 @@ class Simulation(object):
             cls.__instance = super(Simulation, cls).__new__(cls)
             
             cls.setAll2None()
-            
+
+            if _RandomSeed != None:
+                cls.setRandomSeed(_RandomSeed)
             cls.__Rnd.seed(int(cls.__RandomSeed))
 
             cls.setNEvt(NEvt)
+            cls.setnWorkers(_nWorkers)
+            cls.setBatchSize(_BatchSize)
             if filename != None:
                 cls.setBeamLineSpecificationFile(filename)
 
@@ -153,6 +214,8 @@ class Simulation(object):
     
             # Create Facility instance:
             cls.setFacility(BL.BeamLine(filename))
+            if _Observe != None:
+                BL.BeamLine.setObserve(_Observe)
             p0BLfile = BLE.Facility.getinstances().getp0()[0]
             print("             ---->", \
                   "Reference particle momentum from beam line file:", \
@@ -191,6 +254,10 @@ class Simulation(object):
         print("                        Version:", self.CdVrsn())
         print("      State of random generator:", self.__Rnd.getstate()[0])
         print("   Number of events to generate:", self.getNEvt())
+        print("              Number of workers:", self.getnWorkers())
+        print("                     Batch size:", self.getBatchSize())
+        print("             Observation points:", \
+              BL.BeamLine.getObserve())
         print("   Beam line specification file:", \
               self.getBeamLineSpecificationFile())
         print(" data file directory for output:", self.getdataFileDir())
@@ -206,6 +273,8 @@ class Simulation(object):
     @classmethod
     def setAll2None(cls):
             cls._NEvt          = None
+            cls._nWorkers      = 1
+            cls._BatchSize     = 10000
             cls._ParamFileName = None
             cls._dataFileDir   = None
             cls._dataFileName  = None
@@ -226,6 +295,28 @@ class Simulation(object):
         
         self._NEvt = NEvt
 
+    @classmethod
+    def setnWorkers(cls, _nWorkers):
+        if not isinstance(_nWorkers, int) or _nWorkers < 1:
+            raise badParameter(" Simulation.setnWorkers:", _nWorkers)
+        
+        cls._nWorkers = _nWorkers
+
+    @classmethod
+    def setBatchSize(cls, _BatchSize):
+        if not isinstance(_BatchSize, int) or isinstance(_BatchSize, bool) \
+           or _BatchSize < 0:
+            raise badParameter(" Simulation.setBatchSize:", _BatchSize)
+        
+        cls._BatchSize = _BatchSize
+
+    @classmethod
+    def setRandomSeed(cls, _RandomSeed):
+        if not isinstance(_RandomSeed, (int, float)):
+            raise badParameter(" Simulation.setRandomSeed:", _RandomSeed)
+
+        cls.__RandomSeed = _RandomSeed
+
     @classmethod
     def setBeamLineSpecificationFile(self, BLspecfile):
         if not isinstance(BLspecfile, str):
@@ -303,6 +394,22 @@ class Simulation(object):
     def getNEvt(self):
         return self._NEvt
 
+    @classmethod
+    def getnWorkers(cls):
+        return cls._nWorkers
+
+    @classmethod
+    def getBatchSize(cls):
+        return cls._BatchSize
+
+    @classmethod
+    def getWorkerSeeds(cls, _nWorkers):
+        #.. Independent, reproducible seeds, one per worker, spawned from
+        #   the master seed:
+        SdSqnc = np.random.SeedSequence(int(cls.__RandomSeed))
+        return [int(iSdSqnc.generate_state(1)[0]) \
+                for iSdSqnc in SdSqnc.spawn(_nWorkers)]
+
     @classmethod
     def getBeamLineSpecificationFile(self):
         return self._ParamFileName
@@ -327,6 +434,25 @@ class Simulation(object):
 
         
 #--------  Simulation run methods
+    @classmethod
+    def trackEvents(cls, NEvt, dataFILE=None):
+        iSrc      = BLE.BeamLineElement.getinstances()[1]
+        iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
+        if cls.getBatchSize() > 0 and \
+           iSrc.getMode() in BLE.Source.BatchModes and \
+           iRefPrtcl.getSpecies() not in Prtcl.Particle.unstable_species:
+            if cls.getDebug():
+                print(" Simulation.trackEvents:", NEvt, \
+                      "events in batches of", cls.getBatchSize())
+            cls.getFacility().trackBeamBatch(NEvt, dataFILE, None, \
+                                             cls.getBatchSize())
+            return True
+
+        if cls.getDebug():
+            print(" Simulation.trackEvents:", NEvt, "events, event by event")
+        cls.getFacility().trackBeam(NEvt, dataFILE)
+        return False
+
     def RunSim(self):
         if self.getDebug():
             print()
@@ -345,7 +471,10 @@ class Simulation(object):
         if BLE.BeamLineElement.getinstances()[1].getMode() != 3:
 
             #.. Transport particles through facility:
-            nEvt = self.getFacility().trackBeam(self.getNEvt(), dataFILE)
+            if self.getnWorkers() > 1:
+                self.RunSimParallel(dataFILE)
+            else:
+                self.trackEvents(self.getNEvt(), dataFILE)
 
         else:
             
@@ -355,6 +484,15 @@ class Simulation(object):
             iEvt      = 0
             Scl  = 10
             iCnt = 1
+
+            #.. Columnar input: decode blocks ahead in a thread:
+            iBmIOr   = self.getiBmIOr()
+            Prefetch = iBmIOr != None and not iBmIOr.getBDSIMfile() and \
+                       iBmIOr.getdataFILEversion() != None and \
+                       iBmIOr.getdataFILEversion() >= 9
+            if Prefetch:
+                iBmIOr.setPrefetch(2)
+
             while not EndOfFile and iEvt < self.getNEvt():
                 try:
                     EndOfFile = Prtcl.Particle.readParticle( \
@@ -377,10 +515,46 @@ class Simulation(object):
                     iPrtcl = Prtcl.Particle.getinstances()[-1]
                     nEvt = self.getFacility().trackBeam(1, dataFILE, iPrtcl)
 
+            if Prefetch:
+                iBmIOr.setPrefetch(0)
+
         #.. Flush and close particle file:
         if self.getiBmIOw() != None:
             self.getiBmIOw().flushNclosedataFile(dataFILE)
 
+    def RunSimParallel(self, dataFILE=None):
+        #.. Split events across a pool of forked workers.  Each worker
+        #   writes its particles to a shard; the shards are appended, in
+        #   worker order, to the data file after its single header.
+        nWrkrs = self.getnWorkers()
+        NEvts  = [ self.getNEvt() // nWrkrs + \
+                   (1 if iWrkr < self.getNEvt() % nWrkrs else 0) \
+                   for iWrkr in range(nWrkrs) ]
+        Seeds  = self.getWorkerSeeds(nWrkrs)
+        Shards = [None] * nWrkrs
+        if dataFILE != None:
+            if self.getiBmIOw().getdataFILEversion() >= 9:
+                self.getiBmIOw().writeDictionary()
+            dataFILE.flush()
+            Shards = [ self.getiBmIOw().getpathFILE() + ".shard" + \
+                       str(iWrkr) for iWrkr in range(nWrkrs) ]
+
+        if self.getDebug() or self.getProgressPrint():
+            print("     ----> Simulation.RunSimParallel:", nWrkrs, \
+                  "workers, events per worker:", NEvts)
+
+        with mp.get_context("fork").Pool(nWrkrs) as Pool:
+            Done = Pool.starmap(RunSimWorker, \
+                                zip(range(nWrkrs), NEvts, Seeds, Shards))
+
+        if dataFILE != None:
+            for Shard in Shards:
+                self.getiBmIOw().appendShard(Shard)
+
+        if self.getDebug() or self.getProgressPrint():
+            print("     <---- Simulation.RunSimParallel:", \
+                  sum([iDone[1] for iDone in Done]), "events generated")
+
 #--------  Exceptions:
 class badParameter(Exception):
     pass
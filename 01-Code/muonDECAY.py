@@ -55,7 +55,11 @@ Class muonDECAY:
                       (units MeV), and two floats, costheta, cosphi
     GenerateScldE   : Generates scaled energies of electron, nu_e, and nu_mu. 
                       Returns three floats, (f_e, f_nue, f_numu).  Units
-                      m_mu/2.
+                      m_mu/2.  Optional n: returns three np.ndarrays of
+                      n values each.
+    ScldEe, ScldEnue: Static; invert the cumulative probabilities for
+                      f_e (Newton, to machine precision) and f_nue
+                      (closed form).  Accept floats or np.ndarrays.
     get3vectors     : Generates 3-vector momenta (MeV).  Electron direction
                       taken as positive z direction.  Returns three floar
                       array objects, p_e, p_mue, p_numu; p_i = array(px, py,
@@ -66,6 +70,8 @@ Class muonDECAY:
 
 Created on Sat 09Jan21;17:18: Version history:
 ----------------------------------------------
+ 2.1: 17Oct26; Replace np.roots in GenerateScldE by direct inversion;
+               add batch generation.
  2.0: 15Jan26; Begin to port to LhARAlinearOptics framework.
  1.2: 07Apr21: Update GenerateScldE to minimise calls to random-number
                generatory.  Hope is that this version runs a little more
@@ -150,80 +156,40 @@ class muonDECAY:
             
         return lt
 
-    def GenerateScldE(self):
+    def GenerateScldE(self, n=None):
         if self.getDebug():
             print("         ----> muonDECAY.GenerateScldE: start:")
             
 #----  See P. 3, my "Notes and calcs"
+#.. With n set, n triplets are generated (using np.random) and three
+#   np.ndarrays returned.  Rows with f_nue < 1 - f_e, possible only by
+#   rounding, are regenerated.
+        if n is not None:
+            f_e   = np.zeros(n)
+            f_nue = np.zeros(n)
+            iGen  = np.arange(n)
+            while len(iGen) > 0:
+                f_e[iGen]   = self.ScldEe(np.random.random(len(iGen)))
+                f_nue[iGen] = self.ScldEnue(f_e[iGen], \
+                                            np.random.random(len(iGen)))
+                iGen        = iGen[f_nue[iGen] < (1. - f_e[iGen])]
+
+            f_numu = 2. - f_e - f_nue
+            if self.getDebug():
+                print("         <---- f_e, f_nue, f_numu generated:", n)
+
+            return f_e, f_nue, f_numu
+
         f_nue = 0.5
         f_e   = 0.
         while f_nue < (1. - f_e):
 #.. fractional electron energy:
-            Ge    = Simu.getRandom()
-            Coefe = [0., 0., 0., 0., 0.]
-            Coefe[0] =  1.
-            Coefe[1] = -2.
-            Coefe[2] =  0.
-            Coefe[3] =  0.
-            Coefe[4] =  Ge
-            Rootse   = np.roots(Coefe)
-
-            Sln = 0
-            Rt  = -99
-            for r in Rootse:
-                if r.imag == 0.:
-                    if r >= 0. and r <= 1.:
-                        Sln += 1
-                        Rt   = r.real
-
-            if Sln !=1:
-                Err = ' Number of solutions for f_e = ' + str(Sln)
-                raise Exception(Err)
-            elif Rt == -99.:
-                Err = ' Number of solutions for f_e = ' + str(Sln) + \
-                    " but Rt = " + str(Rt)
-                raise Exception(Err)
-            else:
-                f_e = Rt
-
+            f_e = self.ScldEe(Simu.getRandom())
             if self.getDebug():
                 print("             ----> f_e:", f_e)
 
 #.. fractional electron-neutrino energy:
-            Alpha   = (1. - f_e)**2 * (1. + 2.*f_e)
-            Gnue    = Simu.getRandom()
-            Coefnue    = [0., 0., 0., 0.]
-            Coefnue[0] =  2.
-            Coefnue[1] = -3.
-            Coefnue[2] =  0.
-            Coefnue[3] = Gnue * (1. - Alpha) + Alpha
-            Roots   = np.roots(Coefnue)
-
-            Sln = 0
-            Rt  = -99
-            for r in Roots:
-                if not isinstance(r, complex):
-                    if r >= 0. and r <= 1.:
-                        Sln += 1
-                        Rt   = r
-
-            if Sln !=1:
-                Err = ' Number of solutions for f_nue = ' + str(Sln)
-                raise Exception(Err)
-            elif Rt == -99.:
-                Err = ' Number of solutions for f_nue = ' + str(Sln) + \
-                    " but Rt = " + str(Rt)
-                raise Exception(Err)
-            else:
-                f_nue = Rt
-                
-            if (1.-f_e) > f_nue:
-                print(" (1.-f_e) > f_nue:", \
-                      f_e, (1.-f_e), f_nue, (f_e + f_nue))
-            elif (f_e+f_nue) < 1.:
-                print(" (f_e+f_nue) < 1.:", \
-                      f_e, (1.-f_e), f_nue, (f_e + f_nue))
-                        
+            f_nue = self.ScldEnue(f_e, Simu.getRandom())
             if self.getDebug():
                 print("             ----> f_nue:", f_nue)
 
@@ -233,6 +199,48 @@ class muonDECAY:
             print("         <---- f_e, f_nue, f_numu:", f_e, f_nue, f_numu)
         
         return f_e, f_nue, f_numu
+
+    @staticmethod
+    def ScldEe(Ge):
+#.. Solves 2 f^3 - f^4 = Ge for f in [0, 1].  The cumulative probability
+#   is increasing and convex on [0, 1] and Ge^(1/3) is never below the
+#   root, so Newton iteration from there converges monotonically.
+        if np.ndim(Ge) == 0:
+            f = min(Ge**(1./3.), 1.)
+            for iItr in range(100):
+                dgdf = 6.*f**2 - 4.*f**3
+                if dgdf <= 0.:
+                    break
+                df = (2.*f**3 - f**4 - Ge) / dgdf
+                f  = f - df
+                if abs(df) <= 4.*2.220446049250313e-16 * f:
+                    break
+            return min(max(f, 0.), 1.)
+
+        Ge = np.asarray(Ge, dtype=float)
+        f  = np.minimum(np.cbrt(Ge), 1.)
+        for iItr in range(100):
+            g    = 2.*f**3 - f**4 - Ge
+            dgdf = 6.*f**2 - 4.*f**3
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df = np.where(dgdf > 0., g / dgdf, 0.)
+            f = f - df
+            if np.all(np.abs(df) <= 4.*np.finfo(float).eps * f):
+                break
+        return np.clip(f, 0., 1.)
+
+    @staticmethod
+    def ScldEnue(f_e, Gnue):
+#.. Solves 3 f^2 - 2 f^3 = Alpha + Gnue (1 - Alpha), with
+#   Alpha = (1 - f_e)^2 (1 + 2 f_e), for f in [0, 1] in closed form:
+        Alpha = (1. - f_e)**2 * (1. + 2.*f_e)
+        c     = Gnue * (1. - Alpha) + Alpha
+        if np.ndim(c) == 0:
+            f = 0.5 - mth.sin(mth.asin(min(max(1. - 2.*c, -1.), 1.)) / 3.)
+            return min(max(f, 0.), 1.)
+        
+        f     = 0.5 - np.sin(np.arcsin(np.clip(1. - 2.*c, -1., 1.)) / 3.)
+        return np.clip(f, 0., 1.)
     
     def get3vectors(self, f_e, f_nue, f_numu):
         if self.getDebug():
@@ -101,6 +101,475 @@ ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
 print(" <---- Writing and reading of beam-line setup tests done.")
 
 
+##! Test columnar format against record-by-record (version 8):
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, \
+      " check columnar file reproduces version 8 file.")
+
+import numpy           as np
+import BeamLineElement as BLE
+import Particle        as Prtcl
+
+def cleanAll():
+    Prtcl.Particle.cleanParticles()
+    Prtcl.ReferenceParticle.cleaninstances()
+    BL.BeamLine.cleaninstance()
+    BLE.BeamLineElement.cleaninstances()
+    bmIO.BeamIO.cleanBeamIOfiles()
+
+def readAll(datafileNAME):
+    ibmIOr = bmIO.BeamIO("99-Scratch", datafileNAME)
+    EndOfFile = False
+    while not EndOfFile:
+        EndOfFile = ibmIOr.readBeamDataRecord()
+    Events = [ [iPrtcl.getSpecies(), iPrtcl.getLocation(), \
+                np.array(iPrtcl.getz()), np.array(iPrtcl.gets()), \
+                np.array(iPrtcl.getTraceSpace())] \
+               for iPrtcl in Prtcl.Particle.getinstances() \
+               if not isinstance(iPrtcl, Prtcl.ReferenceParticle) ]
+    print("     ---->", datafileNAME, "version", \
+          ibmIOr.getdataFILEversion(), ":", len(Events), "events read")
+    cleanAll()
+    return Events
+
+bmIO.BeamIO.setBlockSize(128)
+ibmIOw8 = bmIO.BeamIO("99-Scratch", "Data4Tests-v8.dat", True, False, 8)
+ibmIOwC = bmIO.BeamIO("99-Scratch", "Data4Tests-col.dat", True)
+LhARAFclty.writeBeamLine(ibmIOw8.getdataFILE())
+LhARAFclty.writeBeamLine(ibmIOwC.getdataFILE())
+
+LhARAFclty.trackBeam(500)
+for iPrtcl in Prtcl.Particle.getinstances():
+    if isinstance(iPrtcl, Prtcl.ReferenceParticle):
+        continue
+    iPrtcl.writeParticle(ibmIOw8.getdataFILE(), False)
+    iPrtcl.writeParticle(ibmIOwC.getdataFILE(), False)
+Prtcl.Particle.cleanParticles()
+ibmIOw8.flushNclosedataFile(ibmIOw8.getdataFILE())
+ibmIOwC.flushNclosedataFile(ibmIOwC.getdataFILE())
+print("     ----> File sizes (bytes), v8:", \
+      os.path.getsize(ibmIOw8.getpathFILE()), \
+      "columnar:", os.path.getsize(ibmIOwC.getpathFILE()))
+if os.path.getsize(ibmIOwC.getpathFILE()) >= \
+   os.path.getsize(ibmIOw8.getpathFILE()):
+    raise Exception("Columnar: file not smaller than version 8 file!")
+cleanAll()
+
+ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-col.dat")
+nCol6  = sum([ sum([ "z" not in Grp[3].dtype.names for Grp in \
+                     Blk["Groups"] ]) for Blk in ibmIOr.iterBlockViews() ])
+print("     ----> Groups written without z and s:", nCol6)
+if nCol6 == 0:
+    raise Exception("Columnar: z and s not dropped from records!")
+cleanAll()
+
+Events8  = readAll("Data4Tests-v8.dat")
+EventsC  = readAll("Data4Tests-col.dat")
+if len(Events8) != len(EventsC):
+    raise Exception("Columnar: wrong number of events!")
+for Evt8, EvtC in zip(Events8, EventsC):
+    if Evt8[0] != EvtC[0] or Evt8[1] != EvtC[1]:
+        raise Exception("Columnar: species or locations differ!")
+    for iVal in range(2, 5):
+        if not np.array_equal(Evt8[iVal], EvtC[iVal]):
+            raise Exception("Columnar: z, s or trace space differ!")
+
+print(" <---- Columnar round trip tests done.")
+
+
+##! Test event index, seek and readRange:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, \
+      " check event index and random access (version 8 and columnar).")
+
+for datafileNAME, Events in [["Data4Tests-v8.dat", Events8], \
+                             ["Data4Tests-col.dat", EventsC]]:
+    ibmIOr = bmIO.BeamIO("99-Scratch", datafileNAME)
+    Index  = ibmIOr.getIndex()
+    print("     ---->", datafileNAME, ":", len(Index), "events indexed;", \
+          "sidecar:", os.path.isfile(ibmIOr.getpathFILE() + ".idx"))
+    if len(Index) != len(Events):
+        raise Exception("Index: wrong number of events!")
+    for start, stop in [[317, 322], [0, 3], [len(Events)-2, len(Events)]]:
+        Prtcls = ibmIOr.readRange(start, stop)
+        if len(Prtcls) != stop - start:
+            raise Exception("readRange: wrong number of events!")
+        for iPrtcl, Evt in zip(Prtcls, Events[start:stop]):
+            if iPrtcl.getLocation() != Evt[1] or \
+               not np.array_equal(np.array(iPrtcl.getTraceSpace()), Evt[4]):
+                raise Exception("readRange: wrong event read!")
+    cleanAll()
+
+print(" <---- Event index tests done.")
+
+
+##! Test memory-mapped block views:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, \
+      " check memory-mapped (zero-copy) read of columnar file.")
+
+import Beam as Bm
+
+ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-col.dat")
+iEvt   = 0
+for Blk in ibmIOr.iterBlockViews():
+    nEvt   = len(Blk["nLoc"])
+    Rcrds  = [[] for jEvt in range(nEvt)]
+    for iLoc, Evt, iRcrd, Rows in Blk["Groups"]:
+        if not np.shares_memory(Rows, ibmIOr.getmemmap()):
+            raise Exception("Memory map: group rows are not a view!")
+        for jEvt, jRcrd, TrcSpc1 in zip(Evt, iRcrd, Rows["TrcSpc"]):
+            Rcrds[jEvt].append([jRcrd, Blk["Locs"][iLoc], TrcSpc1])
+    for jEvt in range(nEvt):
+        Rcrds[jEvt].sort(key=lambda Rcrd: Rcrd[0])
+        if [Rcrd[1] for Rcrd in Rcrds[jEvt]] != EventsC[iEvt][1] or \
+           not np.array_equal([Rcrd[2] for Rcrd in Rcrds[jEvt]], \
+                              EventsC[iEvt][4]):
+            raise Exception("Memory map: wrong event!")
+        iEvt += 1
+print("     ---->", iEvt, "events in", len(ibmIOr.getBlockTable()), \
+      "blocks read through memory map")
+cleanAll()
+
+CovMtrx = []
+for datafileNAME in ["Data4Tests-v8.dat", "Data4Tests-col.dat"]:
+    iBm = Bm.Beam(os.path.join("99-Scratch", datafileNAME), 400)
+    iBm.evaluateBeam()
+    CovMtrx.append(np.array(iBm.getCovarianceMatrix()))
+    print("     ---->", datafileNAME, "particles at end:", \
+          iBm.getnParticles()[-1])
+    Bm.Beam.cleanBeams()
+    cleanAll()
+print("     ----> Maximum relative covariance difference:", \
+      np.max(np.abs(CovMtrx[0]-CovMtrx[1])) / np.max(np.abs(CovMtrx[0])))
+if not np.allclose(CovMtrx[0], CovMtrx[1], rtol=1.E-10, atol=0.):
+    raise Exception("Memory map: covariance matrices differ!")
+
+print(" <---- Memory-mapped read tests done.")
+
+
+##! Test batch iterator:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check batch iterator.")
+
+Locations = [1, 2, max(Events8, key=lambda Evt: len(Evt[1]))[1][-1]]
+Batches   = []
+for datafileNAME in ["Data4Tests-v8.dat", "Data4Tests-col.dat"]:
+    ibmIOr  = bmIO.BeamIO("99-Scratch", datafileNAME)
+    Batch   = [ Arrs for Arrs in \
+                ibmIOr.iterBatches(64, Locations, "proton") ]
+    nPrtcl  = len([iPrtcl for iPrtcl in Prtcl.Particle.getinstances() \
+                   if not isinstance(iPrtcl, Prtcl.ReferenceParticle)])
+    TrcSpc  = np.concatenate([Arrs[0] for Arrs in Batch])
+    Mask    = np.concatenate([Arrs[1] for Arrs in Batch])
+    print("     ---->", datafileNAME, ":", len(Batch), "batches,", \
+          "shape:", TrcSpc.shape, "particles kept:", nPrtcl)
+    if TrcSpc.shape != (len(Events8), len(Locations), 6) or \
+       len(Batch[0][0]) != 64 or nPrtcl != 0:
+        raise Exception("iterBatches: wrong shape or particles kept!")
+    Batches.append([TrcSpc, Mask])
+    Names = ibmIOr.LocationNames(Locations)
+    cleanAll()
+
+for iEvt, Evt in enumerate(Events8):
+    for iCol, Name in enumerate(Names):
+        if (Name in Evt[1]) != Batches[0][1][iEvt, iCol]:
+            raise Exception("iterBatches: wrong mask!")
+        if Name in Evt[1] and not np.array_equal( \
+                Batches[0][0][iEvt, iCol], Evt[4][Evt[1].index(Name)]):
+            raise Exception("iterBatches: wrong trace space!")
+if not np.array_equal(Batches[0][0], Batches[1][0]) or \
+   not np.array_equal(Batches[0][1], Batches[1][1]):
+    raise Exception("iterBatches: versions 8 and 9 differ!")
+
+print(" <---- Batch iterator tests done.")
+
+
+##! Test projection (read selected locations only):
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check projection on columnar file.")
+
+import time
+
+for Projection in [None, Locations]:
+    ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-col.dat")
+    ibmIOr.readBeamDataRecord()
+    ibmIOr.setProjection(Projection)
+    Names  = ibmIOr.LocationNames(Projection)
+    t0     = time.perf_counter()
+    EndOfFile = False
+    while not EndOfFile:
+        EndOfFile = ibmIOr.readBlock()
+    dt     = time.perf_counter() - t0
+    print("     ----> Projection:", Projection, ": block decode time (s):", \
+          round(dt, 5))
+
+    ibmIOr.seek(0)
+    Prtcls = ibmIOr.readRange(0, len(EventsC))
+    for iPrtcl, Evt in zip(Prtcls, [Evt for Evt in EventsC \
+                                    if any(Loc in Names for Loc in Evt[1])]):
+        Sel = [iLoc for iLoc, Loc in enumerate(Evt[1]) if Loc in Names]
+        if iPrtcl.getLocation() != [Evt[1][iLoc] for iLoc in Sel] or \
+           not np.array_equal(np.array(iPrtcl.getTraceSpace()), Evt[4][Sel]):
+            raise Exception("Projection: wrong locations read!")
+    cleanAll()
+
+print(" <---- Projection tests done.")
+
+
+##! Test float32 and compressed storage:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, \
+      " check float32 and compressed (zlib, lzma) storage.")
+
+for Precision, Compression in [["float64", "lzma"], ["float32", "zlib"]]:
+    datafileNAME = "Data4Tests-" + Precision + "-" + Compression + ".dat"
+    ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-v8.dat")
+    ibmIOr.readBeamDataRecord()
+    ibmIOw = bmIO.BeamIO("99-Scratch", datafileNAME, True)
+    ibmIOw.setStorage(Precision, Compression)
+    BL.BeamLine.getinstances().writeBeamLine(ibmIOw.getdataFILE())
+    while not ibmIOr.readBeamDataRecord():
+        Prtcl.Particle.getinstances()[-1].writeParticle( \
+                                                 ibmIOw.getdataFILE())
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+    Stats = ibmIOw.getStatistics()
+    print("     ---->", datafileNAME, ": size (bytes):", \
+          os.path.getsize(ibmIOw.getpathFILE()), \
+          "compression ratio:", round(Stats["Ratio"], 2), \
+          "encode (MB/s):", round(Stats["EncodeMBps"], 1))
+    if os.path.getsize(ibmIOw.getpathFILE()) >= \
+       os.path.getsize(os.path.join("99-Scratch", "Data4Tests-col.dat")):
+        raise Exception("Storage: file not smaller than uncompressed!")
+    cleanAll()
+
+    EventsX = readAll(datafileNAME)
+    if len(EventsX) != len(Events8):
+        raise Exception("Storage: wrong number of events!")
+    for Evt8, EvtX in zip(Events8, EventsX):
+        if Evt8[0] != EvtX[0] or Evt8[1] != EvtX[1]:
+            raise Exception("Storage: species or locations differ!")
+        for iVal in range(2, 5):
+            if ( Precision == "float64" and \
+                 not np.array_equal(Evt8[iVal], EvtX[iVal]) ) or \
+               not np.allclose(EvtX[iVal], Evt8[iVal], rtol=1.E-6, atol=0.):
+                raise Exception("Storage: z, s or trace space differ!")
+
+    ibmIOr = bmIO.BeamIO("99-Scratch", datafileNAME)
+    Prtcls = ibmIOr.readRange(317, 322)
+    for iPrtcl, Evt in zip(Prtcls, EventsX[317:322]):
+        if iPrtcl.getLocation() != Evt[1]:
+            raise Exception("Storage: random access read wrong event!")
+    for Blk in ibmIOr.iterBlockViews():
+        pass
+    Stats = ibmIOr.getStatistics()
+    print("         ----> decode (MB/s):", round(Stats["DecodeMBps"], 1))
+    cleanAll()
+
+print(" <---- Storage tests done.")
+
+
+##! Test event with more records than fit in a 16-bit record number:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, \
+      " check round trip of an event with more than 32767 records.")
+
+ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-v8.dat")
+ibmIOr.readBeamDataRecord()
+Prtcl.Particle.cleanParticles()
+nRcrd  = 40000
+LocNms = [BLE.BeamLineElement.getinstances()[iLoc % 4 + 1].getName() \
+          for iLoc in range(nRcrd)]
+TrcSpc = np.arange(6.*nRcrd).reshape(nRcrd, 6)
+iPrtcl = Prtcl.Particle()
+iPrtcl.recordParticleBlock(LocNms, np.arange(float(nRcrd)), \
+                           np.arange(float(nRcrd)), TrcSpc)
+ibmIOw = bmIO.BeamIO("99-Scratch", "Data4Tests-long.dat", True)
+BL.BeamLine.getinstances().writeBeamLine(ibmIOw.getdataFILE())
+iPrtcl.writeParticle(ibmIOw.getdataFILE())
+ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+cleanAll()
+
+EventsL = readAll("Data4Tests-long.dat")
+if len(EventsL) != 1 or EventsL[0][1] != LocNms:
+    raise Exception("Long event: locations not in record order!")
+if not np.array_equal(EventsL[0][4], TrcSpc):
+    raise Exception("Long event: trace space differs!")
+print("     ----> Records read back in order:", len(EventsL[0][1]))
+
+print(" <---- Long event tests done.")
+
+
+##! Test asynchronous (writer thread) output:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check asynchronous write.")
+
+Index = []
+for Async in [False, True]:
+    datafileNAME = "Data4Tests-async" + str(Async) + ".dat"
+    ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-v8.dat")
+    ibmIOr.readBeamDataRecord()
+    ibmIOw = bmIO.BeamIO("99-Scratch", datafileNAME, True)
+    ibmIOw.setStorage("float64", "zlib")
+    ibmIOw.setAsyncWrite(Async)
+    BL.BeamLine.getinstances().writeBeamLine(ibmIOw.getdataFILE())
+    t0 = time.perf_counter()
+    while not ibmIOr.readBeamDataRecord():
+        Prtcl.Particle.getinstances()[-1].writeParticle( \
+                                                 ibmIOw.getdataFILE())
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+    dt = time.perf_counter() - t0
+    if ibmIOw.getAsyncWrite():
+        raise Exception("Asynchronous write: writer not stopped on close!")
+    print("     ---->", datafileNAME, ": write time (s):", round(dt, 4), \
+          "queue wait (s):", round(ibmIOw.getStatistics()["QueueWait"], 4))
+    cleanAll()
+
+    EventsX = readAll(datafileNAME)
+    for Evt8, EvtX in zip(Events8, EventsX):
+        if Evt8[1] != EvtX[1] or not np.array_equal(Evt8[4], EvtX[4]):
+            raise Exception("Asynchronous write: events differ!")
+    ibmIOr = bmIO.BeamIO("99-Scratch", datafileNAME)
+    Index.append(ibmIOr.getIndex())
+    cleanAll()
+if len(EventsX) != len(Events8) or not np.array_equal(Index[0], Index[1]):
+    raise Exception("Asynchronous write: files differ!")
+
+print(" <---- Asynchronous write tests done.")
+
+##! Test read ahead (prefetch thread) on input:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check read ahead.")
+
+Decoded = []
+for nPftch in [0, 3]:
+    ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-asyncTrue.dat")
+    ibmIOr.readBeamDataRecord()
+    ibmIOr.setPrefetch(nPftch)
+    while not ibmIOr.readBeamDataRecord():
+        pass
+    ibmIOr.setPrefetch(0)
+    Stats = ibmIOr.getStatistics()
+    print("     ----> Blocks read ahead:", nPftch, "blocks:", \
+          Stats["nBlocks"], "I/O wait (s):", round(Stats["IOWait"], 4), \
+          "compute (s):", round(Stats["ComputeTime"], 4), \
+          "read-ahead thread (s):", round(Stats["PrefetchTime"], 4))
+    Decoded.append([Stats["nBlocks"], Stats["nDecoded"], \
+                    Stats["RawBytes"], Stats["StoredBytes"]])
+    EventsP = [ [iPrtcl.getLocation(), np.array(iPrtcl.getTraceSpace())] \
+                for iPrtcl in Prtcl.Particle.getinstances() \
+                if not isinstance(iPrtcl, Prtcl.ReferenceParticle) ]
+    if len(EventsP) != len(Events8):
+        raise Exception("Read ahead: wrong number of events!")
+    for Evt8, EvtP in zip(Events8, EventsP):
+        if Evt8[1] != EvtP[0] or not np.array_equal(Evt8[4], EvtP[1]):
+            raise Exception("Read ahead: events differ!")
+
+    #.. Seek with read ahead running:
+    ibmIOr.setPrefetch(2)
+    Prtcls = ibmIOr.readRange(200, 203)
+    if ibmIOr.getPrefetch() != 2 or \
+       Prtcls[0].getLocation() != Events8[200][1]:
+        raise Exception("Read ahead: seek failed!")
+    ibmIOr.setPrefetch(0)
+    cleanAll()
+#.. Counters updated by the read-ahead thread must not lose increments:
+print("     ----> Blocks, decoded bytes (raw, stored):", Decoded)
+if Decoded[0] != Decoded[1]:
+    raise Exception("Read ahead: statistics differ!")
+
+try:
+    ibmIOr = bmIO.BeamIO("99-Scratch", "Data4Tests-v8.dat")
+    ibmIOr.readBeamDataRecord()
+    ibmIOr.setPrefetch(2)
+    raise Exception("Read ahead: version 8 file not trapped!")
+except bmIO.badArgument:
+    print("     ----> Correctly trapped read ahead on version 8 file.")
+cleanAll()
+
+print(" <---- Read ahead tests done.")
+
+##! Test merge of complete files (shards with headers):
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check merge of shards.")
+
+ScratchPATH = os.path.join(os.getenv('HOMEPATH'), "99-Scratch")
+Shards      = [os.path.join(ScratchPATH, "Data4Tests-async" + str(Async) + \
+                            ".dat") for Async in [False, True]]
+MergedPATH  = os.path.join(ScratchPATH, "Data4Tests-merged.dat")
+try:
+    bmIO.BeamIO.mergeFiles(MergedPATH, \
+                [Shards[0], os.path.join(ScratchPATH, "Data4Tests-v8.dat")])
+    raise Exception("Merge: different headers not trapped!")
+except bmIO.badShard:
+    print("     ----> Correctly trapped shards with different headers.")
+cleanAll()
+
+ibmIOr = bmIO.BeamIO.mergeFiles(MergedPATH, Shards)
+nEvt   = 0
+while not ibmIOr.readBeamDataRecord():
+    nEvt += 1
+print("     ---->", len(Shards), "shards merged:", nEvt, "events,", \
+      os.path.getsize(MergedPATH), "bytes")
+if nEvt != 2*len(Events8) or len(ibmIOr.getIndex()) != nEvt:
+    raise Exception("Merge: wrong number of events!")
+cleanAll()
+
+EventsM = readAll("Data4Tests-merged.dat")
+for Evt8, EvtM in zip(Events8 + Events8, EventsM):
+    if Evt8[1] != EvtM[1] or not np.array_equal(Evt8[4], EvtM[4]):
+        raise Exception("Merge: events differ!")
+
+print(" <---- Merge tests done.")
+
+##! Test bulk conversion of legacy files:
+BeamIOTest += 1
+print()
+print("BeamIOTTest:", BeamIOTest, " check conversion of legacy files.")
+
+DataPATH = os.path.join(os.getenv('HOMEPATH'), "12-Data4Tests")
+Jobs     = [ (os.path.join(DataPATH, "V" + str(iV) + "Data4Tests.dat"), \
+              os.path.join(ScratchPATH, "Data4Tests-conv" + str(iV) + \
+                           ".dat")) for iV in [1, 6, 8] ]
+V1CSV    = os.path.join(LhARAOpticsPATH, \
+                        '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+Stats, Total = bmIO.BeamIO.convertFiles(Jobs, 2, None, \
+                                        ("float64", "zlib"), V1CSV)
+for iStats in Stats:
+    print("     ----> Version", iStats["InVersion"], ":", iStats["nEvt"], \
+          "events,", round(iStats["EvtPerSec"]), "events/s,", \
+          iStats["InBytes"], "->", iStats["OutBytes"], "bytes")
+print("     ----> Total:", Total["nEvt"], "events,", \
+      round(Total["EvtPerSec"]), "events/s")
+
+ibmIOr = bmIO.BeamIO(DataPATH, "V8Data4Tests.dat")
+ibmIOr.readBeamDataRecord()
+EventsV8 = []
+while not ibmIOr.readBeamDataRecord():
+    iPrtcl = Prtcl.Particle.getinstances()[-1]
+    EventsV8.append([iPrtcl.getLocation(), np.array(iPrtcl.getTraceSpace())])
+    Prtcl.Particle.cleanParticles()
+cleanAll()
+EventsC = readAll("Data4Tests-conv8.dat")
+if len(EventsC) != len(EventsV8) or Stats[2]["nEvt"] != len(EventsV8):
+    raise Exception("Conversion: wrong number of events!")
+for EvtV8, EvtC in zip(EventsV8, EventsC):
+    if EvtV8[0] != EvtC[1] or not np.array_equal(EvtV8[1], EvtC[4]):
+        raise Exception("Conversion: events differ!")
+
+print(" <---- Conversion tests done.")
+
+
 ##! Complete:
 print()
 print("========  BeamIO (write): tests complete  ========")
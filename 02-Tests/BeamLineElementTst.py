@@ -104,7 +104,31 @@ if Norm > 1E-6:
                     " inconsistent.")
 else:
     print(" <---- Coordinate transformation test successful.")
-    
+
+##! Check batch coordinate transformations and aligned-element short cut:
+BeamLineElementTest += 1
+print()
+print("BeamLineElementTest:", BeamLineElementTest, \
+      " batch coordinate transformations.")
+RR     = np.array([[0.5,  0.1, -0.3, -0.2, 0., 0.], \
+                   [0.2, -0.1,  0.1,  0.3, 0., 0.]])
+RRprime = BmLnElmnt.Tilt2Local(BmLnElmnt.Shift2Local(RR))
+for iR in range(len(RR)):
+    Rprime = BmLnElmnt.Tilt2Local(BmLnElmnt.Shift2Local(RR[iR]))
+    if np.linalg.norm(np.subtract(Rprime, RRprime[iR])) > 1E-12:
+        raise Exception(" !!!!----> FAILED: batch coordinate", \
+                        " transformations inconsistent.")
+print("     ----> Batch and single-vector transformations agree.")
+
+BmLnElmnt.setdrStrt(np.array([0., 0., 0.]))
+BmLnElmnt.setdvStrt(np.array([0., 0., 0.]))
+print("     ----> Element aligned; shifted:", BmLnElmnt.getShifted(), \
+      "tilted:", BmLnElmnt.getTilted())
+if BmLnElmnt.getShifted() or BmLnElmnt.getTilted() or \
+   BmLnElmnt.Shift2Local(RR) is not RR or \
+   BmLnElmnt.Tilt2Local(RR)  is not RR:
+    raise Exception(" !!!!----> FAILED: aligned element copies input.")
+print(" <---- Batch coordinate transformation test successful.")
 
 ##! Complete:
 print()
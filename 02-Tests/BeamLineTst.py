@@ -8,8 +8,10 @@ Test script for "BeamLine" class ... initialisation and get methods
 
 """
 
-import BeamLine as BL
-import Particle as Prtcl
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Particle        as Prtcl
+import numpy           as np
 import sys
 import os
 
@@ -58,6 +60,271 @@ BL.BeamLine.setDebug(False)
 iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
 print(iRefPrtcl)
 
+##! Check batch tracking reproduces particle-by-particle tracking:
+BeamLineTest = 5
+print()
+print("BeamLineTest:", BeamLineTest, \
+      " check batch tracking against particle-by-particle tracking.")
+nEvts  = 200
+Src    = BmLn.getElement()[1]
+SrcTrcSpcs = np.array([Src.getParticleFromSource() for i in range(nEvts)])
+
+Prtcl.Particle.cleanParticles()
+for SrcTrcSpc in SrcTrcSpcs:
+    iPrtcl = Prtcl.Particle.createParticle()
+    iPrtcl.recordParticle(Src.getName(), 0., 0., np.array(SrcTrcSpc))
+    BmLn.trackBeam(1, None, iPrtcl)
+PrtclsRef = Prtcl.Particle.getinstances()[1:]
+
+Prtcl.Particle.cleanParticles()
+BmLn.trackBeamBatch(nEvts, None, SrcTrcSpcs, 64)
+PrtclsBtch = Prtcl.Particle.getinstances()[1:]
+
+if len(PrtclsRef) != len(PrtclsBtch):
+    raise Exception("Batch tracking: wrong number of particles!")
+MaxDiff = 0.
+for iRef, iBtch in zip(PrtclsRef, PrtclsBtch):
+    if iRef.getLocation() != iBtch.getLocation() or \
+       not np.array_equal(iRef.gets(), iBtch.gets()) or \
+       not np.array_equal(iRef.getz(), iBtch.getz()):
+        raise Exception("Batch tracking: location records differ!")
+    for TrcSpcRef, TrcSpcBtch in zip(iRef.getTraceSpace(), \
+                                     iBtch.getTraceSpace()):
+        MaxDiff = max(MaxDiff, np.max(np.abs(TrcSpcRef - TrcSpcBtch)))
+print("    ----> Maximum trace-space difference:", MaxDiff)
+if MaxDiff > 1.E-12:
+    raise Exception("Batch tracking: trace space differs!")
+
+##! Check compiled lattice, recording only at observation points:
+BeamLineTest = 6
+print()
+print("BeamLineTest:", BeamLineTest, \
+      " check tracking through compiled lattice.")
+Observe = []
+for iBLE in BLE.BeamLineElement.getinstances()[2:]:
+    if not isinstance(iBLE, BLE.Drift) and \
+       not isinstance(iBLE, BLE.CylindricalRFCavity):
+        Observe.append(iBLE.getName())
+Observe.append(BLE.BeamLineElement.getinstances()[-1].getName())
+Segments = BmLn.compileLattice(Observe)
+print("    ---->", len(BLE.BeamLineElement.getinstances())-2, \
+      "elements compiled into", len(Segments), "segments")
+if len(Segments) >= len(BLE.BeamLineElement.getinstances())-2:
+    raise Exception("Compiled lattice: no elements fused!")
+
+Prtcl.Particle.cleanParticles()
+BmLn.trackBeamBatch(nEvts, None, SrcTrcSpcs, 64, True, Observe)
+PrtclsCmpld = Prtcl.Particle.getinstances()[1:]
+
+LastName = BLE.BeamLineElement.getinstances()[-1].getName()
+MaxDiff  = 0.
+for iRef, iCmpld in zip(PrtclsBtch, PrtclsCmpld):
+    Locations = [Loc for Loc in iRef.getLocation()[1:] if Loc in Observe]
+    if iRef.getLocation()[-1] != LastName and \
+       (Locations == [] or Locations[-1] != iRef.getLocation()[-1]):
+        Locations.append(iRef.getLocation()[-1])
+    if Locations != iCmpld.getLocation()[1:]:
+        raise Exception("Compiled lattice: location records differ!")
+    for iLoc in range(1, len(iCmpld.getLocation())):
+        iAddr   = iRef.getLocation().index(iCmpld.getLocation()[iLoc])
+        MaxDiff = max(MaxDiff, \
+                      np.max(np.abs(iRef.getTraceSpace()[iAddr] - \
+                                    iCmpld.getTraceSpace()[iLoc])))
+print("    ----> Maximum trace-space difference:", MaxDiff)
+if MaxDiff > 1.E-12:
+    raise Exception("Compiled lattice: trace space differs!")
+Prtcl.Particle.cleanParticles()
+
+##! Check loss-reason codes from the acceptance kernel:
+BeamLineTest = 7
+print()
+print("BeamLineTest:", BeamLineTest, " check loss-reason codes.")
+Segments = BmLn.compileLattice()
+Locations, s, TrcSpc, nRcrd, LossCode, LossPoint = \
+    BmLn.trackPARTICLEbatch(SrcTrcSpcs, Segments)
+for iCode in np.unique(LossCode):
+    print("    ---->", BLE.BeamLineElement.getLossReason(iCode), ":", \
+          np.count_nonzero(LossCode == iCode))
+if np.any((LossCode == 0) != (nRcrd == len(Segments))):
+    raise Exception("Loss codes: inconsistent with particles reaching end!")
+if np.any((LossCode == 0) & (LossPoint[0] >= 0)):
+    raise Exception("Loss codes: loss point for particle reaching end!")
+
+##! Check observation points control what trackBeam writes:
+BeamLineTest = 8
+print()
+print("BeamLineTest:", BeamLineTest, \
+      " check trackBeam writes only at observation points.")
+Observe = ["Capture:Gabor lens:2", "Arc:Dipole:1", \
+           len(BLE.BeamLineElement.getinstances())-1]
+BmLn.setObserve(Observe)
+print("    ----> Observation points:", BmLn.getObserve())
+Observed = BmLn.ObservationPoints(BmLn.getObserve())
+print("    ---->", len(Observed), "elements observed")
+if len(Observed) != 3:
+    raise Exception("Observation points: wrong number of elements!")
+try:
+    BmLn.setObserve([1.5])
+    raise Exception("Observation points: bad point not trapped!")
+except BL.badParameter:
+    print("    ----> Correctly trapped bad observation point.")
+BmLn.setObserve(Observe)
+
+REPORTPATH = os.getenv('REPORTPATH')
+ObsvPATH   = os.path.join(REPORTPATH, "BeamLineTst-Observe.dat")
+ObsvFILE   = open(ObsvPATH, "wb")
+Prtcl.Particle.cleanParticles()
+for SrcTrcSpc in SrcTrcSpcs:
+    iPrtcl = Prtcl.Particle.createParticle()
+    iPrtcl.recordParticle(Src.getName(), 0., 0., np.array(SrcTrcSpc))
+    BmLn.trackBeam(1, ObsvFILE, iPrtcl, None, False)
+ObsvFILE.close()
+PrtclsObsv = Prtcl.Particle.getinstances()[1:]
+
+#.. Batch tracking takes the observation points set on the beam line:
+nPrtcl = len(Prtcl.Particle.getinstances())
+BmLn.trackBeamBatch(nEvts, None, SrcTrcSpcs, 64)
+PrtclsObsvBtch = Prtcl.Particle.getinstances()[nPrtcl:]
+BmLn.setObserve(None)
+
+MaxDiff = 0.
+for iObsv, iBtch in zip(PrtclsObsv, PrtclsObsvBtch):
+    if iObsv.getLocation() != iBtch.getLocation() or \
+       not np.array_equal(iObsv.gets(), iBtch.gets()) or \
+       not np.array_equal(iObsv.getz(), iBtch.getz()):
+        raise Exception("Observation points: batch records differ!")
+    MaxDiff = max(MaxDiff, np.max(np.abs(np.array(iObsv.getTraceSpace()) - \
+                                         np.array(iBtch.getTraceSpace()))))
+print("    ----> trackBeamBatch records identical; maximum trace-space", \
+      "difference:", MaxDiff)
+if len(PrtclsObsv) != len(PrtclsObsvBtch) or MaxDiff > 1.E-12:
+    raise Exception("Observation points: batch trace space differs!")
+
+LastName = BLE.BeamLineElement.getinstances()[-1].getName()
+nLost    = 0
+for iRef, iObsv in zip(PrtclsRef, PrtclsObsv):
+    Locations = [iRef.getLocation()[0]] + \
+        [Loc for Loc in iRef.getLocation()[1:] if Loc in Observed]
+    if iRef.getLocation()[-1] != LastName:
+        nLost += 1
+        if Locations[-1] != iRef.getLocation()[-1]:
+            Locations.append(iRef.getLocation()[-1])
+    if Locations != iObsv.getLocation():
+        raise Exception("Observation points: location records differ!")
+    for iLoc in range(len(iObsv.getLocation())):
+        iAddr = iRef.getLocation().index(iObsv.getLocation()[iLoc])
+        if iRef.gets()[iAddr] != iObsv.gets()[iLoc] or \
+           np.any(iRef.getTraceSpace()[iAddr] != iObsv.getTraceSpace()[iLoc]):
+            raise Exception("Observation points: records differ!")
+print("    ---->", nLost, "lost particles written with loss point;", \
+      "file size:", os.path.getsize(ObsvPATH), "bytes")
+Prtcl.Particle.cleanParticles()
+
+##! Check reference kinematics table against the reference particle:
+BeamLineTest = 9
+print()
+print("BeamLineTest:", BeamLineTest, " check reference kinematics table.")
+iRefPrtcl = BL.BeamLine.getcurrentReferenceParticle()
+Kin       = iRefPrtcl.getKinematics()
+print("    ---->", len(Kin), "records; first:", Kin[0])
+if len(Kin) != len(iRefPrtcl.getPrOut()):
+    raise Exception("Kinematics table: wrong number of records!")
+for iRcrd in range(len(Kin)):
+    PrOut = iRefPrtcl.getPrOut()[iRcrd]
+    p0    = np.sqrt(np.dot(PrOut[:3], PrOut[:3]))
+    if abs(Kin["p0"][iRcrd] - p0) > 1.E-9*p0       or \
+       Kin["E0"][iRcrd] != PrOut[3]                  or \
+       Kin["s"][iRcrd]  != iRefPrtcl.getsOut()[iRcrd] or \
+       abs(Kin["g0"][iRcrd]**2 - Kin["b0g0"][iRcrd]**2 - 1.) > 1.E-9 or \
+       abs(Kin["b0"][iRcrd]*Kin["g0"][iRcrd] - Kin["b0g0"][iRcrd]) > 1.E-9:
+        raise Exception("Kinematics table: record", iRcrd, "inconsistent!")
+print("    ----> Brho at source:", Kin["Brho"][0], "T m")
+
+##! Check compact particle record:
+BeamLineTest = 10
+print()
+print("BeamLineTest:", BeamLineTest, " check compact particle record.")
+Prtcl.Particle.cleanParticles()
+BmLn.trackBeam(1)
+iPrtcl = Prtcl.Particle.getinstances()[-1]
+if hasattr(iPrtcl, "__dict__"):
+    raise Exception("Compact particle: instance has a __dict__!")
+nRcrd  = iPrtcl.getnRecords()
+print("    ---->", nRcrd, "records in capacity", Prtcl.Particle.nLocMax)
+if iPrtcl.getTraceSpace().shape != (nRcrd, 6) or \
+   not np.shares_memory(iPrtcl.getTraceSpace(), iPrtcl.getRecords()) or \
+   not np.array_equal(iPrtcl.gets(), iPrtcl.getRecords()[:, 1]):
+    raise Exception("Compact particle: getters are not views of record!")
+Names  = Prtcl.Particle.getLocationLIST()
+if [Names[iLoc] for iLoc in iPrtcl.getLocationIndex()] != \
+   iPrtcl.getLocation():
+    raise Exception("Compact particle: location index inconsistent!")
+
+#.. Grow past capacity, then keep and truncate records:
+Rcrds  = iPrtcl.getRecords().copy()
+Locs   = iPrtcl.getLocation()
+nAdd   = Prtcl.Particle.nLocMax
+iPrtcl.recordParticleBlock(["Extra"]*nAdd, 1., np.arange(nAdd, dtype=float), \
+                           np.ones((nAdd, 6)))
+if iPrtcl.getnRecords() != nRcrd+nAdd or \
+   not np.array_equal(iPrtcl.getRecords()[:nRcrd], Rcrds) or \
+   iPrtcl.getLocation()[-1] != "Extra":
+    raise Exception("Compact particle: growth lost records!")
+iPrtcl.keepRecords([0, nRcrd-1, nRcrd+1])
+if iPrtcl.getLocation() != [Locs[0], Locs[-1], "Extra"] or \
+   iPrtcl.gets()[2] != 1.:
+    raise Exception("Compact particle: keepRecords failed!")
+iPrtcl.truncateRecords(1)
+if iPrtcl.getLocation() != [Locs[0]] or \
+   not np.array_equal(iPrtcl.getRecords()[0], Rcrds[0]):
+    raise Exception("Compact particle: truncateRecords failed!")
+print("    ----> Growth, keep and truncate consistent.")
+Prtcl.Particle.cleanParticles()
+
+##! Check fused and per-element batch tracking agree on losses:
+BeamLineTest = 11
+print()
+print("BeamLineTest:", BeamLineTest, \
+      " check losses with fused segments on a lattice with cavities.")
+Cavities = [iLoc for iLoc, iBLE in \
+            enumerate(BLE.BeamLineElement.getinstances()) \
+            if isinstance(iBLE, BLE.CylindricalRFCavity)]
+print("    ---->", len(Cavities), "RF cavities in lattice")
+if len(Cavities) == 0:
+    raise Exception("Fused lattice: test lattice has no cavity!")
+SegmentsFsd = BmLn.compileLattice(Observe)
+for Sgmnt in SegmentsFsd:
+    if isinstance(Sgmnt[2], np.ndarray) and \
+       any(Sgmnt[0] <= iLoc <= Sgmnt[1] for iLoc in Cavities):
+        raise Exception("Fused lattice: cavity fused into segment!")
+
+#.. Widen half of the source beam so that particles are lost
+#   throughout while the other half keeps survivors:
+Rng        = np.random.default_rng(11)
+SrcTrcSpcs = Src.getParticles(4000)
+SrcTrcSpcs[:2000, [1, 3, 5]] *= 8.
+SrcTrcSpcs[:2000, 4]         += Rng.uniform(-8., 8., 2000)
+Locs, s, TrcSpcElmt, nRcrdElmt, LossElmt, LossPntElmt = \
+    BL.BeamLine.trackPARTICLEbatch(SrcTrcSpcs, BmLn.compileLattice(None))
+Locs, s, TrcSpcFsd, nRcrdFsd, LossFsd, LossPntFsd = \
+    BL.BeamLine.trackPARTICLEbatch(SrcTrcSpcs, SegmentsFsd)
+print("    ----> Loss codes, per element:", np.bincount(LossElmt), \
+      "fused:", np.bincount(LossFsd))
+if not np.array_equal(LossElmt == 0, LossFsd == 0) or \
+   not np.array_equal(LossElmt, LossFsd) or \
+   not np.array_equal(LossPntElmt[0], LossPntFsd[0]) or \
+   not np.array_equal(LossPntElmt[1], LossPntFsd[1]):
+    raise Exception("Fused lattice: survivors, loss codes or points differ!")
+if np.max(np.abs(LossPntElmt[2] - LossPntFsd[2])) > 1.E-12:
+    raise Exception("Fused lattice: trace space at loss point differs!")
+iSrvvd  = np.flatnonzero(LossFsd == 0)
+if len(iSrvvd) == 0:
+    raise Exception("Fused lattice: no particle survived!")
+MaxDiff = np.max(np.abs(TrcSpcElmt[iSrvvd, -1] - TrcSpcFsd[iSrvvd, -1]))
+print("    ----> Maximum trace-space difference at end:", MaxDiff)
+if MaxDiff > 1.E-12:
+    raise Exception("Fused lattice: trace space at end differs!")
+
 ##! Complete:
 print()
 print("========  BeamLine: tests complete  ========")
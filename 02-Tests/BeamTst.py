@@ -9,6 +9,7 @@ Test script for "Beam" class
 """
 
 import os
+import math as mth
 import numpy as np
 
 import Particle        as Prtcl
@@ -87,6 +88,113 @@ BmInst = Bm.Beam(inputdatafile, 1000, outputdatafile, 3)
 BmInst.evaluateBeam()
 BmInst.createReport()
 
+##! Check moment accumulator against numpy and merge of partial sums:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " moment accumulator and merge of partial sums:")
+Rng   = np.random.default_rng(1)
+X     = 1.E6 + Rng.normal(0., 1.E-3, (5000, 6))
+iAddr = Rng.integers(0, 3, 5000)
+Mmnts = Bm.MomentSums(3)
+Mmnts.addBatch(X, iAddr)
+Prt1  = Bm.MomentSums(3)
+Prt2  = Bm.MomentSums(3)
+for iRow in range(1000):
+    Prt1.addBatch(X[iRow], [iAddr[iRow]])
+Prt2.addBatch(X[1000:], iAddr[1000:])
+Prt1.merge(Prt2)
+MaxDiff = 0.
+for jAddr in range(3):
+    CovNp   = np.cov(X[iAddr == jAddr], rowvar=False, bias=True)
+    MaxDiff = max(MaxDiff, \
+                  np.max(np.abs(Mmnts.getCovariance()[jAddr] - CovNp)), \
+                  np.max(np.abs(Prt1.getCovariance()[jAddr] - CovNp)))
+print("    ----> Maximum covariance difference to numpy:", MaxDiff, \
+      "(variance 1.E-6)")
+if MaxDiff > 1.E-12 or np.any(Prt1.getn() != Mmnts.getn()):
+    raise Exception("Moment accumulator: covariance differs from numpy!")
+
+##! Check stacked beam parameters against location-by-location values:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " stacked emittance and Twiss evaluation:")
+Prmtrs  = BmInst.getBeamParameters()
+MaxDiff = 0.
+for iAddr in range(BmInst.getnWellFilled()):
+    Cov     = BmInst.getCovarianceMatrix()[iAddr]
+    eX      = mth.sqrt(max(np.linalg.det(Cov[0:2,0:2]), 0.))
+    MaxDiff = max(MaxDiff, \
+                  abs(Prmtrs["emittance"][iAddr][0] - eX) / eX, \
+                  abs(Prmtrs["Twiss"][iAddr][0][1] - Cov[0,0]/eX) / \
+                  (Cov[0,0]/eX), \
+                  abs(BmInst.getemittance()[iAddr][0] - eX) / eX)
+print("    ---->", len(Prmtrs), "locations; maximum relative difference:", \
+      MaxDiff)
+if MaxDiff > 1.E-12:
+    raise Exception("Stacked beam parameters differ!")
+
+##! Check beam from a file written only at observation points:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " evaluate beam from file written at observation points:")
+import BeamIO as bmIO
+iBmLn      = BL.BeamLine.getinstances()
+Observe    = [iBLE.getName() for iBLE in \
+              BLE.BeamLineElement.getinstances()[2::3]]
+Src        = iBmLn.getElement()[1]
+SrcTrcSpcs = np.array([Src.getParticleFromSource() for i in range(2000)])
+Bms = []
+for datafileNAME, Obsv in [["BeamTst-All.dat", None], \
+                           ["BeamTst-Observe.dat", Observe]]:
+    iBmLn.setObserve(Obsv)
+    ibmIOw = bmIO.BeamIO(os.path.join(HOMEPATH, "99-Scratch"), \
+                         datafileNAME, True)
+    iBmLn.writeBeamLine(ibmIOw.getdataFILE())
+    iBmLn.trackBeamBatch(0, ibmIOw.getdataFILE(), SrcTrcSpcs)
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+    Prtcl.Particle.cleanParticles()
+
+#.. Beam line is read back from each file:
+for datafileNAME, Obsv in [["BeamTst-All.dat", None], \
+                           ["BeamTst-Observe.dat", Observe]]:
+    BL.BeamLine.cleaninstance()
+    BLE.BeamLineElement.cleaninstances()
+    Prtcl.Particle.cleanAllParticles()
+    Bms.append(Bm.Beam(os.path.join(HOMEPATH, "99-Scratch", \
+                                    datafileNAME)))
+    BL.BeamLine.setObserve(Obsv)
+    Bms[-1].evaluateBeam()
+    print("    ---->", datafileNAME, ":", \
+          np.count_nonzero(Bms[-1].getnParticles()), "locations with", \
+          "records")
+BL.BeamLine.setObserve(None)
+
+MaxDiff = 0.
+for iAddr in range(len(Bms[0].getnParticles())):
+    Name = Bms[0].getLocation()[iAddr]
+    if iAddr > 0 and Name not in Observe:
+        if Bms[1].getnParticles()[iAddr] != 0:
+            raise Exception("Observed file: records at unobserved location!")
+        continue
+    if Bms[1].getnParticles()[iAddr] != Bms[0].getnParticles()[iAddr]:
+        raise Exception("Observed file: particles filed at wrong location!")
+    if Bms[0].getnParticles()[iAddr] > 0:
+        MaxDiff = max(MaxDiff, \
+                      np.max(np.abs(Bms[0].getCovarianceMatrix()[iAddr] - \
+                                    Bms[1].getCovarianceMatrix()[iAddr])))
+print("    ----> Maximum covariance difference at observation points:", \
+      MaxDiff)
+if MaxDiff > 1.E-12:
+    raise Exception("Observed file: covariance matrices differ!")
+print("    ----> Emittance kept at", Bms[1].getnWellFilled(), "of", \
+      len(Bms[1].getCovarianceMatrix()), "locations")
+Bms[1].setoutputCSVfile(os.path.join(HOMEPATH, \
+                                     '99-Scratch/BeamParameters-Observe.csv'))
+Bms[1].createReport()
+
 ##! Complete:
 print()
 print("========  Beam: tests complete  ========")
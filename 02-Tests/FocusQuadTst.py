@@ -159,6 +159,84 @@ else:
     print(" <---- Focusing quadrupole transport test successful.")
 
 
+##! Check transfer-matrix cache
+FocusQuadrupoleTest += 1
+print()
+print("FocusQuadrupoleTest:", FocusQuadrupoleTest, \
+      " check transfer-matrix cache.")
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(1.E-9)
+Rprime1 = FQuad1.Transport(R)
+Rprime2 = FQuad1.Transport(R)
+print("     ----> Cache hits, misses:", FQuad1.getTrnsMtrxCacheStats())
+if FQuad1.getTrnsMtrxCacheStats() != (1, 1):
+    raise Exception(" !!!!----> FAILED: transfer-matrix cache hit/miss", \
+                    " count not as expected.")
+Norm = np.linalg.norm(np.subtract(Rprime2, Rprime))
+print("     ----> Magnitude of difference to uncached transport:", Norm)
+if Norm > 1E-6:
+    raise Exception(" !!!!----> FAILED: cached transport", \
+                    " result not as expected.")
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(None)
+if FQuad1.getTrnsMtrxCacheStats() != (0, 0):
+    raise Exception(" !!!!----> FAILED: transfer-matrix cache not reset.")
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(1)
+if BLE.BeamLineElement.getTrnsMtrxCacheQuantum() != 1.:
+    raise Exception(" !!!!----> FAILED: integer cache quantum not accepted.")
+print("     ----> Integer quantum accepted:", \
+      BLE.BeamLineElement.getTrnsMtrxCacheQuantum())
+for BadQuantum in [0, -1, -1.E-9, True, "1.E-9"]:
+    try:
+        BLE.BeamLineElement.setTrnsMtrxCacheQuantum(BadQuantum)
+    except BLE.badParameter:
+        print('     ----> Correctly trapped bad quantum:', repr(BadQuantum))
+    else:
+        raise Exception(" !!!!----> FAILED: bad cache quantum accepted:", \
+                        BadQuantum)
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(None)
+print(" <---- Transfer-matrix cache test successful.")
+
+
+##! Check transfer-matrix cache follows a change of strength
+FocusQuadrupoleTest += 1
+print()
+print("FocusQuadrupoleTest:", FocusQuadrupoleTest, \
+      " check transfer-matrix cache is cleared when strength changes.")
+BLE.BeamLineElement.setNOdispersion(True)
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(1.E-9)
+kFQ     = FQuad1.getkFQ()
+Rprime1 = FQuad1.Transport(R)
+FQuad1.setkFQ(3.*kFQ)
+Rprime2 = FQuad1.Transport(R)
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(None)
+Rprime3 = FQuad1.Transport(R)
+with np.printoptions(linewidth=500,precision=5,suppress=True): \
+     print("     ----> Transported, cached, k:", Rprime1)
+with np.printoptions(linewidth=500,precision=5,suppress=True): \
+     print("     ----> Transported, cached, 3k:", Rprime2)
+with np.printoptions(linewidth=500,precision=5,suppress=True): \
+     print("     ----> Transported, uncached, 3k:", Rprime3)
+if np.linalg.norm(np.subtract(Rprime2, Rprime1)) < 1E-6:
+    raise Exception(" !!!!----> FAILED: stale transfer matrix returned", \
+                    " after setkFQ.")
+if np.linalg.norm(np.subtract(Rprime2, Rprime3)) > 1E-6:
+    raise Exception(" !!!!----> FAILED: cached transport after setkFQ", \
+                    " differs from uncached transport.")
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(1.E-9)
+FQuad1.Transport(R)
+FQuad1.setStrength(FQuad1.getStrength())
+FQuad1.setkFQ(kFQ)
+Rprime4 = FQuad1.Transport(R)
+print("     ----> Cache hits, misses:", FQuad1.getTrnsMtrxCacheStats())
+if FQuad1.getTrnsMtrxCacheStats() != (0, 2):
+    raise Exception(" !!!!----> FAILED: cache not cleared by setter.")
+if np.linalg.norm(np.subtract(Rprime4, Rprime1)) > 1E-6:
+    raise Exception(" !!!!----> FAILED: cached transport after resetting", \
+                    " kFQ not as expected.")
+BLE.BeamLineElement.setTrnsMtrxCacheQuantum(None)
+BLE.BeamLineElement.setNOdispersion(False)
+print(" <---- Transfer-matrix cache invalidation test successful.")
+
+
 ##! Complete:
 print()
 print("========  FocusQuadrupole: tests complete  ========")
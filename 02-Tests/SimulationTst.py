@@ -82,6 +82,65 @@ if ((r1 < 0.0) or (r1 > 1.0)):
     raise Exception("Simulation returns random number not beteen 0.0 and 1.0 ", r1)
 print("    Random no.  :", r1)
 
+##! Check worker seeds:
+SimulationTest = 3
+print()
+print("SimulationTest:", SimulationTest, " check worker seeds.")
+Smltn.setnWorkers(4)
+Seeds = Smltn.getWorkerSeeds(Smltn.getnWorkers())
+print("    Worker seeds:", Seeds)
+if len(set(Seeds)) != 4 or Seeds != Smltn.getWorkerSeeds(4):
+    raise Exception("Simulation worker seeds not distinct or reproducible ", \
+                    Seeds)
+Smltn.setnWorkers(1)
+
+##! Check batch tracking of events against event-by-event tracking:
+SimulationTest = 4
+print()
+print("SimulationTest:", SimulationTest, \
+      " check batch tracking against event-by-event tracking.")
+import numpy           as np
+import BeamLineElement as BLE
+import Particle        as Prtcl
+Smltn.setiBmIOw(None)
+Smltn.setNEvt(2000)
+try:
+    Smltn.setBatchSize(-1)
+    raise Exception("Simulation: bad batch size not trapped!")
+except Simu.badParameter:
+    print("    ----> Correctly trapped bad batch size.")
+LastName = BLE.BeamLineElement.getinstances()[-1].getName()
+Results  = []
+for BatchSize in [0, 500]:
+    Prtcl.Particle.cleanParticles()
+    Smltn.setBatchSize(BatchSize)
+    Smltn.setProgressPrint(False)
+    Batched = Smltn.trackEvents(Smltn.getNEvt())
+    Smltn.setProgressPrint(True)
+    if Batched != (BatchSize > 0):
+        raise Exception("Simulation: wrong tracking path for batch size", \
+                        BatchSize)
+    Prtcls = [iPrtcl for iPrtcl in Prtcl.Particle.getinstances() \
+              if not isinstance(iPrtcl, Prtcl.ReferenceParticle)]
+    xEnd   = np.array([iPrtcl.getTraceSpace()[-1][0] for iPrtcl in Prtcls \
+                       if iPrtcl.getLocation()[-1] == LastName])
+    Results.append([len(Prtcls), len(xEnd), float(np.std(xEnd))])
+    print("    ----> Batch size", BatchSize, ": events, reaching end,", \
+          "sigma_x at end:", Results[-1])
+Prtcl.Particle.cleanParticles()
+
+#.. Same source distribution, so agreement is statistical:
+nEnd    = np.array([Rslt[1] for Rslt in Results], dtype=float)
+fEnd    = nEnd / Smltn.getNEvt()
+sgmfEnd = np.sqrt(2. * fEnd.mean() * (1.-fEnd.mean()) / Smltn.getNEvt())
+sgmxEnd = np.mean([Rslt[2] for Rslt in Results]) * np.sqrt(1./nEnd.min())
+if Results[0][0] != Results[1][0] or \
+   abs(fEnd[0] - fEnd[1]) > 5.*sgmfEnd or \
+   abs(Results[0][2] - Results[1][2]) > 5.*sgmxEnd:
+    raise Exception("Simulation: batch and event-by-event tracking differ!")
+print("    ----> Transmission and sigma_x at end agree within 5 sigma.")
+Smltn.setBatchSize(10000)
+
 ##! Complete:
 print()
 print("========  Simulation: tests complete  ========")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for batched generation and moments of "Source" class
+================================================================
+
+  Source.py -- set "relative" path to code
+
+"""
+
+import os
+import math  as mth
+import numpy as np
+
+import BeamLineElement as BLE
+import BeamLine        as BL
+import Particle        as Prtcl
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                        '11-Parameters/LIONBeamLine-Params-Gauss.csv')
+BLI  = BL.BeamLine(filename)
+
+iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
+
+rStrt = np.array([0.,0.,0.])
+vStrt = np.array([[np.pi/2.,np.pi/2.],[0.,0.]])
+drStrt = np.array([0.,0.,0.])
+dvStrt = np.array([[0.,0.],[0.,0.]])
+
+
+##! Start:
+print("========  Source (batched): tests start  ========")
+
+##! Check batched generation against particle-by-particle generation:
+SourceBatchTest = 1
+print()
+print("BeamLineElement(Source)BatchTest:", SourceBatchTest, \
+      " test batched source generation.")
+BLE.Source.setGenerator(12345)
+for Mode, Param in [ [1, [0.000004, 0.000004, 0.998, 20., 0.3]], \
+                     [2, [0.000004, 0.000004, 0.998, 15., 25.]], \
+                     [4, [20., 0.3, 0.00001]] ]:
+    BLE.Source.cleaninstances()
+    Src    = BLE.Source("Source"+str(Mode), rStrt, vStrt, drStrt, dvStrt, \
+                        Mode, Param)
+    TrcSpc  = Src.getParticles(5000)
+    TrcSpc1 = np.array([Src.getParticleFromSource() for i in range(5000)])
+    print("     ----> Mode", Mode, "shape:", TrcSpc.shape)
+    print("         ----> batch mean, std of delta:", \
+          np.mean(TrcSpc[:,5]), np.std(TrcSpc[:,5]))
+    print("         ---->  loop mean, std of delta:", \
+          np.mean(TrcSpc1[:,5]), np.std(TrcSpc1[:,5]))
+    if TrcSpc.shape != (5000, 6) or \
+       abs(np.std(TrcSpc[:,5])/np.std(TrcSpc1[:,5]) - 1.) > 0.1:
+        raise Exception(" !!!!----> FAILED: batched source generation.")
+print(" <---- Batched source generation test successful.")
+
+##! Check analytic trace-space moments against generated particles:
+SourceBatchTest += 1
+print()
+print("BeamLineElement(Source)BatchTest:", SourceBatchTest, \
+      " test analytic trace-space moments.")
+BLE.Source.setGenerator(54321)
+for Mode, Param in [ [0, [0.8, 2.5E14, 0.6, 1.5E-6, 4.E-14, 10., 1., \
+                          20., 20., 15., -9999.]], \
+                     [1, [0.000004, 0.000004, 0.998, 20., 0.3]], \
+                     [2, [0.000004, 0.000004, 0.998, 15., 25.]], \
+                     [4, [20., 0.3, 0.00001]] ]:
+    BLE.Source.cleaninstances()
+    Src    = BLE.Source("Source"+str(Mode), rStrt, vStrt, drStrt, dvStrt, \
+                        Mode, Param)
+    Mean, Cov = Src.getTraceSpaceMoments()
+    TrcSpc    = Src.getParticles(200000)
+    Var       = np.diag(np.cov(TrcSpc, rowvar=False))
+    print("     ----> Mode", Mode, "analytic sigma:", np.sqrt(np.diag(Cov)))
+    print("         ---->  sampled sigma:", np.sqrt(Var))
+    Chk = np.diag(Cov) > 0.
+    if np.any(np.abs(np.diag(Cov)[Chk]/Var[Chk] - 1.) > 0.02) or \
+       np.any(Var[np.logical_not(Chk)] > 0.) or \
+       abs(Mean[5] - np.mean(TrcSpc[:,5])) > 0.01*mth.sqrt(Cov[5,5]):
+        raise Exception(" !!!!----> FAILED: analytic source moments.")
+print(" <---- Analytic trace-space moments test successful.")
+
+##! Complete:
+print()
+print("========  Source (batched): tests complete  ========")
@@ -466,7 +466,6 @@ plt.title('FlatSrc: delta at exit from source')
 plt.savefig('99-Scratch/SourceTst_plot30.pdf')
 plt.close()
 
-
 ##! Complete:
 print()
 print("========  Source: tests complete  ========")
@@ -89,6 +89,30 @@ exBmInst.extrapolateBeam()
 print(exBmInst)
 exBmInst.createReport()
 
+##! Check envelope from source parameters, no particles:
+extrapolateBeamTest += 1
+print()
+print("extrapolateBeamTest:", extrapolateBeamTest, \
+      " envelope from source parameters:")
+exBmInst.getInputDataFile().close()
+Bm.Beam.cleanBeams()
+BL.BeamLine.cleaninstance()
+BLE.BeamLineElement.cleaninstances()
+Prtcl.Particle.cleanAllParticles()
+exBmInst = Bm.extrapolateBeam(inputdatafile, None, None, None)
+exBmInst.extrapolateBeam()
+sigmaMC  = np.array(exBmInst.getsigmaxy())
+exBmInst.getInputDataFile().close()
+Bm.Beam.cleanBeams()
+exBmInst = Bm.extrapolateBeam(None, None, None, None)
+exBmInst.extrapolateBeam()
+sigmaEnv = np.array(exBmInst.getsigmaxy())
+print("     ----> sigma x, y at end; envelope:", sigmaEnv[-1], \
+      "from particles:", sigmaMC[-1])
+if sigmaEnv.shape != sigmaMC.shape or \
+   np.max(np.abs(sigmaEnv/sigmaMC - 1.)) > 0.05:
+    raise Exception(" !!!!----> FAILED: envelope from source parameters.")
+
 ##! Complete:
 print()
 print("========  extrapolateBeam: tests complete  ========")
@@ -209,6 +209,24 @@ plt.title('Electron longitudinal momentum distribution muon rest frame')
 plt.savefig('99-Scratch/muonPLOT9.pdf')
 plt.close()
 
+##! Batch generation of scaled energies:
+muonDECAYTest = 5
+print()
+print("muonDECAYTest:", muonDECAYTest, " batch generation of scaled energies.")
+Dcy = md.muonDECAY()
+f_e, f_nue, f_numu = Dcy.GenerateScldE(100000)
+print("    Mean f_e, f_nue, f_numu:", np.mean(f_e), np.mean(f_nue), \
+      np.mean(f_numu))
+if np.any(f_nue < 1. - f_e) or np.any(f_e < 0.) or np.any(f_e > 1.) or \
+   abs(np.mean(f_e) - 0.7) > 0.01:
+    raise Exception("muonDECAY: batch scaled energies out of range")
+n, bins, patches = plt.hist(f_e, bins=50, color='y')
+plt.xlabel('f_e')
+plt.ylabel('Frequency')
+plt.title('Scaled electron energy, batch generation')
+plt.savefig('99-Scratch/muonPLOT10.pdf')
+plt.close()
+
 ##! Complete:
 print()
 print("========  muonDECAY: tests complete  ========")
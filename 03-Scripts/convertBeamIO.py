@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+   Convert BeamIO data files of any earlier version to the current
+   (columnar) format; one process per file, nWorkers at a time.
+"""
+
+import os
+import sys, getopt
+
+import BeamIO   as bmIO
+
+def main(argv):
+    """
+       Parse input arguments:
+    """
+    opts, args = getopt.getopt(argv,"hdo:w:v:c:b:",\
+                               ["odir=", "nWorkers=", "version=", \
+                                "compression=", "bfile="])
+
+    outputdir    = None
+    Debug        = False
+    nWorkers     = 1
+    version      = None
+    compression  = None
+    beamlinefile = None
+    for opt, arg in opts:
+        if opt == '-h':
+            print ( \
+                    'convertBeamIO.py -o <outputdirectory>' + \
+                    ' -w <nWorkers> -v <version> -c <compression>' + \
+                    ' -b <beamlinefile, for version 1> <file> [<file> ...]')
+            sys.exit()
+        if opt == '-d':
+            Debug = True
+        elif opt in ("-o", "--odir"):
+            outputdir = arg
+        elif opt in ("-w", "--nWorkers"):
+            nWorkers = int(arg)
+        elif opt in ("-v", "--version"):
+            version = int(arg)
+        elif opt in ("-c", "--compression"):
+            compression = arg
+        elif opt in ("-b", "--bfile"):
+            beamlinefile = arg
+
+    if outputdir == None or len(args) == 0:
+        print ( \
+                'convertBeamIO.py -o <outputdirectory>' + \
+                ' -w <nWorkers> -v <version> -c <compression>' + \
+                ' -b <beamlinefile, for version 1> <file> [<file> ...]')
+        sys.exit()
+
+    print(" convertBeamIO: start")
+
+    HOMEPATH    = os.getenv('HOMEPATH')
+    print("     ----> HOMEPATH:", HOMEPATH)
+
+    #.. File handling:
+    if not os.path.isabs(outputdir):
+        outputdir = os.path.join(HOMEPATH, outputdir)
+    if not os.path.isdir(outputdir):
+        print("         ----> Output directory", outputdir, \
+              "does not exist.")
+        print("               Exit.")
+        sys.exit(1)
+
+    if beamlinefile != None and not os.path.isfile(beamlinefile):
+        beamlinefile = os.path.join(HOMEPATH, beamlinefile)
+
+    Jobs = []
+    for inputfile in args:
+        if not os.path.isfile(inputfile):
+            inputfile = os.path.join(HOMEPATH, inputfile)
+        if not os.path.isfile(inputfile):
+            print("         ----> Input file", inputfile, "does not exist.")
+            print("               Exit.")
+            sys.exit(1)
+        Jobs.append((inputfile, \
+                     os.path.join(outputdir, os.path.basename(inputfile))))
+        if os.path.abspath(Jobs[-1][0]) == os.path.abspath(Jobs[-1][1]):
+            print("         ----> Output would overwrite", inputfile)
+            print("               Exit.")
+            sys.exit(1)
+    print("     ---->", len(Jobs), "files to convert with", nWorkers, \
+          "workers.")
+
+    Storage = None
+    if compression != None:
+        Storage = ("float64", compression)
+
+    bmIO.BeamIO.setDebug(Debug)
+    Stats, Total = bmIO.BeamIO.convertFiles(Jobs, nWorkers, version, \
+                                            Storage, beamlinefile)
+
+    for iStats in Stats:
+        print("         ---->", iStats["Input"], "( version", \
+              iStats["InVersion"], "):", iStats["nEvt"], "events,", \
+              round(iStats["EvtPerSec"]), "events/s")
+    print("     <---- Total:", Total["nEvt"], "events in", \
+          round(Total["Time"], 2), "s,", round(Total["EvtPerSec"]), \
+          "events/s")
+
+    print(" convertBeamIO: ends")
+
+"""
+   Execute main"
+"""
+if __name__ == "__main__":
+    main(sys.argv[1:])
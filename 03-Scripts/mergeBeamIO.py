@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+   Merge BeamIO data files (shards) written for the same beam line into
+   one file; events copied without decoding, index rebuilt.
+"""
+
+import os
+import sys, getopt
+
+import BeamIO   as bmIO
+
+def main(argv):
+    """
+       Parse input arguments:
+    """
+    opts, args = getopt.getopt(argv,"hdo:",["ofile="])
+
+    outputfile   = None
+    Debug        = False
+    for opt, arg in opts:
+        if opt == '-h':
+            print ( \
+                    'mergeBeamIO.py -o <outputfile> <shard> [<shard> ...]')
+            sys.exit()
+        if opt == '-d':
+            Debug = True
+        elif opt in ("-o", "--ofile"):
+            outputfile = arg
+
+    if outputfile == None or len(args) == 0:
+        print ( \
+                'mergeBeamIO.py -o <outputfile> <shard> [<shard> ...]')
+        sys.exit()
+
+    print(" mergeBeamIO: start")
+
+    HOMEPATH    = os.getenv('HOMEPATH')
+    print("     ----> HOMEPATH:", HOMEPATH)
+
+    #.. File handling:
+    Shards = []
+    for shardfile in args:
+        if not os.path.isfile(shardfile):
+            shardfile = os.path.join(HOMEPATH, shardfile)
+        if not os.path.isfile(shardfile):
+            print("         ----> Shard", shardfile, "does not exist.")
+            print("               Exit.")
+            sys.exit(1)
+        Shards.append(shardfile)
+    print("     ---->", len(Shards), "shards to merge.")
+
+    if not os.path.isabs(outputfile):
+        outputfile = os.path.join(HOMEPATH, outputfile)
+    if not os.path.isdir(os.path.dirname(outputfile)):
+        print("         ----> Directory for output file", \
+              os.path.dirname(outputfile), "does not exist.")
+        print("               Exit.")
+        sys.exit(1)
+    print("     ----> Write merged file:", outputfile)
+
+    bmIO.BeamIO.setDebug(Debug)
+    try:
+        ibmIOr = bmIO.BeamIO.mergeFiles(outputfile, Shards)
+    except bmIO.badShard as Err:
+        print("         ---->", Err)
+        print("               Exit.")
+        sys.exit(1)
+
+    print("     <----", len(ibmIOr.getIndex()), "events,", \
+          os.path.getsize(outputfile), "bytes written.")
+
+    print(" mergeBeamIO: ends")
+
+"""
+   Execute main"
+"""
+if __name__ == "__main__":
+    main(sys.argv[1:])
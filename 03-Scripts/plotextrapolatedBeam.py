@@ -33,6 +33,9 @@ def main(argv):
                     'plotextrapolateBeam.py '  + \
                     ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
                     ' -l <startlocation> [-b <beamlinefile>]')
+            print ( \
+                    '    no <inputfile>: envelope from source ' + \
+                    'parameters, <beamlinefile> required')
             sys.exit()
         if opt == '-d':
             Debug = True
@@ -47,7 +50,7 @@ def main(argv):
         elif opt in ("-l", "--iLoc"):
             strtloc = int(arg)
 
-    if inputfile    == None:
+    if inputfile    == None and beamlinefile == None:
         print ( \
                 'plotextrapolateBeam.py '  + \
                 ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
@@ -62,15 +65,21 @@ def main(argv):
     print("         ----> HOMEPATH:", HOMEPATH)
         
     #.. Create beam instance:
+    filename = None
     if beamlinefile != None:
         print("         ----> Create beam instance:")
         filename     = os.path.join(HOMEPATH, beamlinefile)
         print("             ----> Beamline parameters will be read from:", \
               filename)
         
-    particlefile  = os.path.join(HOMEPATH, inputfile)
-    print("             ----> Particles will be read from:", \
-          particlefile)
+    particlefile  = None
+    if inputfile != None:
+        particlefile  = os.path.join(HOMEPATH, inputfile)
+        print("             ----> Particles will be read from:", \
+              particlefile)
+    else:
+        print("             ----> No particles; envelope from source", \
+              "parameters")
     
     CSVoutputFILE = None
     if outputfile != None:
@@ -78,7 +87,8 @@ def main(argv):
         print("         ----> Write beamline summary file to:", CSVoutputFILE)
 
     print("         ----> Start at location:", strtloc)
-    iexBm = Bm.extrapolateBeam(particlefile, nEvts, CSVoutputFILE, strtloc)
+    iexBm = Bm.extrapolateBeam(particlefile, nEvts, CSVoutputFILE, strtloc, \
+                               filename)
 
     print("     <---- Beam instance initialised.")
 
@@ -17,8 +17,9 @@ def main(argv):
     """
        Parse input arguments:
     """
-    opts, args = getopt.getopt(argv,"hdi:o:b:n:z:",\
-                       ["ifile=","ofile=","bfile", "nEvts", "BDSIMfile"])
+    opts, args = getopt.getopt(argv,"hdi:o:b:n:z:w:p:s:",\
+                       ["ifile=","ofile=","bfile", "nEvts", "BDSIMfile", \
+                        "nWorkers=", "observe=", "batch="])
 
     beamlinefile = None
     inputfile    = None
@@ -26,12 +27,17 @@ def main(argv):
     Debug        = False
     nEvts        = 10000
     BDSIMfile    = False
+    nWorkers     = 1
+    Observe      = None
+    BatchSize    = 10000
     for opt, arg in opts:
         if opt == '-h':
             print ( \
                     'runBEAMsim.py -b <beamlinefile>'  + \
                     ' -i <inputfile> -o <outputfile>' + \
-                    ' -n <nEvts> -z <BDSIMfile>' )
+                    ' -n <nEvts> -z <BDSIMfile> -w <nWorkers>' + \
+                    ' -p <observation points, comma separated>' + \
+                    ' -s <batch size, 0: event by event>' )
             sys.exit()
         if opt == '-d':
             Debug = True
@@ -45,13 +51,21 @@ def main(argv):
             nEvts = int(arg)
         elif opt in ("-z", "--BDSIMfile"):
             BDSIMfile = bool(arg)
+        elif opt in ("-w", "--nWorkers"):
+            nWorkers = int(arg)
+        elif opt in ("-p", "--observe"):
+            Observe = arg.split(",")
+        elif opt in ("-s", "--batch"):
+            BatchSize = int(arg)
 
     if beamlinefile == None or \
        outputfile    == None:
         print ( \
                 'runBEAMsim.py -b <beamlinefile>'  + \
                 ' -i <inputfile> -o <outputfile>' + \
-                    ' -n <nEvts> -z <BDSIMfile>' )
+                    ' -n <nEvts> -z <BDSIMfile> -w <nWorkers>' + \
+                    ' -p <observation points, comma separated>' + \
+                    ' -s <batch size, 0: event by event>' )
         sys.exit()
 
     print(" runBEAMsim: start")
@@ -103,7 +117,8 @@ def main(argv):
     print("             ----> Write to putput file:", outputfile)
     
     Smltn = Simu.Simulation(nEvts, beamlinefile, None, outputfile, \
-                            inputfile, BDSIMfile)
+                            inputfile, BDSIMfile, nWorkers, None, \
+                            Observe, BatchSize)
 
     print("     <---- Initialisation complete.")
 